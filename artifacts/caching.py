@@ -0,0 +1,88 @@
+"""
+Caching for artifact_list.
+
+A cached entry is one page of results, stored as artifact ids plus the next
+cursor. The key combines the artifact_list namespace version, a fingerprint of
+the viewer's block lists and the normalized search form, so viewers with the
+same (often empty) block lists share entries and any change to artifacts or
+tags bumps the version. Rendering still happens per request, so user-specific
+markup such as owner actions is never served to the wrong person.
+
+The category list, needed by every artifact_list render and category filter,
+is kept in the process-local cache.
+"""
+from django.conf import settings
+
+from core.cache import bump_version, fingerprint, get_or_compute, make_key
+from core.local_cache import local_cache
+from core.pagination import CursorPage
+
+from .models import Artifact, Category
+from .visibility import get_visibility_profile
+
+ARTIFACT_LIST_NAMESPACE = 'artifact_list'
+CATEGORIES_NAMESPACE = 'categories'
+CATEGORIES_KEY = 'categories:all'
+
+
+def invalidate_artifact_lists():
+    bump_version(ARTIFACT_LIST_NAMESPACE)
+
+
+def get_categories():
+    """All categories, in their default order"""
+    return local_cache.get_or_set(CATEGORIES_NAMESPACE, CATEGORIES_KEY, lambda: list(Category.objects.all()))
+
+
+def invalidate_categories():
+    local_cache.invalidate(CATEGORIES_NAMESPACE, CATEGORIES_KEY)
+
+
+def viewer_fingerprint(user):
+    """Viewers with identical block lists see identical pages"""
+    profile = get_visibility_profile(user)
+    if not profile:
+        return 'everyone'
+    return fingerprint(profile.as_cache_value())
+
+
+def search_fingerprint(form):
+    if not form.is_valid():
+        return 'default'
+    data = form.cleaned_data
+    category = data.get('category')
+    return (
+        (data.get('q') or '').strip().lower(),
+        category.pk if category else None,
+        data.get('sort') or '-created_at',
+    )
+
+
+def artifact_list_cache_key(request, form):
+    return make_key(
+        ARTIFACT_LIST_NAMESPACE,
+        viewer_fingerprint(request.user),
+        search_fingerprint(form),
+        request.GET.get('cursor') or '',
+    )
+
+
+def cached_artifact_page(request, form, build_page):
+    """Return the requested page from cache, or build and store it"""
+    built = []
+
+    def compute():
+        page = build_page()
+        built.append(page)
+        return [artifact.pk for artifact in page], page.next_cursor
+
+    ids, next_cursor = get_or_compute(artifact_list_cache_key(request, form), compute,
+                                      settings.ARTIFACT_LIST_CACHE_TIMEOUT)
+    if built:
+        return built[0]
+
+    artifacts = (Artifact.objects.select_related('category', 'user')
+                 .prefetch_related('tags').in_bulk(ids))
+    # Artifacts deleted since the page was cached are simply skipped
+    object_list = [artifacts[pk] for pk in ids if pk in artifacts]
+    return CursorPage(object_list, next_cursor, cursor=request.GET.get('cursor') or None)
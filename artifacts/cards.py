@@ -0,0 +1,77 @@
+"""
+Fragment cache for artifact cards.
+
+The expensive parts of a card (the author block and the image, title,
+truncated description, category and tags) are rendered once and cached per
+artifact. The key holds the artifact pk plus a fingerprint of everything the
+fragments are rendered from, so editing an artifact, retagging it or renaming
+its author or category simply produces a new key and stale cards age out.
+The timestamp, owner actions and engagement counters change far more often
+than the rest and are rendered live around the cached HTML.
+
+All cards of a page are read with one get_many; only misses are rendered.
+"""
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.cache import fingerprint
+
+# Bump when the fragment templates change
+CARD_CACHE_VERSION = 1
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+HEADER_TEMPLATE = 'artifacts/includes/artifact_card_header.html'
+BODY_TEMPLATE = 'artifacts/includes/artifact_card_body.html'
+
+
+class Card:
+    """An artifact with its cached header and body HTML"""
+    __slots__ = ('artifact', 'header', 'body')
+
+    def __init__(self, artifact, header, body):
+        self.artifact = artifact
+        self.header = mark_safe(header)
+        self.body = mark_safe(body)
+
+
+def card_cache_key(artifact):
+    """
+    Expects category, user and tags to be loaded with the artifact, as every
+    list view does, so building the key costs no queries.
+    """
+    user = artifact.user
+    category = artifact.category
+    state = fingerprint(
+        artifact.updated_at.isoformat(),
+        artifact.image.name,
+        artifact.image_status,
+        (user.username, user.avatar.name) if user else None,
+        category.name if category else None,
+        [tag.name for tag in artifact.tags.all()],
+    )
+    return f'card:{CARD_CACHE_VERSION}:{artifact.pk}:{state}'
+
+
+def render_card(artifact):
+    context = {'artifact': artifact}
+    return render_to_string(HEADER_TEMPLATE, context), render_to_string(BODY_TEMPLATE, context)
+
+
+def get_cards(artifacts):
+    """Return a Card for each artifact, in order"""
+    artifacts = list(artifacts)
+    keys = [card_cache_key(artifact) for artifact in artifacts]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    cards = []
+    for key, artifact in zip(keys, artifacts):
+        fragments = cached.get(key)
+        if fragments is None:
+            fragments = missing[key] = render_card(artifact)
+        cards.append(Card(artifact, *fragments))
+
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+    return cards
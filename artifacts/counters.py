@@ -0,0 +1,134 @@
+"""
+Denormalized engagement counters on Artifact.
+
+Counters are changed with single UPDATE ... SET col = col + n statements, so
+concurrent requests never overwrite each other and the rest of the row (and
+updated_at) is left alone. recount() repairs any drift from the source tables.
+
+Views are too frequent for a write each: record_view() counts them in the
+worker's memory and view_buffer writes them every VIEW_BUFFER_FLUSH_INTERVAL
+seconds, one UPDATE per batch of artifacts. A worker that is killed loses at
+most that many seconds of its views; one that exits normally flushes first.
+"""
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core.replicas import untracked_writes
+
+from .models import Artifact, Comment, Like
+
+COUNTED = (
+    ('comment_count', Comment),
+    ('like_count', Like),
+)
+
+
+def count_of(model):
+    """Expression counting an artifact's rows of model"""
+    rows = (model.objects.filter(artifact=OuterRef('pk')).order_by()
+            .values('artifact').annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+@untracked_writes()
+def adjust_counters(artifact_id, **deltas):
+    """
+    Atomically add deltas, e.g. adjust_counters(pk, comment_count=1). Counter
+    bumps do not pin the browser to the primary database.
+    """
+    queryset = Artifact.objects.filter(pk=artifact_id)
+    for name, delta in deltas.items():
+        if delta < 0:
+            # Never push a drifted counter below zero; recount() fixes it
+            queryset = queryset.filter(**{f'{name}__gte': -delta})
+    return queryset.update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+class ViewBuffer:
+    """Artifact views seen by this worker and not written yet"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.monotonic()
+
+    def add(self, artifact_id):
+        with self._lock:
+            self._pending[artifact_id] += 1
+
+    @untracked_writes()
+    def flush(self, batch_size=500):
+        """Add the buffered views to view_count. Returns {artifact_id: views}."""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.monotonic()
+        if not pending:
+            return {}
+        # Artifacts with the same number of new views share one UPDATE
+        by_views = defaultdict(list)
+        for artifact_id, views in pending.items():
+            by_views[views].append(artifact_id)
+        try:
+            with transaction.atomic():
+                for views, artifact_ids in by_views.items():
+                    for start in range(0, len(artifact_ids), batch_size):
+                        Artifact.objects.filter(pk__in=artifact_ids[start:start + batch_size]).update(
+                            view_count=F('view_count') + views)
+        except Exception:
+            # Keep them for the next flush
+            with self._lock:
+                self._pending.update(pending)
+            raise
+        return dict(pending)
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush < settings.VIEW_BUFFER_FLUSH_INTERVAL:
+            return None
+        return self.flush()
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.flush)
+
+
+def record_view(artifact_id):
+    view_buffer.add(artifact_id)
+
+
+def recount(batch_size=1000):
+    """
+    Recompute counters from the source tables in primary key batches.
+
+    Yields (batch_end_pk, fixed) per batch so callers can report progress.
+    """
+    fields = [name for name, _ in COUNTED]
+    annotations = {f'actual_{name}': count_of(model) for name, model in COUNTED}
+    last_pk = 0
+    while True:
+        batch = list(
+            Artifact.objects.filter(pk__gt=last_pk).order_by('pk')
+            .annotate(**annotations).only('pk', *fields)[:batch_size]
+        )
+        if not batch:
+            return
+        drifted = []
+        for artifact in batch:
+            changed = False
+            for name in fields:
+                actual = getattr(artifact, f'actual_{name}')
+                if getattr(artifact, name) != actual:
+                    setattr(artifact, name, actual)
+                    changed = True
+            if changed:
+                drifted.append(artifact)
+        if drifted:
+            Artifact.objects.bulk_update(drifted, fields)
+        last_pk = batch[-1].pk
+        yield last_pk, len(drifted)
@@ -1,5 +1,8 @@
 from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
 from .models import Artifact, Comment, Category, Tag, UserPreference
+from .caching import get_categories
 from core.forms import BaseModelForm, BaseForm
 
 class ArtifactForm(BaseModelForm):
@@ -70,9 +73,35 @@ class CommentForm(BaseModelForm):
             'text': forms.Textarea(attrs={'rows': 3, 'placeholder': 'Add a comment...'}),
         }
 
+class CachedCategoryIterator(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for category in get_categories():
+            yield self.choice(category)
+
+    def __len__(self):
+        return len(get_categories()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(get_categories())
+
+class CachedCategoryField(forms.ModelChoiceField):
+    """Category choice that renders and validates against the cached category list"""
+    iterator = CachedCategoryIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        for category in get_categories():
+            if str(category.pk) == str(value):
+                return category
+        raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                              params={'value': value})
+
 class ArtifactSearchForm(BaseForm):
     q = forms.CharField(required=False, label='Search')
-    category = forms.ModelChoiceField(
+    category = CachedCategoryField(
         queryset=Category.objects.all(),
         required=False,
         empty_label="All Categories"
@@ -114,3 +143,9 @@ class UserPreferenceForm(BaseModelForm):
             'blocked_tags': 'Select tags whose content you don\'t want to see',
             'blocked_categories': 'Select categories whose content you don\'t want to see'
         }
+
+    def save(self, commit=True):
+        preferences = super().save(commit=commit)
+        if commit:
+            preferences.invalidate_visibility()
+        return preferences
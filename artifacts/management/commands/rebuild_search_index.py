@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from artifacts import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the FTS5 full-text search index for artifacts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Artifacts read and indexed per batch')
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Full-text search needs the SQLite backend with FTS5.')
+        total = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} artifacts.'))
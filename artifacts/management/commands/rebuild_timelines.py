@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from artifacts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized personal feed timelines from current follows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*',
+                            help='Only rebuild these users (default: everyone)')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        total = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            timeline.rebuild(user_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} timelines.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from artifacts.counters import recount
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in the denormalized artifact engagement counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Artifacts recounted per batch')
+
+    def handle(self, *args, **options):
+        total = 0
+        for last_pk, fixed in recount(batch_size=options['batch_size']):
+            total += fixed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Recounted up to artifact {last_pk} ({fixed} fixed)')
+        self.stdout.write(self.style.SUCCESS(f'Fixed {total} artifacts.'))
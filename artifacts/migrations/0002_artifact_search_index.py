@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from artifacts import search
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search.create_table(schema_editor)
+    search.rebuild_index(apps.get_model('artifacts', 'Artifact'))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    search.drop_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artifacts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
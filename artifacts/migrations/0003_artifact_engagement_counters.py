@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    Artifact = apps.get_model('artifacts', 'Artifact')
+    Comment = apps.get_model('artifacts', 'Comment')
+    comments = (Comment.objects.filter(artifact=OuterRef('pk')).order_by()
+                .values('artifact').annotate(total=Count('pk')).values('total'))
+    Artifact.objects.update(comment_count=Coalesce(Subquery(comments), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artifacts', '0002_artifact_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artifact',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artifact',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artifact',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
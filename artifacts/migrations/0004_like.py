@@ -0,0 +1,29 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('artifacts', '0003_artifact_engagement_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Like',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('artifact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='artifacts.artifact')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifact_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(fields=('user', 'artifact'), name='unique_like_per_user'),
+        ),
+    ]
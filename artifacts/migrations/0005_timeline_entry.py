@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:50
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def build_timelines(apps, schema_editor):
+    # Same entries as artifacts.timeline.rebuild(): each user's own artifacts
+    # and those of the authors they follow, FEED_BACKFILL_SIZE per author,
+    # leaving out authors read at request time (more than FEED_FANOUT_LIMIT followers)
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Artifact = apps.get_model('artifacts', 'Artifact')
+    UserPreference = apps.get_model('artifacts', 'UserPreference')
+    TimelineEntry = apps.get_model('artifacts', 'TimelineEntry')
+    celebrities = set(
+        User.objects.annotate(follower_total=Count('followers'))
+        .filter(follower_total__gt=settings.FEED_FANOUT_LIMIT).values_list('pk', flat=True)
+    )
+    for user_id in list(User.objects.order_by('pk').values_list('pk', flat=True)):
+        followed = UserPreference.objects.filter(user_id=user_id).values_list('following', flat=True)
+        authors = [user_id, *{pk for pk in followed if pk not in (None, user_id) and pk not in celebrities}]
+        entries = []
+        for author_id in authors:
+            recent = (Artifact.objects.filter(user_id=author_id).order_by('-created_at')
+                      .values_list('pk', 'created_at')[:settings.FEED_BACKFILL_SIZE])
+            entries.extend(
+                TimelineEntry(user_id=user_id, artifact_id=pk, author_id=author_id, created_at=created_at)
+                for pk, created_at in recent
+            )
+        TimelineEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('artifacts', '0004_like'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('artifact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='artifacts.artifact')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-created_at', '-artifact'], name='timeline_user_recent'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'artifact'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(build_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artifacts', '0006_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artifact',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
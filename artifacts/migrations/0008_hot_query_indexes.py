@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artifacts', '0007_artifact_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['-created_at', '-id'], name='artifact_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['-popularity_score', '-id'], name='artifact_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='artifact_category_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['category', '-popularity_score', '-id'], name='artifact_category_popular'),
+        ),
+        migrations.AddIndex(
+            model_name='artifact',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='artifact_user_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['artifact', '-created_at'], name='comment_artifact_recent'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-18 14:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('artifacts', '0008_hot_query_indexes'),
+    ]
+
+    operations = [
+        # Existing likes are already part of popularity_score
+        migrations.AddField(
+            model_name='like',
+            name='counted',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='counted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(condition=models.Q(('counted', False)), fields=['artifact'], name='like_uncounted'),
+        ),
+    ]
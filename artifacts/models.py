@@ -5,6 +5,11 @@ from django_ckeditor_5.fields import CKEditor5Field
 from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFit, SmartResize
 
+from core.local_cache import local_cache
+from core.renditions import Renditions, status_field
+
+VISIBILITY_NAMESPACE = 'visibility'
+
 class Category(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True)
@@ -37,12 +42,34 @@ class UserPreference(models.Model):
                                options={'quality': 85},
                                blank=True,
                                null=True)
+    original_avatar = models.ImageField(upload_to='originals/avatars/', blank=True, null=True, editable=False)
+    avatar_status = status_field()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    avatar_renditions = Renditions(upload='avatar', original='original_avatar',
+                                   status='avatar_status', targets=('avatar',))
+
     def __str__(self):
         return f"Preferences for {self.user.username}"
 
+    def save(self, *args, **kwargs):
+        self.avatar_renditions.defer(self)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def visibility_namespace(user_id):
+        # One per user, so a block list change only drops that user's profile
+        return f'{VISIBILITY_NAMESPACE}:{user_id}'
+
+    @staticmethod
+    def visibility_cache_key(user_id):
+        return f'visibility:{user_id}'
+
+    def invalidate_visibility(self):
+        """Drop the cached visibility profile after the block lists change"""
+        local_cache.invalidate(self.visibility_namespace(self.user_id), self.visibility_cache_key(self.user_id))
+
     def is_following(self, user):
         return self.following.filter(id=user.id).exists()
 
@@ -62,10 +89,12 @@ class UserPreference(models.Model):
         self.blocked_users.add(user)
         self.following.remove(user)  # Automatically unfollow when blocking
         self.save()
+        self.invalidate_visibility()
 
     def unblock(self, user):
         self.blocked_users.remove(user)
         self.save()
+        self.invalidate_visibility()
 
 class Artifact(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='artifacts', null=True)
@@ -85,22 +114,46 @@ class Artifact(models.Model):
                                   options={'quality': 80},
                                   blank=True,
                                   null=True)
+    # The upload as received; image and thumbnail are rendered from it by the
+    # process_renditions worker
+    original_image = models.ImageField(upload_to='originals/artifacts/', blank=True, null=True, editable=False)
+    image_status = status_field()
+    # Responsive renditions of image for srcset: name, type, width, height
+    image_variants = models.JSONField(default=list, blank=True, editable=False)
     popularity_score = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    # Denormalized engagement counters, kept current with F() updates
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    like_count = models.PositiveIntegerField(default=0, editable=False)
+    view_count = models.PositiveIntegerField(default=0, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='artifacts')
     tags = models.ManyToManyField(Tag, blank=True, related_name='artifacts')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    image_renditions = Renditions(upload='image', original='original_image',
+                                  status='image_status', targets=('image', 'thumbnail'),
+                                  variants='image_variants')
+
     class Meta:
         ordering = ['-created_at']
+        # Each list sort, with the primary key tiebreaker of keyset pagination
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='artifact_recent'),
+            models.Index(fields=['-popularity_score', '-id'], name='artifact_popular'),
+            models.Index(fields=['category', '-created_at', '-id'], name='artifact_category_recent'),
+            models.Index(fields=['category', '-popularity_score', '-id'], name='artifact_category_popular'),
+            models.Index(fields=['user', '-created_at', '-id'], name='artifact_user_recent'),
+        ]
 
     def __str__(self):
         return f"{self.title} by {self.user.username if self.user else 'unknown'}"
 
+    @property
+    def image_pending(self):
+        return self.image_renditions.is_pending(self)
+
     def save(self, *args, **kwargs):
-        # Generate thumbnail from main image if not provided
-        if self.image and not self.thumbnail:
-            self.thumbnail = self.image
+        self.image_renditions.defer(self)
         super().save(*args, **kwargs)
 
 class Comment(models.Model):
@@ -112,6 +165,47 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['artifact', '-created_at'], name='comment_artifact_recent'),
+        ]
 
     def __str__(self):
         return f'Comment by {self.user.username if self.user else "unknown"} on {self.artifact.title}'
+
+class Like(models.Model):
+    """One like per user per artifact; the counters are flushed in batches"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='artifact_likes')
+    artifact = models.ForeignKey(Artifact, on_delete=models.CASCADE, related_name='likes')
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the flush has added this like to popularity_score
+    counted = models.BooleanField(default=False, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'artifact'], name='unique_like_per_user'),
+        ]
+        indexes = [
+            models.Index(fields=['artifact'], name='like_uncounted', condition=models.Q(counted=False)),
+        ]
+
+    def __str__(self):
+        return f'{self.user} likes {self.artifact_id}'
+
+class TimelineEntry(models.Model):
+    """An artifact fanned out into the feed of one of its author's followers"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    artifact = models.ForeignKey(Artifact, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    # Copy of artifact.created_at so the feed is a range scan on this table
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'artifact'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-artifact'], name='timeline_user_recent'),
+        ]
+
+    def __str__(self):
+        return f'{self.artifact_id} in {self.user_id}\'s timeline'
@@ -0,0 +1,143 @@
+"""
+SQLite FTS5 full-text index for artifacts.
+
+The index is a standalone FTS5 table keyed by artifact id (its rowid), holding
+the title, the description with markup stripped and the tag names. Signals
+keep it in sync; ``rebuild_index`` refills it in bulk. On other database
+backends search falls back to the old icontains filters.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+
+FTS_TABLE = 'artifacts_artifact_fts'
+
+# bm25() column weights: title, description, tags
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def create_table(schema_editor):
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+        f"USING fts5(title, description, tags, tokenize='porter unicode61')"
+    )
+
+
+def drop_table(schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def document(title, description, tag_names):
+    return (title, strip_tags(description or ''), ' '.join(tag_names))
+
+
+def _write(cursor, rows):
+    """rows are (artifact_id, title, description, tags) tuples"""
+    cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+    cursor.executemany(
+        f'INSERT INTO {FTS_TABLE} (rowid, title, description, tags) VALUES (%s, %s, %s, %s)',
+        rows,
+    )
+
+
+def index_artifact(artifact):
+    if not is_available():
+        return
+    # Goes through the prefetch cache when the caller loaded the tags
+    tag_names = [tag.name for tag in artifact.tags.all()]
+    with connection.cursor() as cursor:
+        _write(cursor, [(artifact.pk, *document(artifact.title, artifact.description, tag_names))])
+
+
+def index_artifacts(artifact_ids):
+    from .models import Artifact
+
+    for artifact in Artifact.objects.filter(pk__in=list(artifact_ids)).prefetch_related('tags'):
+        index_artifact(artifact)
+
+
+def remove_artifact(artifact_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [artifact_id])
+
+
+def rebuild_index(artifact_model=None, batch_size=1000):
+    """Refill the whole index in primary key batches. Returns the row count."""
+    if artifact_model is None:
+        from .models import Artifact as artifact_model
+
+    total, last_pk = 0, 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        while True:
+            batch = list(
+                artifact_model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .only('pk', 'title', 'description').prefetch_related('tags')[:batch_size]
+            )
+            if not batch:
+                return total
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, description, tags) VALUES (%s, %s, %s, %s)',
+                [(a.pk, *document(a.title, a.description, [t.name for t in a.tags.all()])) for a in batch],
+            )
+            total += len(batch)
+            last_pk = batch[-1].pk
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so user input can never be parsed
+    as FTS5 syntax, and all words must match.
+    """
+    tokens = TOKEN_RE.findall(text or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _bm25():
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    return f'bm25({FTS_TABLE}, {weights})'
+
+
+def matching_ids(match, limit=None):
+    """
+    Subquery of the artifact ids matching a MATCH expression, for a pk__in
+    filter. With a limit, only that many of the best ranked.
+    """
+    sql = f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    if limit is None:
+        return RawSQL(sql, [match])
+    return RawSQL(f'{sql} ORDER BY {_bm25()} LIMIT %s', [match, limit])
+
+
+def rank(match, column):
+    """bm25 rank of the artifact whose id is in column, lower is better, for annotate()"""
+    return RawSQL(
+        f'SELECT {_bm25()} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {column}',
+        [match], output_field=FloatField(),
+    )
+
+
+def search_artifact_ids(text, limit):
+    """Artifact ids matching the text, best bm25 rank first"""
+    match = build_match_query(text)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY {_bm25()} LIMIT %s',
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
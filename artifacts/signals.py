@@ -0,0 +1,126 @@
+from django.core.signals import request_finished
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import search, timeline
+from .caching import invalidate_artifact_lists, invalidate_categories
+from .counters import adjust_counters, view_buffer
+from .likes import like_buffer
+from .models import Artifact, Category, Comment, Tag, UserPreference
+
+
+@receiver(post_save, sender=Artifact)
+@receiver(post_delete, sender=Artifact)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def artifact_changed(sender, **kwargs):
+    invalidate_artifact_lists()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    invalidate_categories()
+
+
+@receiver(m2m_changed, sender=Artifact.tags.through)
+def artifact_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # tag.artifacts.clear() does not report which artifacts it touched
+        instance._search_artifact_ids = list(instance.artifacts.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_artifact_lists()
+    if not reverse:
+        search.index_artifact(instance)
+    elif action == 'post_clear':
+        search.index_artifacts(getattr(instance, '_search_artifact_ids', ()))
+    else:
+        search.index_artifacts(pk_set)
+
+
+@receiver(post_save, sender=Artifact)
+def index_saved_artifact(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_artifact(instance)
+
+
+@receiver(post_delete, sender=Artifact)
+def unindex_deleted_artifact(sender, instance, **kwargs):
+    search.remove_artifact(instance.pk)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_artifacts_for_deleted_tag(sender, instance, **kwargs):
+    instance._search_artifact_ids = list(instance.artifacts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def reindex_artifacts_for_deleted_tag(sender, instance, **kwargs):
+    search.index_artifacts(getattr(instance, '_search_artifact_ids', ()))
+
+
+@receiver(post_save, sender=Tag)
+def reindex_artifacts_for_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_artifacts(instance.artifacts.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=UserPreference.blocked_users.through)
+@receiver(m2m_changed, sender=UserPreference.blocked_tags.through)
+@receiver(m2m_changed, sender=UserPreference.blocked_categories.through)
+def block_list_changed(sender, instance, action, reverse, **kwargs):
+    """Block list edits (including the admin) change the viewer's fingerprint"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Changed from the blocked object's side: every affected preference
+        for preferences in UserPreference.objects.filter(pk__in=kwargs.get('pk_set') or ()):
+            preferences.invalidate_visibility()
+    else:
+        instance.invalidate_visibility()
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust_counters(instance.artifact_id, comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    adjust_counters(instance.artifact_id, comment_count=-1)
+
+
+@receiver(request_finished)
+def flush_like_buffer(sender, **kwargs):
+    like_buffer.maybe_flush()
+
+
+@receiver(request_finished)
+def flush_view_buffer(sender, **kwargs):
+    view_buffer.maybe_flush()
+
+
+@receiver(post_save, sender=Artifact)
+def fan_out_artifact(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(m2m_changed, sender=UserPreference.following.through)
+def following_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # user.followers.add(preferences): instance is the followed user
+        follows = UserPreference.objects.filter(pk__in=pk_set or ()).values_list('user_id', flat=True)
+        pairs = [(user_id, [instance.pk]) for user_id in follows]
+    else:
+        pairs = [(instance.user_id, pk_set)]
+
+    for user_id, author_ids in pairs:
+        if action == 'post_add':
+            timeline.backfill(user_id, author_ids)
+        elif action == 'post_remove':
+            timeline.unfollow(user_id, author_ids)
+    if action == 'post_clear' and not reverse:
+        timeline.unfollow_all(instance.user_id)
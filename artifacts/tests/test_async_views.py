@@ -0,0 +1,69 @@
+"""
+Tests for the async artifact views under ASGI, with queries in worker threads.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from artifacts.models import Artifact, Category, UserPreference
+from core import benchmark
+
+User = get_user_model()
+
+
+# Committed rows, since the worker threads use their own connections
+@override_settings(ASYNC_PARALLEL_QUERIES=True, QUERY_COUNT_HEADER=True)
+class AsyncViewTest(TransactionTestCase):
+    """The read paths work through the async handler."""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', password='testpassword')
+        self.author = User.objects.create_user(username='author', password='testpassword')
+        UserPreference.objects.create(user=self.viewer).follow(self.author)
+        self.category = Category.objects.create(name='Cameras')
+        self.artifacts = [Artifact.objects.create(user=self.author, title=f'Camera {i}', category=self.category)
+                          for i in range(3)]
+        self.async_client.force_login(self.viewer)
+
+    async def test_artifact_list(self):
+        response = await self.async_client.get(reverse('artifact_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Camera 2')
+        self.assertContains(response, 'Cameras')
+        # Queries in the worker threads are counted too
+        self.assertGreater(int(response['X-Query-Count']), 3)
+
+    async def test_infinite_scroll(self):
+        # AsyncClient takes extra headers by their HTTP name
+        response = await self.async_client.get(reverse('artifact_list'), {'category': self.category.pk},
+                                               **{'X-Requested-With': 'XMLHttpRequest'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Camera 0', response.json()['html'])
+
+    async def test_artifact_detail(self):
+        response = await self.async_client.get(reverse('artifact_detail', args=[self.artifacts[0].pk]))
+        self.assertContains(response, 'Camera 0')
+        response = await self.async_client.get(reverse('artifact_detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_user_feed(self):
+        response = await self.async_client.get(reverse('user_feed'))
+        self.assertContains(response, 'Camera 1')
+
+    async def test_login_required(self):
+        response = await AsyncClient().get(reverse('user_feed'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('login'), response['Location'])
+
+    def test_benchmark_counts_worker_thread_queries(self):
+        self.client.force_login(self.viewer)
+        scenario = next(s for s in benchmark.SCENARIOS if s.name == 'artifact_list')
+        parallel = benchmark.measure(self.client, scenario, {}, iterations=1, warmup=0)
+        with override_settings(ASYNC_PARALLEL_QUERIES=False):
+            serial = benchmark.measure(self.client, scenario, {}, iterations=1, warmup=0)
+        self.assertGreater(parallel['queries'], 3)
+        self.assertEqual((parallel['queries'], parallel['cold_queries']),
+                         (serial['queries'], serial['cold_queries']))
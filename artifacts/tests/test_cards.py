@@ -0,0 +1,72 @@
+"""
+Tests for the artifact card fragment cache.
+"""
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from artifacts import cards
+from artifacts.models import Artifact, Category, Tag
+
+User = get_user_model()
+
+
+def load(*artifacts):
+    return list(Artifact.objects.select_related('category', 'user').prefetch_related('tags')
+                .filter(pk__in=[a.pk for a in artifacts]).order_by('-created_at'))
+
+
+class CardCacheTest(TestCase):
+    """Cards are read in one get_many and only misses are rendered."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpassword')
+        self.category = Category.objects.create(name='Cameras')
+        self.first = Artifact.objects.create(user=self.author, title='Leica M3', category=self.category)
+        self.second = Artifact.objects.create(user=self.author, title='Rolleiflex')
+
+    def render_count(self, artifacts):
+        with mock.patch('artifacts.cards.render_card', wraps=cards.render_card) as render:
+            result = cards.get_cards(artifacts)
+        return render.call_count, result
+
+    def test_only_misses_are_rendered(self):
+        self.assertEqual(self.render_count(load(self.first))[0], 1)
+        rendered, result = self.render_count(load(self.first, self.second))
+        self.assertEqual(rendered, 1)
+        self.assertEqual([card.artifact.pk for card in result], [self.second.pk, self.first.pk])
+
+    def test_single_get_many(self):
+        with mock.patch('artifacts.cards.cache') as backend:
+            backend.get_many.return_value = {}
+            cards.get_cards(load(self.first, self.second))
+        backend.get_many.assert_called_once()
+        backend.set_many.assert_called_once()
+        self.assertEqual(len(backend.set_many.call_args[0][0]), 2)
+
+    def test_edit_changes_the_key(self):
+        before = cards.card_cache_key(load(self.first)[0])
+        self.first.title = 'Leica M2'
+        self.first.save()
+        self.assertNotEqual(cards.card_cache_key(load(self.first)[0]), before)
+
+    def test_retag_and_rename_change_the_key(self):
+        before = cards.card_cache_key(load(self.first)[0])
+        self.first.tags.add(Tag.objects.create(name='rangefinder'))
+        tagged = cards.card_cache_key(load(self.first)[0])
+        self.assertNotEqual(tagged, before)
+
+        self.category.name = 'Film cameras'
+        self.category.save()
+        self.assertNotEqual(cards.card_cache_key(load(self.first)[0]), tagged)
+
+    def test_counters_are_rendered_live(self):
+        self.client.login(username='author', password='testpassword')
+        self.client.get('/')
+        Artifact.objects.filter(pk=self.first.pk).update(like_count=7)
+        response = self.client.get(f'/user/{self.author.username}/')
+        self.assertContains(response, '7 Likes')
+        self.assertContains(response, 'Leica M3')
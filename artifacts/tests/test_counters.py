@@ -0,0 +1,122 @@
+"""
+Tests for the denormalized artifact engagement counters.
+"""
+
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from artifacts.counters import view_buffer
+from artifacts.likes import like_buffer
+from artifacts.models import Artifact, Category, Comment, Like, Tag
+
+User = get_user_model()
+
+
+class EngagementCounterTest(TestCase):
+    """Comments, likes and views keep the counters current."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='collector', password='testpassword')
+        self.artifact = Artifact.objects.create(user=self.user, title='Hasselblad 500C/M')
+        self.client.force_login(self.user)
+
+    def test_comment_create_and_delete(self):
+        comment = Comment.objects.create(user=self.user, artifact=self.artifact, text='Lovely')
+        Comment.objects.create(user=self.user, artifact=self.artifact, text='Mint')
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.comment_count, 2)
+        comment.delete()
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.comment_count, 1)
+
+    def test_like_does_not_touch_updated_at(self):
+        updated_at = self.artifact.updated_at
+        self.client.post(f'/{self.artifact.pk}/like/')
+        like_buffer.flush()
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.like_count, 1)
+        self.assertEqual(self.artifact.popularity_score, 1)
+        self.assertEqual(self.artifact.updated_at, updated_at)
+
+    def test_detail_counts_views(self):
+        self.client.get(f'/{self.artifact.pk}/')
+        self.client.get(f'/{self.artifact.pk}/')
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.view_count, 2)
+
+    @override_settings(VIEW_BUFFER_FLUSH_INTERVAL=60)
+    def test_views_are_written_in_batches(self):
+        other = Artifact.objects.create(user=self.user, title='Leica M3')
+        self.addCleanup(view_buffer.flush)
+        view_buffer.flush()
+        with CaptureQueriesContext(connection) as ctx:
+            for pk in (self.artifact.pk, self.artifact.pk, other.pk):
+                self.client.get(f'/{pk}/')
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "artifacts_artifact"')]
+        self.assertEqual(updates, [])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(view_buffer.flush(), {self.artifact.pk: 2, other.pk: 1})
+        # One UPDATE per distinct number of new views
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "artifacts_artifact"')]
+        self.assertEqual(len(updates), 2)
+        self.artifact.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.artifact.view_count, other.view_count), (2, 1))
+
+    def test_failed_view_flush_keeps_the_views(self):
+        view_buffer.add(self.artifact.pk)
+        with mock.patch.object(QuerySet, 'update', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                view_buffer.flush()
+        self.assertEqual(view_buffer.flush(), {self.artifact.pk: 1})
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.view_count, 1)
+
+    def test_recount_repairs_drift(self):
+        Comment.objects.create(user=self.user, artifact=self.artifact, text='Lovely')
+        Like.objects.create(user=self.user, artifact=self.artifact)
+        Artifact.objects.filter(pk=self.artifact.pk).update(comment_count=7, popularity_score=40)
+        call_command('recount', batch_size=1, stdout=StringIO())
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.comment_count, 1)
+        self.assertEqual(self.artifact.like_count, 1)
+        # Scores predate the Like rows and are not derived from them
+        self.assertEqual(self.artifact.popularity_score, 40)
+
+
+class ConstantQueryBatchTest(TestCase):
+    """A batch of cards costs the same number of queries however large it is."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='collector', password='testpassword')
+        self.category = Category.objects.create(name='Cameras')
+        self.tag = Tag.objects.create(name='vintage')
+
+    def add_artifacts(self, count):
+        for i in range(count):
+            artifact = Artifact.objects.create(user=self.user, title=f'Camera {i}', category=self.category)
+            artifact.tags.add(self.tag)
+            Comment.objects.create(user=self.user, artifact=artifact, text='Nice')
+
+    def batch_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return len(ctx.captured_queries)
+
+    def test_batch_query_count_is_constant(self):
+        self.add_artifacts(2)
+        small = self.batch_queries()
+        self.add_artifacts(10)
+        self.assertEqual(self.batch_queries(), small)
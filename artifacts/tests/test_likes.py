@@ -0,0 +1,88 @@
+"""
+Tests for the write-coalescing like buffer.
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from artifacts.likes import LikeBuffer, like_buffer, record_like
+from artifacts.models import Artifact, Like
+
+User = get_user_model()
+
+
+class LikeBufferTest(TestCase):
+    """Likes are deduplicated per user and flushed as one UPDATE per artifact."""
+
+    def setUp(self):
+        cache.clear()
+        like_buffer.flush()
+        self.author = User.objects.create_user(username='author', password='testpassword')
+        self.artifact = Artifact.objects.create(user=self.author, title='Rolleiflex 2.8F')
+        self.fans = [User.objects.create_user(username=f'fan{i}', password='testpassword') for i in range(20)]
+
+    def test_one_like_per_user(self):
+        self.assertTrue(record_like(self.fans[0], self.artifact.pk))
+        self.assertFalse(record_like(self.fans[0], self.artifact.pk))
+        cache.clear()  # forget the in-cache dedupe; the constraint still holds
+        self.assertFalse(record_like(self.fans[0], self.artifact.pk))
+        self.assertEqual(Like.objects.count(), 1)
+
+    def test_burst_is_flushed_in_a_single_update(self):
+        for fan in self.fans:
+            record_like(fan, self.artifact.pk)
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.popularity_score, 0)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(like_buffer.flush(), {self.artifact.pk: 20})
+        updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "artifacts_artifact"')]
+        self.assertEqual(len(updates), 1)
+
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.popularity_score, 20)
+        self.assertEqual(self.artifact.like_count, 20)
+        self.assertEqual(like_buffer.flush(), {})
+
+    def test_flush_adds_to_the_existing_score(self):
+        Artifact.objects.filter(pk=self.artifact.pk).update(popularity_score=50)
+        record_like(self.fans[0], self.artifact.pk)
+        like_buffer.flush()
+        self.assertEqual(like_buffer.flush(), {})
+        self.artifact.refresh_from_db()
+        self.assertEqual((self.artifact.popularity_score, self.artifact.like_count), (51, 1))
+
+    def test_any_worker_flushes_likes(self):
+        for fan in self.fans[:3]:
+            record_like(fan, self.artifact.pk)
+        # A worker that recorded nothing itself, e.g. after the first one died
+        self.assertEqual(LikeBuffer().flush(), {self.artifact.pk: 3})
+        self.assertEqual(like_buffer.flush(), {})
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.popularity_score, 3)
+
+    def test_idle_flush_skips_the_database(self):
+        buffer = LikeBuffer()
+        buffer._last_flush -= 60
+        with self.assertNumQueries(0):
+            self.assertIsNone(buffer.maybe_flush())
+        record_like(self.fans[0], self.artifact.pk)
+        buffer._last_flush -= 60
+        self.assertEqual(buffer.maybe_flush(), {self.artifact.pk: 1})
+
+    def test_failed_insert_can_be_retried(self):
+        with mock.patch.object(Like.objects, 'create', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                record_like(self.fans[0], self.artifact.pk)
+        self.assertTrue(record_like(self.fans[0], self.artifact.pk))
+
+    def test_like_view_reports_duplicates(self):
+        self.client.force_login(self.fans[0])
+        self.client.post(f'/{self.artifact.pk}/like/')
+        response = self.client.post(f'/{self.artifact.pk}/like/', follow=True)
+        self.assertContains(response, 'already liked')
@@ -0,0 +1,55 @@
+"""
+Tests for the viewer-aware artifact_list cache.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+
+from artifacts.models import Artifact, Tag, UserPreference
+
+User = get_user_model()
+
+
+class ArtifactListCacheTest(TestCase):
+    """Pages are shared between matching viewers and refreshed by signals."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpassword')
+        self.viewer = User.objects.create_user(username='viewer', password='testpassword')
+        self.artifact = Artifact.objects.create(user=self.author, title='Leica M3')
+
+    def titles(self):
+        response = self.client.get('/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return response.json()['html']
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        return [q['sql'] for q in ctx.captured_queries if 'LIMIT' in q['sql']]
+
+    def test_second_request_skips_the_list_query(self):
+        self.assertTrue(self.list_queries())
+        self.assertEqual(self.list_queries(), [])
+
+    def test_new_artifact_invalidates(self):
+        self.assertIn('Leica M3', self.titles())
+        Artifact.objects.create(user=self.author, title='Nikon F3')
+        self.assertIn('Nikon F3', self.titles())
+
+    def test_tag_change_invalidates(self):
+        self.titles()
+        self.artifact.tags.add(Tag.objects.create(name='rangefinder'))
+        self.assertIn('rangefinder', self.titles())
+
+    def test_viewer_block_list_is_part_of_the_key(self):
+        self.assertIn('Leica M3', self.titles())
+        preferences = UserPreference.objects.create(user=self.viewer)
+        preferences.blocked_users.add(self.author)
+        self.client.force_login(self.viewer)
+        self.assertNotIn('Leica M3', self.titles())
+        self.client.logout()
+        self.assertIn('Leica M3', self.titles())
@@ -0,0 +1,189 @@
+"""
+Tests for off-request image renditions.
+"""
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from artifacts.models import Artifact, UserPreference
+from core import imaging, renditions
+from core.models import Blob
+
+User = get_user_model()
+
+
+def image_bytes(size=(1600, 1200), format='PNG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (120, 80, 40)).save(buffer, format)
+    return buffer.getvalue()
+
+
+def upload(name='photo.png', size=(1600, 1200)):
+    return SimpleUploadedFile(name, image_bytes(size), content_type='image/png')
+
+
+class RenditionPipelineTest(TestCase):
+    """Uploads are parked as originals and rendered by the worker."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.override = override_settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.user = User.objects.create_user(username='author', password='testpassword')
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_upload_is_stored_untouched_and_pending(self):
+        artifact = Artifact.objects.create(user=self.user, title='Leica M3', image=upload())
+        artifact.refresh_from_db()
+        self.assertEqual(artifact.image_status, renditions.PENDING)
+        self.assertFalse(artifact.image)
+        self.assertFalse(artifact.thumbnail)
+        self.assertTrue(artifact.original_image.name.startswith('blobs/'))
+        self.assertEqual(Image.open(artifact.original_image.path).size, (1600, 1200))
+
+    def test_worker_renders_every_target(self):
+        artifact = Artifact.objects.create(user=self.user, title='Leica M3', image=upload())
+        self.assertEqual(renditions.process_pending(), {renditions.READY: 1})
+
+        artifact.refresh_from_db()
+        self.assertEqual(artifact.image_status, renditions.READY)
+        self.assertEqual(Image.open(artifact.image.path).size, (1200, 900))
+        self.assertEqual(Image.open(artifact.thumbnail.path).size, (400, 400))
+        self.assertEqual(renditions.process_pending(), {})
+
+    def test_avatars_are_deferred_too(self):
+        self.user.avatar = upload('me.png', (800, 800))
+        self.user.save()
+        preferences = UserPreference.objects.create(user=self.user, avatar=upload('me.png', (800, 800)))
+        self.assertEqual(renditions.process_pending(), {renditions.READY: 2})
+
+        self.user.refresh_from_db()
+        preferences.refresh_from_db()
+        self.assertEqual(Image.open(self.user.avatar.path).size, (300, 300))
+        self.assertEqual(Image.open(preferences.avatar.path).size, (200, 200))
+
+    def test_claim_is_exclusive(self):
+        artifact = Artifact.objects.create(user=self.user, title='Leica M3', image=upload())
+        self.assertTrue(Artifact.image_renditions.claim(artifact.pk))
+        self.assertFalse(Artifact.image_renditions.claim(artifact.pk))
+
+    def test_unreadable_upload_fails_and_can_be_requeued(self):
+        bad = SimpleUploadedFile('broken.jpg', b'not an image', content_type='image/jpeg')
+        artifact = Artifact(user=self.user, title='Broken')
+        artifact.image = bad
+        artifact.save()
+        with self.assertLogs('core.renditions', 'ERROR'):
+            self.assertEqual(renditions.process_pending(), {renditions.FAILED: 1})
+        self.assertEqual(Artifact.image_renditions.requeue(), 1)
+        artifact.refresh_from_db()
+        self.assertEqual(artifact.image_status, renditions.PENDING)
+
+    def test_placeholder_until_ready(self):
+        artifact = Artifact.objects.create(user=self.user, title='Leica M3', image=upload())
+        self.client.login(username='author', password='testpassword')
+        response = self.client.get(f'/{artifact.pk}/')
+        self.assertContains(response, 'image-processing.svg')
+
+        renditions.process_pending()
+        response = self.client.get(f'/{artifact.pk}/')
+        self.assertNotContains(response, 'image-processing.svg')
+        self.assertContains(response, '/media/blobs/')
+
+    def test_variants_for_srcset(self):
+        artifact = Artifact.objects.create(user=self.user, title='Leica M3', image=upload())
+        renditions.process_pending()
+        artifact.refresh_from_db()
+
+        jpeg = sorted(v['width'] for v in artifact.image_variants if v['type'] == 'image/jpeg')
+        webp = sorted(v['width'] for v in artifact.image_variants if v['type'] == 'image/webp')
+        self.assertEqual(jpeg, [400, 800, 1200])
+        self.assertEqual(webp, [400, 800, 1200])
+        # The widest JPEG is the display rendition itself
+        self.assertIn({'name': artifact.image.name, 'type': 'image/jpeg', 'width': 1200, 'height': 900},
+                      artifact.image_variants)
+        for variant in artifact.image_variants:
+            with Image.open(artifact.image.storage.path(variant['name'])) as stored:
+                self.assertEqual(stored.size, (variant['width'], variant['height']))
+
+        self.client.login(username='author', password='testpassword')
+        response = self.client.get(f'/{artifact.pk}/')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, '800w')
+
+    def test_same_original_reuses_renditions(self):
+        first = Artifact.objects.create(user=self.user, title='Leica M3', image=upload())
+        renditions.process_pending()
+        second = Artifact.objects.create(user=self.user, title='Leica M3 again', image=upload('copy.png'))
+        with mock.patch('core.imaging.decode') as decode:
+            self.assertEqual(renditions.process_pending(), {renditions.READY: 1})
+        decode.assert_not_called()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.original_image.name, second.original_image.name)
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_variants, second.image_variants)
+        self.assertEqual(Blob.objects.get(name=first.image.name).references, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(second.image.storage.exists(second.image.name))
+        self.assertEqual(Blob.objects.get(name=second.image.name).references, 1)
+
+
+    def test_replaced_upload_releases_old_files(self):
+        artifact = Artifact.objects.create(user=self.user, title='Leica M3', image=upload())
+        renditions.process_pending()
+        artifact.refresh_from_db()
+        storage = artifact.image.storage
+        old = [artifact.original_image.name, artifact.image.name, artifact.thumbnail.name]
+        old += [variant['name'] for variant in artifact.image_variants]
+
+        artifact.image = upload('new.png', (1000, 800))
+        with self.captureOnCommitCallbacks(execute=True):
+            artifact.save()
+        renditions.process_pending()
+        artifact.refresh_from_db()
+        current = {artifact.original_image.name, artifact.image.name, artifact.thumbnail.name}
+        current |= {variant['name'] for variant in artifact.image_variants}
+        # Both uploads are one flat colour, so their square thumbnails match
+        self.assertEqual(set(old) & current, {artifact.thumbnail.name})
+        for name in set(old) - current:
+            self.assertFalse(storage.exists(name), name)
+            self.assertFalse(Blob.objects.filter(name=name).exists())
+        for name in current:
+            self.assertEqual(Blob.objects.get(name=name).references, 1)
+
+        # The same content again takes a new reference and drops the old one
+        original = artifact.original_image.name
+        artifact.image = upload('new.png', (1000, 800))
+        with self.captureOnCommitCallbacks(execute=True):
+            artifact.save()
+        artifact.refresh_from_db()
+        self.assertEqual(artifact.original_image.name, original)
+        self.assertEqual(Blob.objects.get(name=original).references, 1)
+
+class DecodeTest(SimpleTestCase):
+    """JPEG sources are draft-decoded no smaller than the outputs need."""
+
+    def test_draft_keeps_required_edges(self):
+        image = imaging.decode(image_bytes((4000, 3000), 'JPEG'), (1200, 400))
+        self.assertEqual(image.size, (2000, 1500))
+
+    def test_short_edge_requirement(self):
+        image = imaging.decode(image_bytes((4000, 1000), 'JPEG'), (1200, 400))
+        self.assertEqual(image.size, (2000, 500))
+
+    def test_unknown_processors_decode_full_size(self):
+        self.assertIsNone(imaging.required_edges([object()]))
+        image = imaging.decode(image_bytes((4000, 3000), 'JPEG'), None)
+        self.assertEqual(image.size, (4000, 3000))
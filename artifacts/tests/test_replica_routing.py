@@ -0,0 +1,63 @@
+"""
+Tests for replica routing through the real middleware and views.
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from artifacts.models import Artifact, UserPreference
+from core import replicas
+
+User = get_user_model()
+
+
+# Not a TestCase: its transaction would keep every read on the primary
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaPinningTest(TransactionTestCase):
+    """Reading an artifact does not pin the reader to the primary; writing does."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='testpassword')
+        self.author = User.objects.create_user(username='author', password='testpassword')
+        self.artifact = Artifact.objects.create(user=self.author, title='Leica M3')
+        self.client.force_login(self.reader)
+
+        # Record where reads would go, but serve them from the test database
+        self.routed = []
+        db_for_read = replicas.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            self.routed.append(db_for_read(router, model, **hints))
+            return 'default'
+        patcher = mock.patch.object(replicas.ReplicaRouter, 'db_for_read', autospec=True, side_effect=record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_detail_view_does_not_pin(self):
+        self.assertFalse(UserPreference.objects.filter(user=self.reader).exists())
+        response = self.client.get(reverse('artifact_detail', args=[self.artifact.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.artifact.refresh_from_db()
+        self.assertEqual(self.artifact.view_count, 1)
+        # The view count and the reader's new preferences row were both written
+        self.assertTrue(UserPreference.objects.filter(user=self.reader).exists())
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+        self.routed.clear()
+        self.client.get(reverse('artifact_list'))
+        self.assertIn('replica', self.routed)
+
+    def test_comment_pins(self):
+        response = self.client.post(reverse('artifact_detail', args=[self.artifact.pk]), {'text': 'Lovely'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        self.routed.clear()
+        self.client.get(reverse('artifact_list'))
+        self.assertTrue(self.routed)
+        self.assertNotIn('replica', self.routed)
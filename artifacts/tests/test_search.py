@@ -0,0 +1,95 @@
+"""
+Tests for the FTS5 artifact search index.
+"""
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from artifacts import search
+from artifacts.forms import ArtifactForm
+from artifacts.models import Artifact, Tag
+from core.pagination import encode_cursor
+
+User = get_user_model()
+
+
+class ArtifactSearchTest(TestCase):
+    """The index follows artifact and tag changes and ranks with bm25."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='collector', password='testpassword')
+        self.camera = Artifact.objects.create(
+            user=self.user, title='Leica rangefinder', description='<p>A <strong>camera</strong> body</p>')
+        self.mention = Artifact.objects.create(
+            user=self.user, title='Camera strap', description='<p>Fits any leica</p>')
+        self.typewriter = Artifact.objects.create(user=self.user, title='Olivetti Lettera')
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(search.search_artifact_ids('leica', 10), [self.camera.pk, self.mention.pk])
+
+    def test_description_is_indexed_without_markup(self):
+        self.assertEqual(search.search_artifact_ids('strong', 10), [])
+        self.assertIn(self.camera.pk, search.search_artifact_ids('body', 10))
+
+    def test_prefix_and_syntax_safe(self):
+        self.assertEqual(search.search_artifact_ids('olive', 10), [self.typewriter.pk])
+        self.assertEqual(search.search_artifact_ids('"NEAR(* AND', 10), [])
+
+    def test_tags_follow_m2m_changes(self):
+        tag = Tag.objects.create(name='portable')
+        self.typewriter.tags.add(tag)
+        self.assertEqual(search.search_artifact_ids('portable', 10), [self.typewriter.pk])
+        tag.name = 'compact'
+        tag.save()
+        self.assertEqual(search.search_artifact_ids('compact', 10), [self.typewriter.pk])
+        tag.delete()
+        self.assertEqual(search.search_artifact_ids('compact', 10), [])
+
+    def test_form_save_indexes_tags(self):
+        form = ArtifactForm({'title': 'Polaroid SX-70', 'description': '', 'tags': 'instant, folding'})
+        self.assertTrue(form.is_valid(), form.errors)
+        artifact = form.save()
+        self.assertEqual(search.search_artifact_ids('folding', 10), [artifact.pk])
+
+    def test_delete_removes_from_index(self):
+        self.typewriter.delete()
+        self.assertEqual(search.search_artifact_ids('olivetti', 10), [])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.FTS_TABLE}')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search.search_artifact_ids('leica', 10)), 2)
+
+    def test_artifact_list_uses_ranked_search(self):
+        response = self.client.get('/', {'q': 'leica'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        html = response.json()['html']
+        self.assertLess(html.index('Leica rangefinder'), html.index('Camera strap'))
+        self.assertNotIn('Olivetti', html)
+
+    def test_ranked_search_pages_by_rank(self):
+        with self.settings(INFINITE_SCROLL_BATCH_SIZE=1):
+            first = self.client.get('/', {'q': 'leica'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+            second = self.client.get('/', {'q': 'leica', 'cursor': first['next_cursor']},
+                                     HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+        self.assertIn('Leica rangefinder', first['html'])
+        self.assertIn('Camera strap', second['html'])
+
+    def test_garbage_search_cursor_falls_back(self):
+        for values in (['zz', 1], [{'a': 1}, 1], [None, 1]):
+            with self.subTest(values=values):
+                response = self.client.get('/', {'q': 'leica', 'cursor': encode_cursor(values)})
+                self.assertContains(response, 'Leica rangefinder')
+
+    @override_settings(ARTIFACT_SEARCH_MAX_RESULTS=1)
+    def test_explicit_sort_sees_every_match(self):
+        response = self.client.get('/', {'q': 'leica', 'sort': '-created_at'}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        html = response.json()['html']
+        self.assertIn('Leica rangefinder', html)
+        self.assertIn('Camera strap', html)
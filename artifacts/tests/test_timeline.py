@@ -0,0 +1,92 @@
+"""
+Tests for fan-out-on-write follower timelines.
+"""
+
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from artifacts.models import Artifact, Tag, TimelineEntry, UserPreference
+from artifacts.timeline import read_timeline
+from artifacts.visibility import get_visibility_profile
+from core.pagination import encode_cursor
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    """Feeds contain followed authors' artifacts, newest first."""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', password='testpassword')
+        self.friend = User.objects.create_user(username='friend', password='testpassword')
+        self.stranger = User.objects.create_user(username='stranger', password='testpassword')
+        self.preferences = UserPreference.objects.create(user=self.viewer)
+        self.preferences.follow(self.friend)
+
+    def feed(self, user=None, cursor=None, per_page=10):
+        user = user or self.viewer
+        return read_timeline(user, get_visibility_profile(user), cursor=cursor, per_page=per_page)
+
+    def test_fan_out_on_create(self):
+        mine = Artifact.objects.create(user=self.viewer, title='Mine')
+        theirs = Artifact.objects.create(user=self.friend, title='Friend')
+        Artifact.objects.create(user=self.stranger, title='Stranger')
+        self.assertEqual([a.pk for a in self.feed()], [theirs.pk, mine.pk])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        older = Artifact.objects.create(user=self.stranger, title='Older')
+        self.preferences.follow(self.stranger)
+        self.assertIn(older, list(self.feed()))
+        self.preferences.unfollow(self.stranger)
+        self.assertNotIn(older, list(self.feed()))
+        self.preferences.block(self.friend)
+        self.assertFalse(TimelineEntry.objects.filter(user=self.viewer, author=self.friend).exists())
+
+    def test_blocked_tags_are_filtered(self):
+        hidden = Artifact.objects.create(user=self.friend, title='Hidden')
+        tag = Tag.objects.create(name='spoilers')
+        hidden.tags.add(tag)
+        shown = Artifact.objects.create(user=self.friend, title='Shown')
+        self.preferences.blocked_tags.add(tag)
+        self.assertEqual(list(self.feed()), [shown])
+
+    def test_cursor_walks_every_entry_once(self):
+        created = [Artifact.objects.create(user=self.friend, title=f'A{i}').pk for i in range(7)]
+        seen, cursor = [], None
+        while True:
+            page = self.feed(cursor=cursor, per_page=3)
+            seen.extend(a.pk for a in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, created[::-1])
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        artifact = Artifact.objects.create(user=self.friend, title='Friend')
+        self.client.force_login(self.viewer)
+        for values in (['x', 1], [None, 1], ['2020-01-01T00:00:00', 'x'], 'x'):
+            response = self.client.get(reverse('user_feed'), {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, artifact.title)
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_celebrities_are_merged_on_read(self):
+        cache.clear()
+        post = Artifact.objects.create(user=self.friend, title='Celebrity post')
+        self.assertFalse(TimelineEntry.objects.filter(user=self.viewer, artifact=post).exists())
+        mine = Artifact.objects.create(user=self.viewer, title='Mine')
+        self.assertEqual(list(self.feed()), [mine, post])
+
+    def test_feed_view_and_rebuild(self):
+        post = Artifact.objects.create(user=self.friend, title='Friend post')
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.client.force_login(self.viewer)
+        self.assertContains(self.client.get('/feed/'), 'Friend post')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.viewer, artifact=post).exists())
@@ -0,0 +1,107 @@
+"""
+Tests for the cached per-user visibility profile.
+"""
+
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from artifacts import visibility
+from artifacts.forms import UserPreferenceForm
+from artifacts.models import Artifact, Category, Tag, UserPreference
+from artifacts.visibility import get_visibility_profile
+
+User = get_user_model()
+
+
+class VisibilityProfileTest(TestCase):
+    """Blocked users, tags and categories hide artifacts from the viewer."""
+
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', password='testpassword')
+        self.author = User.objects.create_user(username='author', password='testpassword')
+        self.other = User.objects.create_user(username='other', password='testpassword')
+        self.category = Category.objects.create(name='Typewriters')
+        self.tag = Tag.objects.create(name='rare')
+
+        self.by_author = Artifact.objects.create(user=self.author, title='Olivetti')
+        self.in_category = Artifact.objects.create(user=self.other, title='Remington', category=self.category)
+        self.tagged = Artifact.objects.create(user=self.other, title='Underwood')
+        self.tagged.tags.add(self.tag, Tag.objects.create(name='vintage'))
+        self.plain = Artifact.objects.create(user=self.other, title='Smith Corona')
+        self.preferences = UserPreference.objects.create(user=self.viewer)
+
+    def visible_titles(self):
+        profile = get_visibility_profile(self.viewer)
+        return set(profile.filter(Artifact.objects.all()).values_list('title', flat=True))
+
+    def test_empty_profile_shows_everything(self):
+        self.assertEqual(self.visible_titles(), {'Olivetti', 'Remington', 'Underwood', 'Smith Corona'})
+
+    def test_block_hides_user_and_invalidates_cache(self):
+        self.visible_titles()
+        self.preferences.block(self.author)
+        self.assertEqual(self.visible_titles(), {'Remington', 'Underwood', 'Smith Corona'})
+        self.preferences.unblock(self.author)
+        self.assertIn('Olivetti', self.visible_titles())
+
+    def test_form_save_hides_tags_and_categories(self):
+        self.visible_titles()
+        form = UserPreferenceForm(
+            {'blocked_tags': [self.tag.pk], 'blocked_categories': [self.category.pk]},
+            instance=self.preferences,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(self.visible_titles(), {'Olivetti', 'Smith Corona'})
+
+    def test_tag_filter_does_not_duplicate_rows(self):
+        self.preferences.blocked_tags.add(Tag.objects.create(name='unused'))
+        self.preferences.invalidate_visibility()
+        profile = get_visibility_profile(self.viewer)
+        titles = list(profile.filter(Artifact.objects.all()).values_list('title', flat=True))
+        self.assertEqual(len(titles), len(set(titles)))
+        self.assertNotIn('DISTINCT', str(profile.filter(Artifact.objects.all()).query))
+
+    def test_profile_is_cached(self):
+        get_visibility_profile(self.viewer)
+        with self.assertNumQueries(0):
+            get_visibility_profile(self.viewer)
+
+    def test_change_only_drops_that_users_profile(self):
+        get_visibility_profile(self.viewer)
+        get_visibility_profile(self.author)
+        UserPreference.objects.get(user=self.author).block(self.other)
+        with mock.patch('core.local_cache.get_or_compute', side_effect=AssertionError('shared cache read')):
+            get_visibility_profile(self.viewer)
+
+    def test_profile_loaded_during_a_change_is_not_kept(self):
+        build = visibility.build_visibility_profile
+
+        def racing(user):
+            profile = build(user)
+            # Another request changes the block list after the read
+            self.preferences.block(self.author)
+            return profile
+
+        with mock.patch.object(visibility, 'build_visibility_profile', racing):
+            self.assertIn('Olivetti', self.visible_titles())
+        self.assertNotIn('Olivetti', self.visible_titles())
+
+    def test_allows_checks_in_memory(self):
+        self.preferences.blocked_tags.add(self.tag)
+        self.preferences.invalidate_visibility()
+        profile = get_visibility_profile(self.viewer)
+        artifacts = {a.title: a for a in Artifact.objects.prefetch_related('tags')}
+        with self.assertNumQueries(0):
+            self.assertFalse(profile.allows(artifacts['Underwood']))
+            self.assertTrue(profile.allows(artifacts['Smith Corona']))
+
+    def test_detail_redirects_when_filtered(self):
+        self.preferences.block(self.author)
+        self.client.force_login(self.viewer)
+        response = self.client.get(f'/{self.by_author.pk}/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
@@ -0,0 +1,170 @@
+"""
+Follower timelines for user_feed.
+
+Fan-out on write: when an artifact is created it is copied as a TimelineEntry
+into the timeline of the author and each follower, so reading a feed is an
+indexed range scan over the viewer's own rows. Authors with more than
+FEED_FANOUT_LIMIT followers are not fanned out; their artifacts are read from
+the artifact table at request time and merged in (fan-out on read).
+"""
+import heapq
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+
+from core.cache import cached
+from core.pagination import CursorPage, InvalidCursor, decode_cursor, encode_cursor
+
+from .models import Artifact, TimelineEntry, UserPreference
+
+User = get_user_model()
+
+CELEBRITY_CACHE_TIMEOUT = 60 * 5
+FANOUT_BATCH_SIZE = 1000
+
+
+def is_celebrity(author):
+    return author.followers.count() > settings.FEED_FANOUT_LIMIT
+
+
+def _entries(artifact, user_ids):
+    return [
+        TimelineEntry(user_id=user_id, artifact=artifact, author_id=artifact.user_id,
+                      created_at=artifact.created_at)
+        for user_id in user_ids
+    ]
+
+
+def fan_out(artifact):
+    """Copy a new artifact into its author's and followers' timelines"""
+    if artifact.user_id is None:
+        return
+    TimelineEntry.objects.bulk_create(_entries(artifact, [artifact.user_id]), ignore_conflicts=True)
+    if is_celebrity(artifact.user):
+        return
+
+    followers = (UserPreference.objects.filter(following=artifact.user_id)
+                 .order_by('user_id').values_list('user_id', flat=True))
+    last_id = 0
+    while True:
+        batch = list(followers.filter(user_id__gt=last_id)[:FANOUT_BATCH_SIZE])
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(_entries(artifact, batch), ignore_conflicts=True)
+        last_id = batch[-1]
+
+
+def backfill(user_id, author_ids):
+    """Copy recent artifacts of newly followed authors into a timeline"""
+    for author in User.objects.filter(pk__in=author_ids):
+        if author.pk != user_id and is_celebrity(author):
+            continue
+        recent = author.artifacts.order_by('-created_at')[:settings.FEED_BACKFILL_SIZE]
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, artifact=a, author_id=author.pk, created_at=a.created_at)
+             for a in recent],
+            ignore_conflicts=True,
+        )
+    cache.delete(celebrities_cache_key(user_id))
+
+
+def unfollow(user_id, author_ids):
+    TimelineEntry.objects.filter(user_id=user_id, author_id__in=author_ids).delete()
+    cache.delete(celebrities_cache_key(user_id))
+
+
+def unfollow_all(user_id):
+    """Keep only the user's own artifacts in their timeline"""
+    TimelineEntry.objects.filter(user_id=user_id).exclude(author_id=user_id).delete()
+    cache.delete(celebrities_cache_key(user_id))
+
+
+def rebuild(user_id):
+    """Refill a timeline from scratch from the user's follows"""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    followed = UserPreference.objects.filter(user_id=user_id).values_list('following', flat=True)
+    backfill(user_id, [user_id, *[pk for pk in followed if pk is not None]])
+
+
+def celebrities_cache_key(user_id):
+    return f'feed:celebrities:{user_id}'
+
+
+@cached(lambda user: celebrities_cache_key(user.pk), CELEBRITY_CACHE_TIMEOUT)
+def followed_celebrities(user):
+    """Ids of followed authors whose artifacts are merged in at read time"""
+    followed = UserPreference.objects.filter(user=user).values('following')
+    return list(
+        User.objects.filter(pk__in=followed)
+        .annotate(follower_total=Count('followers'))
+        .filter(follower_total__gt=settings.FEED_FANOUT_LIMIT)
+        .values_list('pk', flat=True)
+    )
+
+
+def _older_than(position, date_field, id_field):
+    created_at, artifact_id = position
+    return (Q(**{f'{date_field}__lt': created_at})
+            | Q(**{date_field: created_at, f'{id_field}__lt': artifact_id}))
+
+
+def _decode(cursor):
+    values = decode_cursor(cursor)
+    if len(values) != 2:
+        raise InvalidCursor('Cursor does not match the timeline')
+    try:
+        created_at = Artifact._meta.get_field('created_at').to_python(values[0])
+    except ValidationError as e:
+        raise InvalidCursor('Invalid cursor') from e
+    if created_at is None:
+        raise InvalidCursor('Invalid cursor')
+    return created_at, int(values[1])
+
+
+def read_timeline(user, profile, cursor=None, per_page=None):
+    """
+    One page of the user's feed, newest first, as a CursorPage of artifacts.
+
+    profile is the viewer's VisibilityProfile; blocked tags and categories are
+    filtered in the same indexed query.
+    """
+    per_page = per_page or settings.ARTIFACTS_PER_PAGE
+    try:
+        position = _decode(cursor) if cursor else None
+    except (InvalidCursor, ValueError, TypeError):
+        position, cursor = None, None
+
+    entries = profile.filter(TimelineEntry.objects.filter(user=user), prefix='artifact__')
+    if position:
+        entries = entries.filter(_older_than(position, 'created_at', 'artifact_id'))
+    sources = [list(entries.order_by('-created_at', '-artifact_id')
+                    .values_list('created_at', 'artifact_id')[:per_page + 1])]
+
+    celebrities = followed_celebrities(user)
+    if celebrities:
+        pulled = profile.filter(Artifact.objects.filter(user_id__in=celebrities))
+        if position:
+            pulled = pulled.filter(_older_than(position, 'created_at', 'id'))
+        sources.append(list(pulled.order_by('-created_at', '-id')
+                            .values_list('created_at', 'id')[:per_page + 1]))
+
+    rows, seen = [], set()
+    for row in heapq.merge(*sources, reverse=True):
+        if row[1] not in seen:
+            seen.add(row[1])
+            rows.append(row)
+        if len(rows) > per_page:
+            break
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(list(rows[-1]))
+
+    ids = [artifact_id for _, artifact_id in rows]
+    artifacts = (Artifact.objects.select_related('category', 'user')
+                 .prefetch_related('tags').in_bulk(ids))
+    return CursorPage([artifacts[pk] for pk in ids if pk in artifacts], next_cursor, cursor=cursor)
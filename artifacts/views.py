@@ -1,18 +1,27 @@
+import asyncio
 import logging
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.db.models import Q
-from django.core.paginator import Paginator
 from django.views.decorators.http import require_POST
-from django.views.decorators.cache import cache_page
 from django.core.cache import cache
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.template.loader import render_to_string
-from .models import Artifact, Comment, Category, Tag, UserPreference
+from core.async_views import aget_object_or_404, async_login_required, run_query
+from core.pagination import paginate
+from core.replicas import replica_reads, untracked_writes
+from . import search
+from .models import Artifact, Comment, Tag, UserPreference
 from .forms import ArtifactForm, CommentForm, ArtifactSearchForm, UserPreferenceForm
+from .visibility import get_visibility_profile
+from .caching import cached_artifact_page, get_categories
+from .cards import get_cards
+from .counters import record_view
+from .likes import record_like
+from .timeline import read_timeline
 
 # Get the custom user model
 User = get_user_model()
@@ -21,111 +30,137 @@ logger = logging.getLogger(__name__)
 
 def get_filtered_artifacts(user, base_queryset):
     """Helper function to filter artifacts based on user preferences"""
-    if not user.is_authenticated:
-        return base_queryset
-    
-    try:
-        preferences = user.preferences
-        # Exclude artifacts from blocked users
-        base_queryset = base_queryset.exclude(user__in=preferences.blocked_users.all())
-        # Exclude artifacts with blocked tags
-        base_queryset = base_queryset.exclude(tags__in=preferences.blocked_tags.all())
-        # Exclude artifacts with blocked categories
-        base_queryset = base_queryset.exclude(category__in=preferences.blocked_categories.all())
-    except UserPreference.DoesNotExist:
-        # If user has no preferences, create them
-        UserPreference.objects.create(user=user)
-    
-    return base_queryset.distinct()
+    return get_visibility_profile(user).filter(base_queryset)
 
 def render_artifact_list(request, artifacts):
     """Helper function to render artifact list items for both initial page load and AJAX"""
-    context = {'artifacts': artifacts}
+    context = {'artifacts': artifacts, 'cards': get_cards(artifacts)}
     return render_to_string('artifacts/includes/artifact_list_items.html', context, request=request)
 
-@cache_page(60 * 15)  # Cache for 15 minutes
-def artifact_list(request):
-    form = ArtifactSearchForm(request.GET)
+def search_artifacts(artifacts, query, ranked=False):
+    """
+    Restrict artifacts to full-text matches for query.
+
+    With ranked, only the ARTIFACT_SEARCH_MAX_RESULTS best matches are kept
+    and annotated with a relevance to sort by. Returns the queryset and the
+    name of that annotation, or None when not ranked or the FTS index is not
+    available.
+    """
+    if not search.is_available():
+        artifacts = artifacts.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(tags__name__icontains=query)
+        ).distinct()
+        return artifacts, None
+
+    match = search.build_match_query(query)
+    if not match:
+        return artifacts.none(), None
+    if not ranked:
+        # Every match, for the other sorts and filters to narrow down
+        return artifacts.filter(pk__in=search.matching_ids(match)), None
+    artifacts = artifacts.filter(pk__in=search.matching_ids(match, settings.ARTIFACT_SEARCH_MAX_RESULTS))
+    rank = search.rank(match, f'"{Artifact._meta.db_table}"."id"')
+    return artifacts.annotate(search_rank=rank), 'search_rank'
+
+def build_artifact_page(request, form):
+    """Run the filtered, sorted artifact query for one page of artifact_list"""
     artifacts = Artifact.objects.select_related('category', 'user').prefetch_related('tags')
     
     # Apply user preferences filtering
     artifacts = get_filtered_artifacts(request.user, artifacts)
     
     if form.is_valid():
-        # Search by query
-        query = form.cleaned_data.get('q')
-        if query:
-            artifacts = artifacts.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(tags__name__icontains=query)
-            ).distinct()
-        
         # Filter by category
         category = form.cleaned_data.get('category')
         if category:
             artifacts = artifacts.filter(category=category)
         
         # Sort - always prioritize chronological order
-        sort_by = form.cleaned_data.get('sort')
-        if sort_by:
-            artifacts = artifacts.order_by(sort_by)
-        else:
-            artifacts = artifacts.order_by('-created_at')
+        sort_by = form.cleaned_data.get('sort') or '-created_at'
+        
+        # Search by query; without an explicit sort, best matches come first
+        query = form.cleaned_data.get('q')
+        if query:
+            artifacts, rank = search_artifacts(artifacts, query, ranked=not form.cleaned_data.get('sort'))
+            if rank:
+                sort_by = rank
     else:
         # Default sorting is chronological
-        artifacts = artifacts.order_by('-created_at')
+        sort_by = '-created_at'
     
-    # Pagination
-    paginator = Paginator(artifacts, settings.INFINITE_SCROLL_BATCH_SIZE)
-    page = request.GET.get('page', 1)
-    artifacts = paginator.get_page(page)
+    # Keyset pagination on (sort field, id)
+    return paginate(request, artifacts, (sort_by,), settings.INFINITE_SCROLL_BATCH_SIZE)
+
+def render_artifact_page(request, artifacts, form, categories):
+    context = {
+        'artifacts': artifacts,
+        'cards': get_cards(artifacts),
+        'form': form,
+        'categories': categories,
+    }
+    return render(request, 'artifacts/artifact_list.html', context)
+
+@replica_reads
+async def artifact_list(request):
+    # The visibility profile needs the user; load it once, before the parallel work
+    await run_query(lambda: request.user.is_authenticated)
+    form = ArtifactSearchForm(request.GET)
+    page = run_query(cached_artifact_page, request, form, lambda: build_artifact_page(request, form))
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        has_next = artifacts.has_next()
-        html = render_artifact_list(request, artifacts)
+        artifacts = await page
+        html = await run_query(render_artifact_list, request, artifacts)
         return JsonResponse({
             'html': html,
-            'has_next': has_next,
-            'next_page': artifacts.next_page_number() if has_next else None,
+            'has_next': artifacts.has_next(),
+            'next_cursor': artifacts.next_cursor,
         })
     
-    context = {
-        'artifacts': artifacts,
-        'form': form,
-        'categories': Category.objects.all(),
-    }
-    return render(request, 'artifacts/artifact_list.html', context)
+    artifacts, categories = await asyncio.gather(page, run_query(get_categories))
+    return await run_query(render_artifact_page, request, artifacts, form, categories)
 
-@login_required
-def artifact_detail(request, pk):
-    artifact = get_object_or_404(
-        Artifact.objects.select_related('category', 'user').prefetch_related('tags', 'comments__user'),
-        pk=pk
+def add_comment(request, artifact):
+    """Save a comment form; returns the redirect, or the invalid form"""
+    comment_form = CommentForm(request.POST)
+    if comment_form.is_valid():
+        comment = comment_form.save(commit=False)
+        comment.artifact = artifact
+        comment.user = request.user
+        comment.save()
+        messages.success(request, 'Comment added successfully!')
+        return redirect('artifact_detail', pk=artifact.pk)
+    return comment_form
+
+@async_login_required
+async def artifact_detail(request, pk):
+    artifact, profile = await asyncio.gather(
+        aget_object_or_404(
+            Artifact.objects.select_related('category', 'user').prefetch_related('tags', 'comments__user'),
+            pk=pk
+        ),
+        run_query(get_visibility_profile, request.user),
     )
     
     # Check if artifact should be visible to user
-    if artifact not in get_filtered_artifacts(request.user, Artifact.objects.filter(pk=artifact.pk)):
+    if not profile.allows(artifact):
         messages.error(request, "This content has been filtered based on your preferences.")
         return redirect('artifact_list')
     
     if request.method == "POST":
-        comment_form = CommentForm(request.POST)
-        if comment_form.is_valid():
-            comment = comment_form.save(commit=False)
-            comment.artifact = artifact
-            comment.user = request.user
-            comment.save()
-            messages.success(request, 'Comment added successfully!')
-            return redirect('artifact_detail', pk=pk)
+        comment_form = await run_query(add_comment, request, artifact)
+        if isinstance(comment_form, HttpResponse):
+            return comment_form
     else:
         comment_form = CommentForm()
+        record_view(artifact.pk)
     
     context = {
         'artifact': artifact,
         'comment_form': comment_form,
     }
-    return render(request, 'artifacts/artifact_detail.html', context)
+    return await run_query(render, request, 'artifacts/artifact_detail.html', context)
 
 @login_required
 def artifact_create(request):
@@ -183,43 +218,51 @@ def artifact_delete(request, pk):
 @login_required
 @require_POST
 def artifact_like(request, pk):
-    artifact = get_object_or_404(Artifact, pk=pk)
-    artifact.popularity_score += 1
-    artifact.save()
-    messages.success(request, 'Thanks for liking this artifact!')
-    logger.info(f'Artifact liked: {artifact.title} by {request.user.username}')
+    artifact = get_object_or_404(Artifact.objects.only('pk', 'title'), pk=pk)
+    if record_like(request.user, artifact.pk):
+        messages.success(request, 'Thanks for liking this artifact!')
+        logger.info(f'Artifact liked: {artifact.title} by {request.user.username}')
+    else:
+        messages.info(request, 'You already liked this artifact.')
     return redirect('artifact_detail', pk=pk)
 
-@login_required
-def user_feed(request):
-    """Personal feed showing only artifacts from non-blocked users in chronological order"""
-    artifacts = Artifact.objects.select_related('category', 'user').prefetch_related('tags')
-    artifacts = get_filtered_artifacts(request.user, artifacts).order_by('-created_at')
-    
-    paginator = Paginator(artifacts, settings.ARTIFACTS_PER_PAGE)
-    page = request.GET.get('page')
-    artifacts = paginator.get_page(page)
-    
+def render_user_feed(request, artifacts):
     context = {
         'artifacts': artifacts,
+        'cards': get_cards(artifacts),
         'feed_type': 'personal',
     }
     return render(request, 'artifacts/user_feed.html', context)
 
+@async_login_required
+@replica_reads
+async def user_feed(request):
+    """Personal feed of followed users' artifacts, read from the viewer's timeline"""
+    profile = await run_query(get_visibility_profile, request.user)
+    artifacts = await run_query(read_timeline, request.user, profile, cursor=request.GET.get('cursor'))
+    return await run_query(render_user_feed, request, artifacts)
+
 @login_required
+@replica_reads
 def user_profile(request, username):
     """View for user profiles"""
     profile_user = get_object_or_404(User, username=username)
-    artifacts = get_filtered_artifacts(request.user, profile_user.artifacts.all())
+    artifacts = get_filtered_artifacts(
+        request.user,
+        profile_user.artifacts.select_related('category', 'user').prefetch_related('tags'),
+    )
+    page = paginate(request, artifacts, ('-created_at',), settings.ARTIFACTS_PER_PAGE)
     
     # Get or create preferences for both users
-    viewer_prefs, _ = UserPreference.objects.get_or_create(user=request.user)
-    profile_prefs, _ = UserPreference.objects.get_or_create(user=profile_user)
+    with untracked_writes():
+        viewer_prefs, _ = UserPreference.objects.get_or_create(user=request.user)
+        profile_prefs, _ = UserPreference.objects.get_or_create(user=profile_user)
     
     context = {
         'profile_user': profile_user,
         'preferences': profile_prefs,
-        'artifacts': artifacts.order_by('-created_at'),
+        'artifacts': page,
+        'cards': get_cards(page),
         'is_following': viewer_prefs.is_following(profile_user),
         'is_blocking': viewer_prefs.is_blocking(profile_user),
         'followers_count': profile_user.followers.count(),
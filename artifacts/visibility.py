@@ -0,0 +1,86 @@
+"""
+Per-user visibility profiles.
+
+A profile is the set of user, tag and category ids a viewer has blocked. It is
+read from the UserPreference M2M tables once, cached, and then applied to
+artifact querysets as plain id lists (and an anti-join for tags), so list
+queries no longer need subqueries against the preference tables or DISTINCT.
+"""
+from django.db.models import Exists, OuterRef
+
+from core.local_cache import local_cache
+from core.replicas import untracked_writes
+
+from .models import Artifact, UserPreference
+
+VISIBILITY_CACHE_TIMEOUT = 60 * 60
+
+
+class VisibilityProfile:
+    """Blocked user, tag and category ids for a single viewer"""
+    __slots__ = ('user_ids', 'tag_ids', 'category_ids')
+
+    def __init__(self, user_ids=(), tag_ids=(), category_ids=()):
+        self.user_ids = frozenset(user_ids)
+        self.tag_ids = frozenset(tag_ids)
+        self.category_ids = frozenset(category_ids)
+
+    def __bool__(self):
+        return bool(self.user_ids or self.tag_ids or self.category_ids)
+
+    def as_cache_value(self):
+        return (sorted(self.user_ids), sorted(self.tag_ids), sorted(self.category_ids))
+
+    def filter(self, queryset, prefix=''):
+        """
+        Exclude hidden artifacts from a queryset.
+
+        prefix points at the artifact from a related model, e.g. 'artifact__'.
+        """
+        if self.user_ids:
+            queryset = queryset.exclude(**{f'{prefix}user_id__in': self.user_ids})
+        if self.category_ids:
+            queryset = queryset.exclude(**{f'{prefix}category_id__in': self.category_ids})
+        if self.tag_ids:
+            blocked_tags = Artifact.tags.through.objects.filter(
+                artifact_id=OuterRef(f'{prefix}pk'),
+                tag_id__in=self.tag_ids,
+            )
+            queryset = queryset.filter(~Exists(blocked_tags))
+        return queryset
+
+    def allows(self, artifact):
+        """Check a single, already loaded artifact in memory"""
+        if artifact.user_id in self.user_ids:
+            return False
+        if artifact.category_id in self.category_ids:
+            return False
+        if self.tag_ids:
+            # Uses the prefetched tags when the caller loaded them
+            return not any(tag.pk in self.tag_ids for tag in artifact.tags.all())
+        return True
+
+
+EMPTY_PROFILE = VisibilityProfile()
+
+
+def build_visibility_profile(user):
+    """Read the block lists for a user straight from the database"""
+    with untracked_writes():
+        preferences, _ = UserPreference.objects.get_or_create(user=user)
+    return VisibilityProfile(
+        user_ids=preferences.blocked_users.values_list('pk', flat=True),
+        tag_ids=preferences.blocked_tags.values_list('pk', flat=True),
+        category_ids=preferences.blocked_categories.values_list('pk', flat=True),
+    )
+
+
+def get_visibility_profile(user):
+    """Return the cached visibility profile for a user"""
+    if not user.is_authenticated:
+        return EMPTY_PROFILE
+
+    return local_cache.get_or_set(
+        UserPreference.visibility_namespace(user.pk), UserPreference.visibility_cache_key(user.pk),
+        lambda: build_visibility_profile(user), VISIBILITY_CACHE_TIMEOUT,
+    )
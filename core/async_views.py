@@ -0,0 +1,65 @@
+"""
+Helpers for async views.
+
+Django 3.2 has no async ORM, so async views hand their database work (and
+anything else that blocks: the shared cache, template rendering) to
+run_query(), which runs a sync callable in a worker thread. Awaiting several
+run_query() calls with asyncio.gather() runs independent queries in
+parallel, each thread on its own connection. The event loop thread itself
+never blocks, so a worker under uvicorn keeps accepting connections while
+queries run.
+
+With ASYNC_PARALLEL_QUERIES off (the test settings) every call runs on the
+request's own thread instead, one after another, so that it sees the test's
+open transaction.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections, connections
+from django.shortcuts import get_object_or_404
+
+from .middleware import current_recorder
+
+
+def _call(recorder, func, args, kwargs):
+    # Worker threads outlive requests: expire their connections like a request would
+    close_old_connections()
+    try:
+        if recorder is None:
+            return func(*args, **kwargs)
+        wrappers = [connection.execute_wrapper(recorder) for connection in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+    finally:
+        close_old_connections()
+
+
+async def run_query(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in a thread and return its result"""
+    if not settings.ASYNC_PARALLEL_QUERIES:
+        return await sync_to_async(func)(*args, **kwargs)
+    # The request's SQL instrumentation follows the query into the thread
+    return await sync_to_async(_call, thread_sensitive=False)(current_recorder.get(), func, args, kwargs)
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    return await run_query(get_object_or_404, queryset, **kwargs)
+
+
+def async_login_required(view):
+    """login_required for async views"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # Loading the user from the session is a query
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
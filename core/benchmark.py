@@ -0,0 +1,178 @@
+"""
+View benchmarks with latency and query budgets.
+
+Each scenario is one GET through the Django test client, logged in as a
+representative user picked from the dataset. A scenario is measured in
+three steps:
+
+    cold     caches cleared, one request; its query count is recorded
+    warmup   a few requests that are thrown away
+    timed    N requests, giving p50 and p95 latency, plus one more for the
+             warm query count
+
+Queries are counted by the request's QueryRecorder (core/middleware.py),
+which also sees the worker threads that async views run their queries on.
+Results are compared to a stored baseline. Query counts must not grow at
+all; latency may grow by a tolerance, since it depends on the machine.
+"""
+import json
+import math
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from artifacts.models import Artifact, UserPreference
+from core.local_cache import local_cache
+
+User = get_user_model()
+
+BASELINE_VERSION = 1
+
+
+class Scenario:
+    """A named request; url and params are built from the fixtures"""
+
+    def __init__(self, name, url, params=None, xhr=False):
+        self.name = name
+        self.url = url
+        self.params = params or (lambda fixtures: {})
+        self.xhr = xhr
+
+    def request(self, client, fixtures):
+        headers = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'} if self.xhr else {}
+        return client.get(self.url(fixtures), self.params(fixtures), **headers)
+
+
+SCENARIOS = [
+    Scenario('artifact_list', lambda f: reverse('artifact_list')),
+    Scenario('artifact_list_search', lambda f: reverse('artifact_list'), lambda f: {'q': 'watch'}),
+    Scenario('artifact_list_sort', lambda f: reverse('artifact_list'), lambda f: {'sort': '-popularity_score'}),
+    Scenario('artifact_list_page', lambda f: reverse('artifact_list'),
+             lambda f: {'cursor': f['list_cursor']}, xhr=True),
+    Scenario('user_feed', lambda f: reverse('user_feed')),
+    Scenario('artifact_detail', lambda f: reverse('artifact_detail', args=[f['artifact'].pk])),
+    Scenario('user_profile', lambda f: reverse('user_profile', args=[f['author'].username])),
+    Scenario('marketplace', lambda f: reverse('trading:marketplace')),
+    Scenario('offer_list', lambda f: reverse('trading:offer_list')),
+    Scenario('conversation_list', lambda f: reverse('messages:conversation_list')),
+    Scenario('notification_list', lambda f: reverse('messages:notification_list')),
+]
+
+
+def fixtures(client):
+    """
+    The viewer follows the most users, so their feed is the heaviest; the
+    author has the most artifacts and the artifact the most comments among
+    those the viewer may see.
+    """
+    preference = (UserPreference.objects.annotate(followed=Count('following'))
+                  .select_related('user').order_by('-followed', 'pk').first())
+    if preference is None:
+        raise ValueError('The dataset has no users; run generate_load_data first')
+    viewer = preference.user
+    blocked = preference.blocked_users.values('pk')
+    author = (User.objects.annotate(artifact_total=Count('artifacts'))
+              .exclude(pk__in=blocked).order_by('-artifact_total', 'pk').first())
+    artifact = (Artifact.objects.exclude(user__in=blocked)
+                .order_by('-comment_count', 'pk').first())
+
+    client.force_login(viewer)
+    first_page = client.get(reverse('artifact_list'), HTTP_X_REQUESTED_WITH='XMLHttpRequest').json()
+    return {
+        'viewer': viewer,
+        'author': author,
+        'artifact': artifact,
+        'list_cursor': first_page.get('next_cursor') or '',
+    }
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def query_count(response):
+    """Queries the request ran, on every connection and thread"""
+    return response.wsgi_request.query_recorder.count
+
+
+def measure(client, scenario, fixtures_, iterations=20, warmup=3):
+    # Both cache tiers, or the cold count depends on when the local cache last
+    # checked its versions
+    cache.clear()
+    local_cache.clear()
+    response = scenario.request(client, fixtures_)
+    if response.status_code != 200:
+        raise ValueError(f'{scenario.name} returned {response.status_code}')
+
+    for _ in range(warmup):
+        scenario.request(client, fixtures_)
+
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        scenario.request(client, fixtures_)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    warm = scenario.request(client, fixtures_)
+
+    return {
+        'p50_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'queries': query_count(warm),
+        'cold_queries': query_count(response),
+    }
+
+
+def run(scenarios=None, iterations=20, warmup=3, progress=None):
+    """Measure every scenario. Returns {name: result}."""
+    client = Client()
+    fixtures_ = fixtures(client)
+    results = {}
+    for scenario in scenarios or SCENARIOS:
+        results[scenario.name] = measure(client, scenario, fixtures_, iterations, warmup)
+        if progress:
+            progress(scenario.name, results[scenario.name])
+    return results
+
+
+def compare(results, baseline, tolerance=0.5, slack_ms=5.0):
+    """
+    Budget violations of results against baseline scenarios, as messages.
+    A p95 may exceed the baseline by tolerance (a fraction) plus slack_ms,
+    which keeps scheduler noise on millisecond views from failing a run.
+    Scenarios missing from either side are skipped.
+    """
+    failures = []
+    for name, result in results.items():
+        budget = baseline.get(name)
+        if budget is None:
+            continue
+        for key in ('queries', 'cold_queries'):
+            if result[key] > budget[key]:
+                failures.append(f'{name}: {result[key]} {key.replace("_", " ")} (budget {budget[key]})')
+        limit = budget['p95_ms'] * (1 + tolerance) + slack_ms
+        if result['p95_ms'] > limit:
+            failures.append(f"{name}: p95 {result['p95_ms']}ms (budget {limit:.2f}ms)")
+    return failures
+
+
+def read_baseline(path):
+    with open(path, encoding='utf-8') as baseline:
+        data = json.load(baseline)
+    if data.get('version') != BASELINE_VERSION:
+        raise ValueError(f"Unsupported baseline version {data.get('version')}")
+    return data
+
+
+def write_baseline(path, dataset, results):
+    with open(path, 'w', encoding='utf-8') as baseline:
+        json.dump({'version': BASELINE_VERSION, 'dataset': dataset, 'scenarios': results},
+                  baseline, indent=2, sort_keys=True)
+        baseline.write('\n')
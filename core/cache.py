@@ -0,0 +1,146 @@
+"""
+Versioned cache keys, and recomputation without stampedes.
+
+Instead of tracking and deleting every key that depends on some data, callers
+fold a namespace version into their keys and bump the version when the data
+changes. Entries written under an old version are never read again and simply
+age out.
+
+get_or_compute() (and the @cached decorator) guard expensive values against
+the thundering herd when an entry expires:
+
+    fresh      served as is, but each request may refresh early with a
+               probability that grows towards expiry and with the time the
+               value took to compute ("XFetch"), which spreads refreshes out
+    stale      kept for CACHE_STALE_TIMEOUT seconds after expiry; the request
+               that takes the short lock key recomputes, all others keep
+               serving the stale value
+    missing    the lock holder computes while the others wait for its result,
+               for at most CACHE_LOCK_TIMEOUT seconds; if it fails, the next
+               waiter to take the lock computes instead
+"""
+import functools
+import hashlib
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def _fresh_version():
+    # Seeded from the clock so an evicted version key never restarts at a
+    # number that older entries were written under.
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(namespaces):
+    """{namespace: version} for several namespaces in one round trip"""
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for namespace in set(namespaces) - set(versions):
+        versions[namespace] = get_version(namespace)
+    return versions
+
+
+def bump_version(namespace):
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _fresh_version()
+        cache.set(key, version, None)
+        return version
+
+
+def fingerprint(*parts):
+    """Short stable hash of arbitrary reprs, for use inside cache keys"""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def make_key(namespace, *parts):
+    return f'{namespace}:{get_version(namespace)}:{fingerprint(*parts)}'
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _store(key, compute, timeout, lock):
+    start = time.time()
+    try:
+        value = compute()
+        cost = time.time() - start
+        if timeout is None:
+            cache.set(key, (value, None, cost), None)
+        else:
+            cache.set(key, (value, start + cost + timeout, cost), timeout + settings.CACHE_STALE_TIMEOUT)
+        return value
+    finally:
+        if lock:
+            cache.delete(_lock_key(key))
+
+
+def _expires_early(fresh_until, cost, beta):
+    # -log(u) is exponentially distributed: usually small, now and then large
+    return time.time() - cost * beta * math.log(1 - random.random()) >= fresh_until
+
+
+def get_or_compute(key, compute, timeout, beta=1.0):
+    """
+    The cached value for key, computed by at most one process at a time.
+    timeout is how long the value is fresh, None for as long as it is cached.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, fresh_until, cost = entry
+        if fresh_until is None or not _expires_early(fresh_until, cost, beta):
+            return value
+        if not cache.add(_lock_key(key), True, settings.CACHE_LOCK_TIMEOUT):
+            # Somebody else is refreshing it
+            return value
+        return _store(key, compute, timeout, lock=True)
+
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while True:
+        # Retried on every pass: a holder that fails releases the lock without
+        # storing a value, and one of the waiters takes over right away
+        if cache.add(_lock_key(key), True, settings.CACHE_LOCK_TIMEOUT):
+            entry = cache.get(key)
+            if entry is None:
+                return _store(key, compute, timeout, lock=True)
+            # Stored by the previous holder just before it released the lock
+            cache.delete(_lock_key(key))
+            return entry[0]
+        if time.monotonic() >= deadline:
+            # The lock holder died or is too slow; compute without it
+            return _store(key, compute, timeout, lock=False)
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+
+
+def cached(key, timeout, beta=1.0):
+    """Decorator form of get_or_compute; key builds the cache key from the arguments"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return get_or_compute(key(*args, **kwargs), lambda: function(*args, **kwargs), timeout, beta)
+        return wrapper
+    return decorator
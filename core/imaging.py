@@ -0,0 +1,73 @@
+"""
+Single-decode image rendering.
+
+An upload is decoded once and every output is resized from that one bitmap.
+For JPEG sources the decoder is put in draft mode first, so a phone photo
+that only needs 1200px outputs is decoded at 1/2, 1/4 or 1/8 scale by the
+DCT itself instead of being fully decoded and then thrown away.
+"""
+import io
+import math
+
+from PIL import Image, ImageOps, features
+from pilkit.processors import ResizeToFit
+from pilkit.utils import save_image
+
+# PIL format, mime type, extension and encoder options of srcset variants.
+# JPEG is always available and doubles as the <img> fallback.
+JPEG = ('JPEG', 'image/jpeg', 'jpg', {'quality': 80, 'progressive': True, 'optimize': True})
+WEBP = ('WEBP', 'image/webp', 'webp', {'quality': 75, 'method': 4})
+AVIF = ('AVIF', 'image/avif', 'avif', {'quality': 60})
+
+
+def variant_formats():
+    """Formats this Pillow build can encode, fallback first"""
+    return [JPEG] + [fmt for fmt in (WEBP, AVIF) if features.check(fmt[0].lower())]
+
+
+def required_edges(processors):
+    """
+    The smallest (long edge, short edge) a decode must keep for the given
+    processors to produce full-size output, or None if that is unknown.
+    """
+    long_edge = short_edge = 0
+    for processor in processors:
+        width, height = getattr(processor, 'width', None), getattr(processor, 'height', None)
+        if not width or not height:
+            return None
+        if isinstance(processor, ResizeToFit):
+            long_edge = max(long_edge, width, height)
+        else:
+            # Fill, cover and smart crops need the short edge
+            short_edge = max(short_edge, width, height)
+    return long_edge, short_edge
+
+
+def decode(data, edges=None):
+    """Open image bytes, draft-downscaled as far as edges allows, upright and loaded"""
+    image = Image.open(io.BytesIO(data))
+    if edges:
+        width, height = image.size
+        scale = max(edges[0] / max(width, height), edges[1] / min(width, height))
+        if scale < 1:
+            image.draft('RGB', (math.ceil(width * scale), math.ceil(height * scale)))
+    image = ImageOps.exif_transpose(image)
+    image.load()
+    return image
+
+
+def process(image, processors):
+    for processor in processors:
+        image = processor.process(image)
+    return image
+
+
+def downscale(image, width):
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+
+
+def encode(image, format, options=None):
+    buffer = io.BytesIO()
+    save_image(image, buffer, format, options)
+    return buffer.getvalue()
@@ -0,0 +1,447 @@
+"""
+Synthetic datasets for scale testing.
+
+Everything is generated offline from a seeded random.Random, so the same
+options always produce the same dataset. Popularity follows a Zipf
+distribution: a few users write most artifacts and collect most followers,
+a few tags and categories dominate, and most artifacts get no comments or
+likes while a handful get thousands. Rows are written with bulk_create in
+batches and never loaded back as model instances.
+"""
+import io
+import itertools
+import random
+from contextlib import nullcontext
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from artifacts.models import Artifact, Category, Comment, Like, Tag, UserPreference
+from core.models import Blob
+from core.renditions import READY
+from core.snapshot import preserve_timestamps
+from trading.models import BarterCredit, CreditTransaction, Listing, TradeOffer
+from user_messages.models import Conversation, Message, Notification
+from user_messages.summaries import refresh_summaries
+from users.models import Friendship
+
+User = get_user_model()
+
+CATEGORIES = [
+    ('Vinyl Records', 'Analog audio recordings on vinyl discs'),
+    ('Film Cameras', 'Analog photographic equipment using film'),
+    ('Typewriters', 'Mechanical or electronic devices for writing'),
+    ('Cassette Tapes', 'Magnetic tape audio storage format'),
+    ('Board Games', 'Physical games played on a board with pieces'),
+    ('Trading Cards', 'Collectible printed cards in sets'),
+    ('VHS Tapes', 'Video Home System magnetic tape format'),
+    ('Vintage Books', 'Classic and collectible physical books'),
+    ('Mechanical Watches', 'Timepieces with mechanical movements'),
+    ('Vintage Radios', 'Antique audio reception devices'),
+]
+
+TAG_WORDS = [
+    'vintage', 'collectible', 'rare', 'mint-condition', 'used', 'limited-edition', 'retro',
+    'classic', 'antique', 'authentic', 'handmade', 'original', 'unique', 'nostalgic', 'functional',
+]
+
+ADJECTIVES = ['Original', 'Restored', 'Rare', 'Boxed', 'Early', 'Late', 'Mint', 'Worn', 'Signed', 'Complete']
+NOUNS = {
+    'Vinyl Records': ['First Pressing', 'Picture Disc', 'Box Set', 'Promo Single'],
+    'Film Cameras': ['Rangefinder', 'TLR', 'SLR Body', 'Instant Camera'],
+    'Typewriters': ['Portable Typewriter', 'Electric Typewriter', 'Office Typewriter'],
+    'Cassette Tapes': ['Mixtape', 'Blank Cassette Pack', 'Walkman'],
+    'Board Games': ['Chess Set', 'First Edition Board Game', 'Wooden Puzzle'],
+    'Trading Cards': ['Rookie Card', 'Holographic Card', 'Complete Set'],
+    'VHS Tapes': ['First Release VHS', 'Box Set', 'Rental Copy'],
+    'Vintage Books': ['First Edition', 'Signed Copy', 'Three-Volume Set'],
+    'Mechanical Watches': ['Chronograph', 'Dive Watch', 'Dress Watch', 'Pocket Watch'],
+    'Vintage Radios': ['Tube Radio', 'Bakelite Radio', 'Radio Phonograph'],
+}
+SENTENCES = [
+    'Kept in a dry cabinet for decades.',
+    'Fully working, recently serviced.',
+    'Some wear on the case, as expected for its age.',
+    'Comes with the original paperwork.',
+    'Bought at an estate sale and cleaned up carefully.',
+    'One of the nicest examples I have seen.',
+    'Missing the original strap but otherwise complete.',
+    'Happy to answer questions about its history.',
+]
+
+DEFAULT_PASSWORD = 'testpass123'
+
+
+class ZipfSampler:
+    """Draw items with probability proportional to 1 / rank ** exponent"""
+
+    def __init__(self, rng, items, exponent=1.1):
+        self.rng = rng
+        self.items = list(items)
+        # Shuffled, so popularity is not correlated with primary keys
+        rng.shuffle(self.items)
+        self.cum_weights = list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, len(self.items) + 1)))
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def sample(self, k=1):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights, k=k)
+
+    def one(self):
+        return self.sample()[0]
+
+    def distinct(self, k):
+        """Up to k different items, still skewed towards the popular ones"""
+        k = min(k, len(self.items))
+        chosen = set()
+        for _ in range(k * 3):
+            chosen.update(self.sample(k - len(chosen)))
+            if len(chosen) >= k:
+                break
+        return list(chosen)
+
+
+class LoadGenerator:
+    """Builds one dataset; each generate_* step can also be run on its own"""
+
+    def __init__(self, users=100, artifacts=1000, tags=200, follows=20, blocks=1, friendships=5,
+                 comments=2.0, likes=3.0, conversations=2.0, messages=8, notifications=5,
+                 listings=0.1, offers=2, transactions=5, image_ratio=0.6, images=12, days=365,
+                 seed=42, prefix='load', batch_size=5000, progress=None):
+        self.counts = {
+            'users': users, 'artifacts': artifacts, 'tags': tags,
+            'listings': int(artifacts * listings),
+            'comments': int(artifacts * comments), 'likes': int(artifacts * likes),
+            'conversations': int(users * conversations),
+        }
+        self.follows, self.blocks, self.friendships = follows, blocks, friendships
+        self.messages, self.notifications = messages, notifications
+        self.offers, self.transactions = offers, transactions
+        self.image_ratio, self.images, self.days = image_ratio, images, days
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.progress = progress
+        self.rng = random.Random(seed)
+        self.now = timezone.now()
+
+    # Helpers
+
+    def report(self, label, count):
+        if self.progress:
+            self.progress(label, count)
+
+    def mean(self, average):
+        """A skewed non-negative count with the given average"""
+        if average <= 0:
+            return 0
+        return int(self.rng.expovariate(1 / average))
+
+    def moment(self, days=None):
+        """A past timestamp, denser towards now"""
+        days = self.days if days is None else days
+        return self.now - timedelta(seconds=days * 86400 * self.rng.random() ** 2)
+
+    def bulk(self, model, rows, timestamps=True, **options):
+        """
+        bulk_create an iterable of instances in batches. Returns the count.
+        With timestamps, the rows carry their own created_at/updated_at.
+        """
+        total = 0
+        rows = iter(rows)
+        with preserve_timestamps(model) if timestamps else nullcontext():
+            while True:
+                batch = list(itertools.islice(rows, self.batch_size))
+                if not batch:
+                    return total
+                with transaction.atomic():
+                    model._base_manager.bulk_create(batch, batch_size=self.batch_size, **options)
+                total += len(batch)
+
+    def new_ids(self, model, after, field='pk'):
+        return list(model._base_manager.filter(pk__gt=after).order_by('pk').values_list(field, flat=True))
+
+    @staticmethod
+    def last_pk(model):
+        return model._base_manager.aggregate(last=Max('pk'))['last'] or 0
+
+    # Steps
+
+    def generate(self):
+        self.generate_taxonomy()
+        self.generate_users()
+        self.generate_social_graph()
+        self.generate_images()
+        self.generate_artifacts()
+        self.generate_engagement()
+        self.generate_messages()
+        self.generate_trading()
+
+    def generate_taxonomy(self):
+        for name, description in CATEGORIES:
+            Category.objects.get_or_create(name=name, defaults={'description': description})
+        self.categories = dict(Category.objects.values_list('pk', 'name'))
+        self.category_sampler = ZipfSampler(self.rng, self.categories, exponent=0.8)
+
+        names = TAG_WORDS + [f'{self.rng.choice(TAG_WORDS)}-{i}' for i in range(self.counts['tags'] - len(TAG_WORDS))]
+        self.bulk(Tag, (Tag(name=name) for name in names[:self.counts['tags']]), timestamps=False,
+                  ignore_conflicts=True)
+        self.tag_sampler = ZipfSampler(self.rng, Tag.objects.values_list('pk', flat=True))
+        self.report('tags', len(self.tag_sampler.items))
+
+    def generate_users(self):
+        # Hashing is deliberately slow, so every user shares one hash
+        password = make_password(DEFAULT_PASSWORD)
+        start = self.last_pk(User)
+        self.bulk(User, (
+            User(username=f'{self.prefix}_{i:07d}', email=f'{self.prefix}_{i}@example.com',
+                 password=password, bio=self.rng.choice(SENTENCES), date_joined=self.moment(self.days * 2))
+            for i in range(self.counts['users'])
+        ))
+        self.user_ids = self.new_ids(User, start)
+        # Authors and followees share one popularity ranking
+        self.user_sampler = ZipfSampler(self.rng, self.user_ids)
+
+        self.bulk(UserPreference, (UserPreference(user_id=pk) for pk in self.user_ids), timestamps=False)
+        self.preference_ids = dict(UserPreference.objects.filter(user_id__in=self.user_ids)
+                                   .values_list('user_id', 'pk'))
+        self.bulk(BarterCredit, (
+            BarterCredit(user_id=pk, balance=Decimal(self.rng.randint(0, 50000)) / 100) for pk in self.user_ids
+        ), timestamps=False)
+        self.report('users', len(self.user_ids))
+
+    def generate_social_graph(self):
+        following = UserPreference.following.through
+        blocked = UserPreference.blocked_users.through
+
+        def edges(through, average):
+            for user_id in self.user_ids:
+                for other in self.user_sampler.distinct(self.mean(average)):
+                    if other != user_id:
+                        yield through(userpreference_id=self.preference_ids[user_id], customuser_id=other)
+
+        self.report('follows', self.bulk(following, edges(following, self.follows), timestamps=False,
+                                         ignore_conflicts=True))
+        self.report('blocks', self.bulk(blocked, edges(blocked, self.blocks), timestamps=False,
+                                        ignore_conflicts=True))
+
+        statuses = ['accepted'] * 6 + ['pending'] * 3 + ['rejected']
+
+        def friendships():
+            for user_id in self.user_ids:
+                for other in self.rng.sample(self.user_ids, min(self.mean(self.friendships), len(self.user_ids))):
+                    if other != user_id:
+                        yield Friendship(sender_id=user_id, receiver_id=other, status=self.rng.choice(statuses))
+
+        self.report('friendships', self.bulk(Friendship, friendships(), timestamps=False, ignore_conflicts=True))
+
+    def placeholder(self, index):
+        """A JPEG with a gradient and a label; no network needed"""
+        width, height = self.rng.choice([(1600, 1200), (1200, 1600), (1400, 1400)])
+        top = tuple(self.rng.randint(40, 215) for _ in range(3))
+        bottom = tuple(min(255, c + 40) for c in top)
+        image = Image.new('RGB', (width, height))
+        draw = ImageDraw.Draw(image)
+        for y in range(0, height, 8):
+            mix = y / height
+            draw.rectangle([0, y, width, y + 8], fill=tuple(int(a + (b - a) * mix) for a, b in zip(top, bottom)))
+        draw.text((width // 20, height // 20), f'Placeholder {index}', fill=(255, 255, 255))
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        return buffer.getvalue()
+
+    def generate_images(self):
+        """Render a small pool of placeholder images that artifacts share"""
+        self.image_pool = []
+        renditions = Artifact.image_renditions
+        for index in range(self.images if self.image_ratio > 0 else 0):
+            name = default_storage.save(f'originals/artifacts/placeholder-{index}.jpg',
+                                        ContentFile(self.placeholder(index)))
+            prototype = Artifact(original_image=name)
+            values = renditions.render(prototype)
+            self.image_pool.append({'original_image': name, 'image_status': READY, **values})
+        self.image_uses = [0] * len(self.image_pool)
+        self.report('images', len(self.image_pool))
+
+    def artifact_rows(self):
+        for i in range(self.counts['artifacts']):
+            category_id = self.category_sampler.one()
+            category = self.categories[category_id]
+            created_at = self.moment()
+            fields = {}
+            if self.image_pool and self.rng.random() < self.image_ratio:
+                index = self.rng.randrange(len(self.image_pool))
+                self.image_uses[index] += 1
+                fields = self.image_pool[index]
+            paragraphs = ' '.join(self.rng.sample(SENTENCES, 3))
+            yield Artifact(
+                user_id=self.user_sampler.one(),
+                title=f'{self.rng.choice(ADJECTIVES)} {self.rng.choice(NOUNS[category]) if category in NOUNS else category} #{i}',
+                description=f'<p>{paragraphs}</p>',
+                category_id=category_id,
+                popularity_score=int(self.rng.paretovariate(1.2)) - 1,
+                view_count=min(int(self.rng.paretovariate(0.9)) - 1, 10 ** 6),
+                created_at=created_at,
+                updated_at=created_at,
+                **fields,
+            )
+
+    def generate_artifacts(self):
+        start = self.last_pk(Artifact)
+        total = self.bulk(Artifact, self.artifact_rows())
+        self.artifacts = list(Artifact.objects.filter(pk__gt=start).order_by('pk')
+                              .values_list('pk', 'user_id', 'created_at'))
+        self.artifact_sampler = ZipfSampler(self.rng, range(len(self.artifacts)))
+        self.artifacts_by_user = {}
+        for pk, user_id, _ in self.artifacts:
+            self.artifacts_by_user.setdefault(user_id, []).append(pk)
+        self.retain_images()
+
+        through = Artifact.tags.through
+        self.bulk(through, (
+            through(artifact_id=pk, tag_id=tag_id)
+            for pk, _, _ in self.artifacts
+            for tag_id in self.tag_sampler.distinct(self.rng.randint(0, 5))
+        ), timestamps=False, ignore_conflicts=True)
+        self.report('artifacts', total)
+
+    def retain_images(self):
+        """
+        Saving each placeholder counted one reference per file; make that
+        one per artifact using it, so deleting artifacts frees them.
+        """
+        renditions = Artifact.image_renditions
+        for values, uses in zip(self.image_pool, self.image_uses):
+            files = [(values['original_image'], default_storage), *renditions.files(values)]
+            for name, storage in files:
+                if uses:
+                    Blob.objects.filter(name=name).update(references=F('references') + uses - 1)
+                else:
+                    storage.delete(name)
+
+    def after(self, created_at, days=30):
+        """A timestamp after created_at, not in the future"""
+        seconds = (self.now - created_at).total_seconds()
+        return created_at + timedelta(seconds=min(seconds, days * 86400) * self.rng.random())
+
+    def generate_engagement(self):
+        def comments():
+            for index in self.artifact_sampler.sample(self.counts['comments']):
+                pk, _, created_at = self.artifacts[index]
+                moment = self.after(created_at)
+                yield Comment(artifact_id=pk, user_id=self.rng.choice(self.user_ids),
+                              text=f'<p>{self.rng.choice(SENTENCES)}</p>', created_at=moment, updated_at=moment)
+
+        def likes():
+            for index in self.artifact_sampler.sample(self.counts['likes']):
+                pk, _, created_at = self.artifacts[index]
+                # Generated scores already stand for these likes
+                yield Like(artifact_id=pk, user_id=self.rng.choice(self.user_ids), created_at=self.after(created_at),
+                           counted=True)
+
+        self.report('comments', self.bulk(Comment, comments()))
+        before = Like.objects.count()
+        self.bulk(Like, likes(), ignore_conflicts=True)
+        # Repeat likes by the same user were dropped
+        self.report('likes', Like.objects.count() - before)
+
+    def generate_messages(self):
+        participants = Conversation.participants.through
+        start = self.last_pk(Conversation)
+        pairs = [(self.rng.choice(self.user_ids), self.user_sampler.one())
+                 for _ in range(self.counts['conversations'])]
+        pairs = [pair for pair in dict.fromkeys(pairs) if pair[0] != pair[1]]
+        # Stamped with the last message once the messages exist
+        self.bulk(Conversation, (Conversation() for _ in pairs), timestamps=False)
+        conversation_ids = self.new_ids(Conversation, start)
+        self.bulk(participants, (
+            participants(conversation_id=conversation_id, customuser_id=user_id)
+            for conversation_id, pair in zip(conversation_ids, pairs) for user_id in pair
+        ))
+
+        last_activity = {}
+
+        def messages():
+            for conversation_id, pair in zip(conversation_ids, pairs):
+                moment = self.moment()
+                for _ in range(1 + self.mean(self.messages)):
+                    moment = self.after(moment, days=2)
+                    yield Message(conversation_id=conversation_id, sender_id=self.rng.choice(pair),
+                                  content=self.rng.choice(SENTENCES), created_at=moment,
+                                  is_read=self.rng.random() < 0.8)
+                last_activity[conversation_id] = moment
+
+        self.report('messages', self.bulk(Message, messages()))
+        Conversation.objects.bulk_update(
+            [Conversation(pk=pk, created_at=moment, updated_at=moment) for pk, moment in last_activity.items()],
+            ['created_at', 'updated_at'], batch_size=self.batch_size,
+        )
+        refresh_summaries(conversation_ids, batch_size=self.batch_size)
+
+        kinds = [kind for kind, _ in Notification.NOTIFICATION_TYPES]
+        self.report('notifications', self.bulk(Notification, (
+            Notification(user_id=user_id, notification_type=self.rng.choice(kinds),
+                         content=self.rng.choice(SENTENCES), is_read=self.rng.random() < 0.7,
+                         created_at=self.moment(30))
+            for user_id in self.user_ids for _ in range(self.mean(self.notifications))
+        )))
+
+    def generate_trading(self):
+        listing_types = [kind for kind, _ in Listing.LISTING_TYPES]
+        start = self.last_pk(Listing)
+        listed = self.rng.sample(self.artifacts, min(self.counts['listings'], len(self.artifacts)))
+
+        def listing(pk, user_id, created_at):
+            moment = self.after(created_at)
+            return Listing(seller_id=user_id, artifact_id=pk, listing_type=self.rng.choice(listing_types),
+                           price=Decimal(self.rng.randint(500, 500000)) / 100,
+                           status=self.rng.choice(['active'] * 8 + ['pending', 'completed']),
+                           created_at=moment, updated_at=moment)
+
+        self.bulk(Listing, (listing(*row) for row in listed))
+        listings = list(Listing.objects.filter(pk__gt=start).order_by('pk')
+                        .values_list('pk', 'seller_id', 'listing_type', 'created_at'))
+
+        offer_start = self.last_pk(TradeOffer)
+        statuses = [status for status, _ in TradeOffer.STATUS_CHOICES]
+        offers = []
+
+        def trade_offers():
+            for listing_id, seller_id, listing_type, created_at in listings:
+                for _ in range(self.mean(self.offers)):
+                    buyer_id = self.rng.choice(self.user_ids)
+                    if buyer_id == seller_id:
+                        continue
+                    moment = self.after(created_at)
+                    offers.append(buyer_id)
+                    yield TradeOffer(listing_id=listing_id, buyer_id=buyer_id, offer_type=listing_type,
+                                     offered_price=Decimal(self.rng.randint(500, 400000)) / 100,
+                                     status=self.rng.choice(statuses), created_at=moment, updated_at=moment)
+
+        self.bulk(TradeOffer, trade_offers())
+        offered = TradeOffer.offered_artifacts.through
+        self.bulk(offered, (
+            offered(tradeoffer_id=offer_id, artifact_id=artifact_id)
+            for offer_id, buyer_id in zip(self.new_ids(TradeOffer, offer_start), offers)
+            for artifact_id in self.rng.sample(self.artifacts_by_user.get(buyer_id, []),
+                                               min(2, len(self.artifacts_by_user.get(buyer_id, []))))
+        ), ignore_conflicts=True)
+        self.report('listings', len(listings))
+        self.report('offers', len(offers))
+
+        kinds = [kind for kind, _ in CreditTransaction.TRANSACTION_TYPES]
+        self.report('transactions', self.bulk(CreditTransaction, (
+            CreditTransaction(from_user_id=user_id, to_user_id=self.user_sampler.one(),
+                              amount=Decimal(self.rng.randint(100, 20000)) / 100,
+                              transaction_type=self.rng.choice(kinds), description=self.rng.choice(SENTENCES),
+                              created_at=self.moment())
+            for user_id in self.user_ids for _ in range(self.mean(self.transactions))
+        )))
@@ -0,0 +1,141 @@
+"""
+A process-local LRU in front of the shared cache.
+
+Some small objects are read on nearly every request: the category list and
+the viewer's visibility profile. Even from the shared cache each read is a
+round trip, so LocalCache keeps them in process memory:
+
+    categories = local_cache.get_or_set('categories', 'categories:all', load_categories)
+
+The first argument is a namespace with a version in the shared cache (see
+core/cache.py). Every local entry remembers the version it was stored under,
+and invalidate() bumps it, so the other workers drop their copies as well.
+Workers read the versions of all their namespaces in one get_many at most
+every LOCAL_CACHE_CHECK_INTERVAL seconds, which bounds how long they may
+serve an entry another worker invalidated. In the worker that invalidates,
+the entry is gone at once. Only the namespaces of entries still held are
+checked, so namespaces may be as narrow as one user.
+
+Misses fall through to the shared cache under the versioned key, then to the
+loader, through get_or_compute() so that only one worker loads at a time.
+Values are shared, not copied, so callers must not modify them. The LRU is
+bounded by LOCAL_CACHE_MAX_BYTES, measured as the pickled size of each value.
+stats() returns hit ratios per namespace.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cache import bump_version, get_or_compute, get_versions
+
+
+class LocalCache:
+
+    def __init__(self, max_bytes=None, check_interval=None):
+        self._max_bytes = max_bytes
+        self._check_interval = check_interval
+        self._entries = OrderedDict()  # key: (namespace, version, expires, size, value)
+        self._bytes = 0
+        self._versions = {}
+        self._checked = 0.0
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    @property
+    def max_bytes(self):
+        return self._max_bytes if self._max_bytes is not None else settings.LOCAL_CACHE_MAX_BYTES
+
+    @property
+    def check_interval(self):
+        if self._check_interval is not None:
+            return self._check_interval
+        return settings.LOCAL_CACHE_CHECK_INTERVAL
+
+    def _count(self, namespace, outcome):
+        counts = self._stats.setdefault(namespace, {'hits': 0, 'shared_hits': 0, 'misses': 0})
+        counts[outcome] += 1
+
+    def version(self, namespace):
+        """The namespace version, re-read from the shared cache when due"""
+        with self._lock:
+            now = time.monotonic()
+            if namespace not in self._versions or now - self._checked >= self.check_interval:
+                # One round trip for every namespace this process holds entries of
+                live = {entry[0] for entry in self._entries.values()}
+                self._versions = get_versions(live | {namespace})
+                self._checked = now
+            return self._versions[namespace]
+
+    def get_or_set(self, namespace, key, load, timeout=None):
+        """The value for key from memory, else the shared cache, else load()"""
+        version = self.version(namespace)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] == version and (entry[2] is None or entry[2] > time.monotonic()):
+                    self._entries.move_to_end(key)
+                    self._count(namespace, 'hits')
+                    return entry[4]
+                self._discard(key)
+
+        loaded = []
+
+        def compute():
+            loaded.append(True)
+            return load()
+
+        # A value loaded before an invalidation is stored under the old version
+        value = get_or_compute(f'{key}:{version}', compute, timeout)
+        with self._lock:
+            self._count(namespace, 'misses' if loaded else 'shared_hits')
+            self._store(namespace, version, key, value, timeout)
+        return value
+
+    def invalidate(self, namespace, *keys):
+        """Drop keys here, and every namespace entry in the shared cache and other workers"""
+        version = bump_version(namespace)
+        with self._lock:
+            for key in keys:
+                self._discard(key)
+            self._versions[namespace] = version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._versions.clear()
+            self._stats.clear()
+
+    def _store(self, namespace, version, key, value, timeout):
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        self._discard(key)
+        expires = None if timeout is None else time.monotonic() + timeout
+        self._entries[key] = (namespace, version, expires, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[3]
+
+    def stats(self):
+        """{namespace: hits, shared_hits, misses, hit_ratio, entries, bytes} for this process"""
+        with self._lock:
+            stats = {namespace: dict(counts, entries=0, bytes=0) for namespace, counts in self._stats.items()}
+            for namespace, _, _, size, _ in self._entries.values():
+                stats[namespace]['entries'] += 1
+                stats[namespace]['bytes'] += size
+        for counts in stats.values():
+            lookups = counts['hits'] + counts['shared_hits'] + counts['misses']
+            counts['hit_ratio'] = counts['hits'] / lookups if lookups else 0.0
+        return stats
+
+
+local_cache = LocalCache()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import compare_profiles
+
+
+class Command(BaseCommand):
+    help = ('Compare read/write throughput of concurrent SQLite connections under Django\'s '
+            'defaults and under SQLITE_PRAGMAS, on a scratch database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reader threads')
+        parser.add_argument('--writers', type=int, default=2, help='Writer threads')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+        parser.add_argument('--rows', type=int, default=10000, help='Rows in the scratch table')
+
+    def handle(self, *args, **options):
+        results = compare_profiles(settings.SQLITE_PRAGMAS, readers=options['readers'],
+                                   writers=options['writers'], duration=options['duration'],
+                                   rows=options['rows'])
+        for profile, result in results.items():
+            self.stdout.write(f"{profile:<8} {result['reads_per_second']:>10.1f} reads/s  "
+                              f"{result['writes_per_second']:>8.1f} writes/s  "
+                              f"{result['lock_errors']} lock errors")
@@ -0,0 +1,115 @@
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from artifacts.counters import view_buffer
+from core import benchmark
+from core.local_cache import local_cache
+
+
+class Command(BaseCommand):
+    help = ('Measure latency and query counts of the main views on a generated test database '
+            'and fail when a budget from the baseline is exceeded')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--artifacts', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            choices=[scenario.name for scenario in benchmark.SCENARIOS],
+                            help='Only run this scenario; may be repeated')
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'))
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Record these results as the new baseline instead of comparing')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed p95 latency growth over the baseline, as a fraction')
+        parser.add_argument('--slack-ms', type=float, default=5.0,
+                            help='Allowed p95 latency growth in milliseconds, on top of --tolerance')
+        parser.add_argument('--report', help='Also write the results and violations to this JSON file')
+
+    def handle(self, *args, **options):
+        dataset = {'users': options['users'], 'artifacts': options['artifacts'], 'seed': options['seed']}
+        baseline = None
+        if not options['update_baseline']:
+            try:
+                baseline = benchmark.read_baseline(options['baseline'])
+            except FileNotFoundError:
+                raise CommandError(f"No baseline at {options['baseline']}; run with --update-baseline first.")
+            except ValueError as e:
+                raise CommandError(str(e))
+            if baseline['dataset'] != dataset:
+                raise CommandError(f"The baseline was recorded on dataset {baseline['dataset']}; "
+                                   'pass the same --users, --artifacts and --seed.')
+
+        scenarios = [s for s in benchmark.SCENARIOS
+                     if not options['scenarios'] or s.name in options['scenarios']]
+        results = self.measure(dataset, scenarios, options, baseline)
+
+        if options['update_baseline']:
+            benchmark.write_baseline(options['baseline'], dataset, results)
+            self.stdout.write(self.style.SUCCESS(f"Wrote baseline to {options['baseline']}."))
+            return
+
+        failures = benchmark.compare(results, baseline['scenarios'], options['tolerance'], options['slack_ms'])
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as report:
+                json.dump({'dataset': dataset, 'scenarios': results, 'baseline': baseline['scenarios'],
+                           'failures': failures}, report, indent=2, sort_keys=True)
+        for failure in failures:
+            self.stderr.write(failure)
+        if failures:
+            raise CommandError(f'{len(failures)} budget(s) exceeded.')
+        self.stdout.write(self.style.SUCCESS(f'All {len(results)} scenarios are within budget.'))
+
+    def measure(self, dataset, scenarios, options, baseline=None):
+        """Build a throwaway database, media root and cache, fill them and run the scenarios"""
+        verbosity = options['verbosity']
+
+        def progress(name, result):
+            line = (f"{name:<24} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                    f"{result['queries']:>3} queries ({result['cold_queries']} cold)")
+            budget = baseline and baseline['scenarios'].get(name)
+            if budget:
+                line += f"  baseline p95 {budget['p95_ms']:.2f}ms, {budget['queries']} queries"
+            self.stdout.write(line)
+
+        # The shared cache and replicas belong to the real database; the run
+        # clears its cache and would fill it with throwaway rows. Buffered
+        # views are written once at the end, into the test database, instead
+        # of inside whichever request happens to be measured
+        scratch = tempfile.mkdtemp()
+        caches = {'default': {**settings.CACHES['default'], 'LOCATION': str(Path(scratch) / 'cache.sqlite3'),
+                              'OPTIONS': {**settings.CACHES['default'].get('OPTIONS', {}), 'CULL_INTERVAL': 0}}}
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(MEDIA_ROOT=str(Path(scratch) / 'media'), CACHES=caches, DATABASE_REPLICAS=[],
+                                   VIEW_BUFFER_FLUSH_INTERVAL=60 * 60):
+                try:
+                    if verbosity > 0:
+                        self.stdout.write(f'Generating {dataset}...')
+                    call_command('generate_load_data', prefix='bench', verbosity=max(verbosity - 1, 0),
+                                 stdout=self.stdout if verbosity > 1 else io.StringIO(), **dataset)
+                    return benchmark.run(scenarios, options['iterations'], options['warmup'], progress)
+                finally:
+                    view_buffer.flush()
+                    local_cache.clear()
+                    if hasattr(cache, 'disconnect'):
+                        cache.disconnect()
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(scratch, ignore_errors=True)
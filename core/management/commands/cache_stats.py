@@ -0,0 +1,23 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Show hit/miss counts and size of a shared cache, optionally culling it first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default', help='Cache alias from CACHES')
+        parser.add_argument('--cull', action='store_true',
+                            help='Delete expired entries and evict down to the limits first')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not hasattr(cache, 'stats'):
+            raise CommandError(f"The {options['alias']} cache ({type(cache).__name__}) keeps no stats.")
+
+        if options['cull']:
+            self.stdout.write(f'Culled {cache.cull()} entries')
+        stats = cache.stats()
+        self.stdout.write(f"{stats['hits']} hits, {stats['misses']} misses "
+                          f"({stats['hit_rate']:.1%} hit rate)")
+        self.stdout.write(f"{stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f}MB")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.snapshot import export_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Stream the dataset to a directory of newline-delimited JSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Snapshot directory, created if missing')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched from the database at a time')
+        parser.add_argument('--compress', action='store_true', help='Gzip each table file')
+
+    def handle(self, *args, **options):
+        def progress(label, count):
+            if options['verbosity'] > 0:
+                self.stdout.write(f'{label}: {count} rows')
+
+        manifest = export_snapshot(options['directory'], chunk_size=options['chunk_size'],
+                                   compress=options['compress'], progress=progress)
+        total = sum(table['rows'] for table in manifest['tables'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {total} rows from {len(manifest['tables'])} tables to {options['directory']}."
+        ))
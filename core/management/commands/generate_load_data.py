@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from artifacts.counters import recount
+from core.loadgen import DEFAULT_PASSWORD, LoadGenerator
+from user_messages.counters import recount_unread
+
+
+class Command(BaseCommand):
+    help = 'Generate a reproducible synthetic dataset for scale testing, offline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--artifacts', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--follows', type=float, default=20, help='Average follows per user')
+        parser.add_argument('--blocks', type=float, default=1, help='Average blocked users per user')
+        parser.add_argument('--friendships', type=float, default=5,
+                            help='Average friend requests sent per user')
+        parser.add_argument('--comments', type=float, default=2, help='Comments per artifact')
+        parser.add_argument('--likes', type=float, default=3, help='Likes per artifact')
+        parser.add_argument('--conversations', type=float, default=2, help='Conversations per user')
+        parser.add_argument('--messages', type=float, default=8, help='Average messages per conversation')
+        parser.add_argument('--notifications', type=float, default=5, help='Average notifications per user')
+        parser.add_argument('--listings', type=float, default=0.1, help='Fraction of artifacts listed')
+        parser.add_argument('--offers', type=float, default=2, help='Average offers per listing')
+        parser.add_argument('--transactions', type=float, default=5,
+                            help='Average credit transactions per user')
+        parser.add_argument('--image-ratio', type=float, default=0.6,
+                            help='Fraction of artifacts with an image')
+        parser.add_argument('--images', type=int, default=12,
+                            help='Distinct placeholder images shared by the artifacts')
+        parser.add_argument('--days', type=int, default=365, help='How far back activity goes')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='load', help='Username prefix')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows inserted per transaction')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not recount counters or rebuild the search index and timelines')
+
+    def handle(self, *args, **options):
+        if get_user_model().objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Users prefixed {options['prefix']}_ already exist; pick another --prefix.")
+
+        def progress(label, count):
+            if options['verbosity'] > 0:
+                self.stdout.write(f'{label}: {count}')
+
+        generator = LoadGenerator(
+            users=options['users'], artifacts=options['artifacts'], tags=options['tags'],
+            follows=options['follows'], blocks=options['blocks'], friendships=options['friendships'],
+            comments=options['comments'], likes=options['likes'],
+            conversations=options['conversations'], messages=options['messages'],
+            notifications=options['notifications'], listings=options['listings'],
+            offers=options['offers'], transactions=options['transactions'],
+            image_ratio=options['image_ratio'], images=options['images'], days=options['days'],
+            seed=options['seed'], prefix=options['prefix'], batch_size=options['batch_size'],
+            progress=progress,
+        )
+        generator.generate()
+
+        if not options['skip_derived']:
+            for _ in recount(batch_size=options['batch_size']):
+                pass
+            for _ in recount_unread(batch_size=options['batch_size']):
+                pass
+            call_command('rebuild_search_index', verbosity=options['verbosity'], stdout=self.stdout)
+            call_command('rebuild_timelines', verbosity=options['verbosity'], stdout=self.stdout)
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['users']} users and {options['artifacts']} artifacts; "
+            f'every password is {DEFAULT_PASSWORD}.'
+        ))
@@ -0,0 +1,52 @@
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core.snapshot import SnapshotImporter
+
+
+class Command(BaseCommand):
+    help = 'Restore a snapshot written by export_snapshot into an empty database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Snapshot directory')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows inserted per transaction')
+        parser.add_argument('--resume', action='store_true',
+                            help='Continue an interrupted import from its checkpoint')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Do not rebuild the search index, timelines and conversation summaries afterwards')
+
+    def handle(self, *args, **options):
+        def progress(label, line, total):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{label}: {line}/{total}')
+
+        try:
+            importer = SnapshotImporter(options['directory'], batch_size=options['batch_size'],
+                                        progress=progress)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read snapshot: {e}')
+
+        checkpoint = importer.read_checkpoint()
+        if options['resume'] and checkpoint is None:
+            raise CommandError('There is no checkpoint to resume from.')
+        if not options['resume']:
+            if checkpoint is not None:
+                raise CommandError('An earlier import was interrupted; rerun with --resume.')
+            non_empty = importer.non_empty_tables()
+            if non_empty:
+                raise CommandError(f"Refusing to import into non-empty tables: {', '.join(non_empty)}")
+
+        inserted = importer.run(resume=options['resume'])
+        for label, count in inserted.items():
+            if options['verbosity'] > 0:
+                self.stdout.write(f'{label}: {count} rows')
+
+        if not options['skip_derived']:
+            call_command('rebuild_search_index', verbosity=options['verbosity'], stdout=self.stdout)
+            call_command('rebuild_timelines', verbosity=options['verbosity'], stdout=self.stdout)
+            call_command('rebuild_conversation_summaries', verbosity=options['verbosity'], stdout=self.stdout)
+        # Cached pages, profiles and cards may describe the old data
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(f'Imported {sum(inserted.values())} rows.'))
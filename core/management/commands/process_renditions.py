@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import renditions
+
+
+class Command(BaseCommand):
+    help = 'Generate image renditions for pending uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Rows claimed per model on each pass')
+        parser.add_argument('--interval', type=float, default=settings.RENDITION_POLL_INTERVAL,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--requeue', action='store_true',
+                            help='Retry failed rows and rows left processing by a dead worker')
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            for item in renditions.registry:
+                count = item.requeue()
+                if count:
+                    self.stdout.write(f'Requeued {count} rows of {item}')
+
+        while True:
+            results = renditions.process_pending(batch_size=options['batch_size'])
+            if results:
+                summary = ', '.join(f'{count} {status}' for status, count in sorted(results.items()))
+                self.stdout.write(f'Processed renditions: {summary}')
+            elif options['once']:
+                self.stdout.write(self.style.SUCCESS('No pending renditions left.'))
+                return
+            else:
+                time.sleep(options['interval'])
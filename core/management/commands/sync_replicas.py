@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database to every replica in DATABASE_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Sync once and exit instead of repeating')
+        parser.add_argument('--interval', type=float, default=settings.REPLICA_SYNC_INTERVAL,
+                            help='Seconds between syncs, which bounds the replica lag')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured; set SQLITE_REPLICAS.')
+
+        while True:
+            start = time.perf_counter()
+            try:
+                synced = replicas.sync_replicas()
+            except ValueError as e:
+                raise CommandError(str(e))
+            if options['verbosity'] > 1 or options['once']:
+                self.stdout.write(f"Synced {', '.join(synced)} in {time.perf_counter() - start:.2f}s")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,225 @@
+"""
+Per-request SQL instrumentation and replica routing.
+
+QueryInstrumentationMiddleware wraps every database connection with
+execute_wrapper for the duration of a request and records each query's
+duration and shape. The shape is the SQL with literals and IN lists
+collapsed, so the same lazy load issued for every card of a page counts as
+one shape repeated twenty times. For each repeated shape the call site is
+kept: the template line when the query came from rendering, otherwise the
+innermost project frame.
+
+The recorder is kept as request.query_recorder, which is how the view
+benchmarks count queries. Every request is summarized on the
+``core.queries`` logger. Shapes repeated
+more than QUERY_REPEAT_THRESHOLD times are logged as warnings with their
+call sites, and with QUERY_STRICT on (the test settings) they raise
+RepeatedQueryError instead. With QUERY_COUNT_HEADER the counts are also sent
+as X-Query-Count and X-Query-Time response headers.
+
+ReplicaMiddleware decides per request whether reads may go to a replica,
+see core/replicas.py.
+
+Both work for sync and async views. Under ASGI the recorder is installed on
+the request thread's connections, and run_query() (core/async_views.py)
+installs it in the worker threads it runs queries on.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import replicas
+
+logger = logging.getLogger('core.queries')
+
+current_recorder = ContextVar('query_recorder', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+PROJECT_ROOT = str(settings.BASE_DIR) + os.sep
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class RepeatedQueryError(Exception):
+    """The same query shape ran too often in one request, usually an N+1"""
+
+
+def query_shape(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """The template line or project code that issued the current query"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        token, origin = getattr(node, 'token', None), getattr(node, 'origin', None)
+        if token is not None and origin is not None and 'django' + os.sep + 'template' in frame.f_code.co_filename:
+            return f'{origin.template_name}:{token.lineno}'
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (filename.startswith(PROJECT_ROOT) and filename != _THIS_FILE
+                and 'site-packages' not in filename):
+            return f'{os.path.relpath(filename, PROJECT_ROOT)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryRecorder:
+    """execute_wrapper that tallies queries by shape"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+        self.sites = {}
+        # Async views run queries from several threads at once
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            shape = query_shape(sql)
+            with self._lock:
+                self.duration += duration
+                self.count += 1
+                self.shapes[shape] += 1
+                repeated = self.shapes[shape] > 1
+            if repeated:
+                # The first occurrence is not suspicious; only look up sites of repeats
+                site = call_site()
+                with self._lock:
+                    self.sites.setdefault(shape, Counter())[site] += 1
+
+    def repeated(self, threshold):
+        """(shape, count, call sites) of shapes run more than threshold times"""
+        return [(shape, count, self.sites.get(shape, Counter()))
+                for shape, count in self.shapes.most_common() if count > threshold]
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def install(stack, recorder):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        recorder = request.query_recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        try:
+            with ExitStack() as stack:
+                self.install(stack, recorder)
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.report(request, recorder, response)
+
+    async def __acall__(self, request):
+        recorder = request.query_recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        stack = ExitStack()
+        try:
+            # On the thread the request's sync code and queries run on
+            await sync_to_async(self.install)(stack, recorder)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            current_recorder.reset(token)
+        return self.report(request, recorder, response)
+
+    def report(self, request, recorder, response):
+        duration_ms = recorder.duration * 1000
+        logger.debug('%s %s: %d queries in %.1fms', request.method, request.path, recorder.count, duration_ms)
+
+        repeated = recorder.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        for shape, count, sites in repeated:
+            logger.warning('%s %s: query repeated %d times: %s (from %s)', request.method, request.path,
+                           count, shape, ', '.join(f'{site} x{n}' for site, n in sites.most_common(3)))
+        if repeated and settings.QUERY_STRICT:
+            shape, count, sites = repeated[0]
+            raise RepeatedQueryError(f'{request.path} ran the same query {count} times '
+                                     f'(limit {settings.QUERY_REPEAT_THRESHOLD}): {shape} '
+                                     f'from {", ".join(sites)}')
+
+        if settings.QUERY_COUNT_HEADER:
+            response['X-Query-Count'] = str(recorder.count)
+            response['X-Query-Time'] = f'{duration_ms:.1f}ms'
+        return response
+
+
+class ReplicaMiddleware:
+    """Replica reads for @replica_reads views, except shortly after a write"""
+
+    SAFE_METHODS = ('GET', 'HEAD')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replicas.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            routing = replicas.end_request(token)
+        return self.pin(request, routing, response)
+
+    async def __acall__(self, request):
+        token = replicas.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing = replicas.end_request(token)
+        return self.pin(request, routing, response)
+
+    def pin(self, request, routing, response):
+        if routing.wrote or request.method not in self.SAFE_METHODS:
+            pin = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(replicas.PIN_COOKIE, str(int(time.time() + pin)), max_age=pin,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in self.SAFE_METHODS and getattr(view_func, 'replica_reads', False)
+                and not self.pinned(request)):
+            replicas.use_replica()
+
+    @staticmethod
+    def pinned(request):
+        try:
+            return float(request.COOKIES.get(replicas.PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
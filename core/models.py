@@ -1,3 +1,32 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 
-# Create your models here.
+
+class Blob(models.Model):
+    """A file in the content-addressed media store and how many fields point at it"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.references} references)'
+
+    @classmethod
+    def retain(cls, name, size):
+        if cls.objects.filter(name=name).update(references=F('references') + 1):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, size=size, references=1)
+        except IntegrityError:
+            # Another upload of the same content created it first
+            cls.objects.filter(name=name).update(references=F('references') + 1)
+
+    @classmethod
+    def release(cls, name):
+        """Drop one reference. Returns True when the last one is gone."""
+        with transaction.atomic():
+            cls.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+            deleted, _ = cls.objects.filter(name=name, references=0).delete()
+        return bool(deleted)
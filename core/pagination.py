@@ -0,0 +1,210 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of COUNT + OFFSET, each page remembers the sort key of its last row in
+an opaque cursor and the next page starts with a range condition on that key.
+Page cost stays flat however deep the user scrolls, as long as the ordering is
+backed by an index.
+"""
+import base64
+import datetime
+import heapq
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder rounds datetimes to milliseconds; cursors need them exact"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as e:
+        raise InvalidCursor('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+class CursorPage:
+    """One page of results, with the cursor needed to fetch the next one"""
+
+    def __init__(self, object_list, next_cursor, cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __repr__(self):
+        return f'<CursorPage cursor={self.cursor!r}>'
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset by a tuple of order fields, e.g. ('-created_at',).
+
+    The primary key is appended as a tiebreaker (in the direction of the last
+    field) unless the ordering already ends with it, so every row has a unique
+    position. Ordering fields must be non-null columns or annotations with an
+    output field.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.ordering = self._with_tiebreaker(tuple(ordering))
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = int(per_page)
+
+    @staticmethod
+    def _with_tiebreaker(ordering):
+        last = ordering[-1] if ordering else '-pk'
+        if last.lstrip('-') in ('pk', 'id'):
+            return ordering
+        return ordering + (('-pk' if last.startswith('-') else 'pk'),)
+
+    def _fields(self):
+        return [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    def _position(self, obj):
+        return [getattr(obj, name) for name, _ in self._fields()]
+
+    def _to_python(self, name, value):
+        # Order fields are never null, and a tampered cursor must not put a
+        # list or dict into the query
+        if value is None or isinstance(value, (list, dict)):
+            raise InvalidCursor('Invalid cursor')
+        opts = self.queryset.model._meta
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations are checked against their output field
+            annotation = self.queryset.query.annotations.get(name)
+            if annotation is None:
+                raise InvalidCursor('Invalid cursor')
+            field = annotation.output_field
+        try:
+            value = field.to_python(value)
+        except (ValidationError, TypeError, ValueError) as e:
+            raise InvalidCursor('Invalid cursor') from e
+        if value is None:
+            raise InvalidCursor('Invalid cursor')
+        return value
+
+    def _after(self, values):
+        """Q object selecting every row that sorts after the given position"""
+        fields = self._fields()
+        if len(values) != len(fields):
+            raise InvalidCursor('Cursor does not match the ordering')
+        values = [self._to_python(name, value) for (name, _), value in zip(fields, values)]
+
+        condition = Q()
+        for i, (name, descending) in enumerate(fields):
+            step = Q(**{f'{name}__lt' if descending else f'{name}__gt': values[i]})
+            for (prev_name, _), prev_value in zip(fields[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(decode_cursor(cursor)))
+
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = encode_cursor(self._position(rows[-1]))
+        return CursorPage(rows, next_cursor, cursor=cursor or None)
+
+    def get_page(self, cursor=None):
+        """Like page(), but fall back to the first page on a bad cursor"""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+def paginate(request, queryset, ordering, per_page=None, cursor_param='cursor'):
+    """Shortcut for views: read the cursor from the query string and fetch a page"""
+    per_page = per_page or settings.DEFAULT_PAGE_SIZE
+    paginator = CursorPaginator(queryset, ordering, per_page)
+    return paginator.get_page(request.GET.get(cursor_param))
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Paginate the union of several querysets of one model, e.g. the two sides
+    of an OR. A single query with the OR has to collect every match and sort
+    it; here each branch reads one page from its own index and the pages are
+    merged in Python. A row matching several branches is listed once.
+    """
+
+    def __init__(self, querysets, ordering, per_page):
+        querysets = list(querysets)
+        super().__init__(querysets[0], ordering, per_page)
+        if len({descending for _, descending in self._fields()}) > 1:
+            raise ValueError('Merged pagination needs every order field in the same direction')
+        self.querysets = [queryset.order_by(*self.ordering) for queryset in querysets]
+
+    def page(self, cursor=None):
+        after = self._after(decode_cursor(cursor)) if cursor else None
+        descending = self._fields()[0][1]
+        branches = [list((queryset.filter(after) if after else queryset)[:self.per_page + 1])
+                    for queryset in self.querysets]
+
+        rows, seen = [], set()
+        for obj in heapq.merge(*branches, key=self._position, reverse=descending):
+            if obj.pk not in seen:
+                seen.add(obj.pk)
+                rows.append(obj)
+
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = encode_cursor(self._position(rows[-1]))
+        return CursorPage(rows, next_cursor, cursor=cursor or None)
+
+
+def paginate_merged(request, querysets, ordering, per_page=None, cursor_param='cursor'):
+    """paginate() for the union of querysets, see MergedCursorPaginator"""
+    per_page = per_page or settings.DEFAULT_PAGE_SIZE
+    paginator = MergedCursorPaginator(querysets, ordering, per_page)
+    return paginator.get_page(request.GET.get(cursor_param))
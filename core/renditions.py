@@ -0,0 +1,228 @@
+"""
+Image renditions generated off the request path.
+
+A model declares which upload field feeds which processed fields:
+
+    image_renditions = Renditions(upload='image', original='original_image',
+                                  status='image_status', targets=('image', 'thumbnail'))
+
+On save, a fresh upload is moved untouched into the plain ``original`` field
+and the row is marked pending, so the request only pays for writing the file.
+The ``process_renditions`` worker later claims pending rows, decodes the
+original once and renders each target with its ProcessedImageField's
+processors, plus optional srcset variants of the upload field.
+Templates check the status field and show a placeholder until then.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from imagekit.utils import suggest_extension
+
+from . import imaging
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+READY = 'ready'
+FAILED = 'failed'
+
+STATUS_CHOICES = (
+    (PENDING, 'Pending'),
+    (PROCESSING, 'Processing'),
+    (READY, 'Ready'),
+    (FAILED, 'Failed'),
+)
+
+# Every Renditions declared on a model, in import order
+registry = []
+
+
+def status_field():
+    return models.CharField(max_length=10, choices=STATUS_CHOICES, default=READY, editable=False)
+
+
+class Renditions:
+    """Upload, original and status fields plus the fields rendered from them"""
+
+    def __init__(self, upload, original, status, targets, variants=None):
+        self.upload = upload
+        self.original = original
+        self.status = status
+        self.targets = tuple(targets)
+        # Optional JSONField receiving the srcset variants of the upload field
+        self.variants = variants
+        self.model = None
+
+    def __set_name__(self, owner, name):
+        self.model = owner
+        self.name = name
+        registry.append(self)
+
+    def __str__(self):
+        return f'{self.model._meta.label}.{self.name}'
+
+    @property
+    def manager(self):
+        return self.model._default_manager
+
+    def defer(self, instance):
+        """Call from Model.save(): park a fresh upload as the original"""
+        upload = getattr(instance, self.upload)
+        if upload and not upload._committed:
+            setattr(instance, self.original, upload.file)
+            for target in self.targets:
+                setattr(instance, target, None)
+            if self.variants:
+                setattr(instance, self.variants, [])
+            setattr(instance, self.status, PENDING)
+        elif not upload and getattr(instance, self.status) == READY:
+            # The upload was cleared on the form
+            setattr(instance, self.original, None)
+
+    def is_pending(self, instance):
+        return getattr(instance, self.status) in (PENDING, PROCESSING)
+
+    def pending_ids(self, limit=None):
+        ids = (self.manager.filter(**{self.status: PENDING})
+               .order_by('pk').values_list('pk', flat=True))
+        return list(ids[:limit] if limit else ids)
+
+    def claim(self, pk):
+        """Mark one pending row as processing; False if another worker got it"""
+        return self.manager.filter(pk=pk, **{self.status: PENDING}).update(**{self.status: PROCESSING}) == 1
+
+    def requeue(self):
+        """Put rows left processing by a dead worker, or failed, back in the queue"""
+        return (self.manager.filter(**{f'{self.status}__in': (PROCESSING, FAILED)})
+                .exclude(**{self.original: ''}).exclude(**{f'{self.original}__isnull': True})
+                .update(**{self.status: PENDING}))
+
+    def render(self, instance):
+        """
+        Decode the original once and store every target, plus the srcset
+        variants of the upload field. Returns the values to save.
+        """
+        original = getattr(instance, self.original)
+        with original.open('rb') as source:
+            data = source.read()
+        stem = os.path.splitext(os.path.basename(original.name))[0]
+
+        specs = {target: self.model._meta.get_field(target).get_spec(source=None)
+                 for target in self.targets}
+        edges = imaging.required_edges([p for spec in specs.values() for p in spec.processors])
+        source = imaging.decode(data, edges)
+
+        values, rendered = {}, {}
+        for target, spec in specs.items():
+            rendered[target] = imaging.process(source, spec.processors)
+            values[target] = self._store(instance, target, f'{stem}{suggest_extension(stem, spec.format)}',
+                                         imaging.encode(rendered[target], spec.format, spec.options))
+        if self.variants:
+            values[self.variants] = self._render_variants(instance, stem, rendered[self.upload], values[self.upload])
+        return values
+
+    def _store(self, instance, field_name, name, content):
+        field = self.model._meta.get_field(field_name)
+        return field.storage.save(field.generate_filename(instance, name), ContentFile(content))
+
+    def _render_variants(self, instance, stem, display, display_name):
+        """
+        Downscale the display rendition to each responsive width, largest
+        first so every resize starts from the nearest bigger bitmap, and
+        encode each in every supported format. The display rendition itself
+        is the widest JPEG entry.
+        """
+        variants = [{'name': display_name, 'type': imaging.JPEG[1],
+                     'width': display.width, 'height': display.height}]
+        widths = sorted((w for w in settings.IMAGE_VARIANT_WIDTHS if w < display.width), reverse=True)
+        image = display
+        for width in [display.width] + widths:
+            if width != image.width:
+                image = imaging.downscale(image, width)
+            for format, mime, extension, options in imaging.variant_formats():
+                if format == imaging.JPEG[0] and image is display:
+                    continue
+                name = self._store(instance, self.upload, f'variants/{stem}-{width}w.{extension}',
+                                   imaging.encode(image, format, options))
+                variants.append({'name': name, 'type': mime, 'width': image.width, 'height': image.height})
+        return variants
+
+    def variant_files(self, variants, display_name):
+        """(name, storage) of each variant that holds its own file reference"""
+        storage = self.model._meta.get_field(self.upload).storage
+        display_seen = False
+        for variant in variants or ():
+            if variant['name'] == display_name and not display_seen:
+                # Stored once as the upload field's target
+                display_seen = True
+                continue
+            yield variant['name'], storage
+
+    def files(self, values):
+        """(name, storage) of every file referenced by render() output"""
+        for target in self.targets:
+            if values.get(target):
+                yield values[target], self.model._meta.get_field(target).storage
+        if self.variants:
+            yield from self.variant_files(values.get(self.variants), values.get(self.upload))
+
+    def discard(self, values):
+        """Delete files written by render() that will never be referenced"""
+        for name, storage in self.files(values):
+            storage.delete(name)
+
+    def reuse(self, instance):
+        """
+        Renditions of another row with the same original, when the storage
+        is content-addressed and can share them. Returns values or None.
+        """
+        original = getattr(instance, self.original).name
+        storages = {self.model._meta.get_field(name).storage for name in (self.original, *self.targets)}
+        if not original or not all(hasattr(storage, 'retain') for storage in storages):
+            return None
+
+        fields = self.targets + ((self.variants,) if self.variants else ())
+        donor = (self.manager.filter(**{self.original: original, self.status: READY})
+                 .exclude(pk=instance.pk).values(*fields).first())
+        if not donor or not all(donor[target] for target in self.targets):
+            return None
+        for name, storage in self.files(donor):
+            storage.retain(name)
+        return donor
+
+    def process(self, pk):
+        """Render a claimed row and mark it ready. Returns the new status, or None if it is gone."""
+        try:
+            instance = self.manager.get(pk=pk)
+        except self.model.DoesNotExist:
+            return None
+        try:
+            values = self.reuse(instance) or self.render(instance)
+        except Exception:
+            logger.exception('Rendering %s %s failed', self, pk)
+            self.manager.filter(pk=pk, **{self.status: PROCESSING}).update(**{self.status: FAILED})
+            return FAILED
+
+        updated = (self.manager.filter(pk=pk, **{self.status: PROCESSING})
+                   .update(**{self.status: READY}, **values))
+        if not updated:
+            # A new upload replaced the original while we were working
+            self.discard(values)
+            return PENDING
+        return READY
+
+
+def process_pending(batch_size=None):
+    """Process pending rows of every registered model. Returns {status: count}."""
+    results = {}
+    for renditions in registry:
+        for pk in renditions.pending_ids(batch_size):
+            if renditions.claim(pk):
+                status = renditions.process(pk)
+                if status:
+                    results[status] = results.get(status, 0) + 1
+    return results
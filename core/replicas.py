@@ -0,0 +1,127 @@
+"""
+Read replicas.
+
+Views decorated with @replica_reads read from a replica on GET and HEAD;
+everything else, and every write, goes to the primary ('default'). The
+replica aliases are listed in settings.DATABASE_REPLICAS.
+
+Replicas lag behind the primary, so ReplicaMiddleware pins a browser to the
+primary for REPLICA_PIN_SECONDS after any request that wrote, which lets
+users see their own changes (read-your-writes). Within a request, the first
+write also moves the remaining reads to the primary, and reads inside a
+transaction on the primary stay there. Writes the user did not ask for, like
+view counters or lazily created rows, run under untracked_writes() and pin
+nothing.
+
+For SQLite, each replica is a second database file refreshed from the
+primary with the online backup API by the sync_replicas command.
+"""
+import random
+import sqlite3
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+
+# Sessions are written on login and must be readable on the very next request
+PRIMARY_APPS = {'sessions'}
+
+_routing = ContextVar('replica_routing', default=None)
+_untracked = ContextVar('replica_untracked_writes', default=False)
+
+
+class Routing:
+    """Where the reads of the current request go"""
+
+    def __init__(self):
+        self.replica = None
+        self.wrote = False
+
+
+def replica_reads(view):
+    """Mark a view whose GET requests may read from a replica"""
+    view.replica_reads = True
+    return view
+
+
+def start_request():
+    """Route the current request's reads to the primary until use_replica()"""
+    return _routing.set(Routing())
+
+
+def end_request(token):
+    routing = _routing.get()
+    _routing.reset(token)
+    return routing
+
+
+def use_replica():
+    """Send the remaining reads of this request to one replica"""
+    routing = _routing.get()
+    if routing is not None and settings.DATABASE_REPLICAS and not routing.wrote:
+        # One replica per request, so all reads see the same point in time
+        routing.replica = random.choice(settings.DATABASE_REPLICAS)
+    return routing
+
+
+@contextmanager
+def untracked_writes():
+    """
+    Writes inside go to the primary without pinning the browser to it. Also
+    usable as a decorator.
+    """
+    token = _untracked.set(True)
+    try:
+        yield
+    finally:
+        _untracked.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if routing is None or routing.replica is None or model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None and not _untracked.get():
+            routing.wrote = True
+            routing.replica = None
+        # Rows read from a replica are still saved to the primary
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema with the data
+        return db not in settings.DATABASE_REPLICAS
+
+
+def sync_replica(source, target):
+    """Copy the database file source to target as one consistent snapshot"""
+    with closing(sqlite3.connect(source)) as primary, closing(sqlite3.connect(target)) as replica:
+        primary.backup(replica)
+
+
+def sync_replicas():
+    """Refresh every SQLite replica from the primary. Returns the aliases synced."""
+    primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+    synced = []
+    for alias in settings.DATABASE_REPLICAS:
+        replica = settings.DATABASES[alias]
+        if replica['ENGINE'] != primary['ENGINE'] or 'sqlite3' not in primary['ENGINE']:
+            raise ValueError(f'{alias} is not a SQLite replica; replicate it with the database itself')
+        sync_replica(str(primary['NAME']), str(replica['NAME']))
+        synced.append(alias)
+    return synced
@@ -0,0 +1,87 @@
+from collections import Counter
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import renditions
+from .sqlite import apply_pragmas
+from .storage import ContentAddressedStorage
+
+
+def _file_name(value):
+    return getattr(value, 'name', value)
+
+
+def _tracked_fields(sender):
+    """Attnames of the fields whose values hold content-addressed file references"""
+    fields = [field.attname for field in sender._meta.concrete_fields
+              if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)]
+    fields += [item.variants for item in renditions.registry if item.variants and issubclass(sender, item.model)]
+    return fields
+
+
+def _stored_files(sender, get, fields=None):
+    """
+    (name, storage) of every content-addressed file a row references, reading
+    field values with get(attname) and only looking at fields when given
+    """
+    for field in sender._meta.concrete_fields:
+        if (isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+                and (fields is None or field.attname in fields)):
+            name = _file_name(get(field.attname))
+            if name:
+                yield name, field.storage
+    for item in renditions.registry:
+        if item.variants and issubclass(sender, item.model) and (fields is None or item.variants in fields):
+            yield from item.variant_files(get(item.variants), _file_name(get(item.upload)))
+
+
+def _release(files):
+    for (name, storage), count in files.items():
+        for _ in range(count):
+            transaction.on_commit(partial(storage.delete, name))
+
+
+@receiver(pre_save)
+def remember_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Note the files a row referenced before this save, and the uploads it is about to store"""
+    fields = _tracked_fields(sender)
+    if update_fields is not None:
+        fields = [name for name in fields if name in update_fields]
+    if raw or instance._state.adding or not fields:
+        return
+    row = (sender._base_manager.using(instance._state.db).filter(pk=instance.pk)
+           .values(*_tracked_fields(sender)).first())
+    if row is None:
+        return
+    fresh = [name for name in fields if not getattr(getattr(instance, name), '_committed', True)]
+    instance._files_before_save = (fields, Counter(_stored_files(sender, row.get, fields)), fresh)
+
+
+@receiver(post_save)
+def release_replaced_files(sender, instance, **kwargs):
+    """Drop the references of files this save replaced, once it commits"""
+    if '_files_before_save' not in instance.__dict__:
+        return
+    fields, before, fresh = instance.__dict__.pop('_files_before_save')
+    current = partial(getattr, instance)
+    # Every upload stored by this save took a new reference, even when its
+    # content, and so its name, is the one the field already held
+    stored = before + Counter(_stored_files(sender, current, fresh))
+    _release(stored - Counter(_stored_files(sender, current, fields)))
+
+
+@receiver(post_delete)
+def release_files(sender, instance, **kwargs):
+    _release(Counter(_stored_files(sender, partial(getattr, instance))))
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
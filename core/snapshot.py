@@ -0,0 +1,236 @@
+"""
+Streaming dataset snapshots.
+
+A snapshot is a directory with one newline-delimited JSON file per table and
+a manifest listing them in restore order:
+
+    manifest.json
+    users.customuser.ndjson
+    artifacts.artifact_tags.ndjson      <- M2M rows are tables of their own
+    ...
+
+Export streams each table with values().iterator(), so memory stays flat no
+matter how many rows there are. Import reads each file line by line and
+inserts in bulk_create batches, one transaction per batch, writing a
+checkpoint after each so an interrupted restore can be resumed.
+
+Uploaded media is not included; files are referenced by name only.
+"""
+import datetime
+import decimal
+import gzip
+import json
+import os
+import uuid
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_APPS = ('users', 'core', 'artifacts', 'user_messages', 'trading')
+# Derived tables, rebuilt after import instead of being copied
+SNAPSHOT_EXCLUDE = {'artifacts.timelineentry'}
+# Derived columns, left empty and rebuilt after import; these pointers would
+# otherwise make the foreign keys circular
+SNAPSHOT_EXCLUDE_FIELDS = {'user_messages.conversation': {'last_message'}}
+
+MANIFEST = 'manifest.json'
+CHECKPOINT = 'import-checkpoint.json'
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def snapshot_fields(model):
+    """The columns of model that a snapshot copies"""
+    excluded = SNAPSHOT_EXCLUDE_FIELDS.get(_label(model), set())
+    return [field for field in model._meta.concrete_fields if field.name not in excluded]
+
+
+def snapshot_models():
+    """Every table to copy, ordered so rows only point at earlier tables"""
+    selected = [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.app_label in SNAPSHOT_APPS
+        and _label(model) not in SNAPSHOT_EXCLUDE
+        and not model._meta.proxy
+        # The user M2Ms to auth.Group and auth.Permission hold ids that
+        # only make sense in the source database
+        and not (model._meta.auto_created and any(
+            f.related_model._meta.app_label == 'auth' for f in model._meta.concrete_fields if f.is_relation))
+    ]
+    chosen = set(selected)
+
+    ordered, visiting, done = [], set(), set()
+
+    def visit(model):
+        if model in done:
+            return
+        if model in visiting:
+            raise ValueError(f'Circular foreign keys involving {_label(model)}')
+        visiting.add(model)
+        for field in snapshot_fields(model):
+            target = field.related_model if field.is_relation else None
+            if target in chosen and target is not model:
+                visit(target)
+        visiting.discard(model)
+        done.add(model)
+        ordered.append(model)
+
+    for model in selected:
+        visit(model)
+    return ordered
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def export_snapshot(directory, chunk_size=2000, compress=False, progress=None):
+    """Write every snapshot table to directory. Returns the manifest."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'version': SNAPSHOT_VERSION, 'tables': []}
+
+    # One transaction, so every table is read from the same point in time
+    # where the database supports it
+    with transaction.atomic():
+        for model in snapshot_models():
+            label = _label(model)
+            filename = f'{label}.ndjson' + ('.gz' if compress else '')
+            columns = [field.attname for field in snapshot_fields(model)]
+            rows = model._base_manager.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+
+            count = 0
+            with _open(os.path.join(directory, filename), 'w') as out:
+                for row in rows:
+                    out.write(json.dumps(dict(zip(columns, row)), default=_default, separators=(',', ':')))
+                    out.write('\n')
+                    count += 1
+            manifest['tables'].append({'model': label, 'file': filename, 'rows': count})
+            if progress:
+                progress(label, count)
+
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as out:
+        json.dump(manifest, out, indent=2)
+    return manifest
+
+
+@contextmanager
+def preserve_timestamps(model):
+    """Stop auto_now and auto_now_add from overwriting imported timestamps"""
+    fields = [f for f in model._meta.concrete_fields
+              if isinstance(f, models.DateField) and (f.auto_now or f.auto_now_add)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class SnapshotImporter:
+    """Restore a snapshot directory, resumable from its checkpoint"""
+
+    def __init__(self, directory, batch_size=5000, progress=None):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.progress = progress
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as manifest:
+            self.manifest = json.load(manifest)
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.manifest.get('version')}")
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.directory, CHECKPOINT)
+
+    def read_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+                return json.load(checkpoint)
+        except FileNotFoundError:
+            return None
+
+    def write_checkpoint(self, done, model=None, line=0):
+        temporary = self.checkpoint_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as checkpoint:
+            json.dump({'done': done, 'model': model, 'line': line}, checkpoint)
+        os.replace(temporary, self.checkpoint_path)
+
+    def tables(self):
+        for table in self.manifest['tables']:
+            yield apps.get_model(table['model']), table
+
+    def non_empty_tables(self):
+        return [table['model'] for model, table in self.tables() if model._base_manager.exists()]
+
+    def run(self, resume=False):
+        """Import every table. Returns {label: rows inserted}."""
+        checkpoint = self.read_checkpoint() if resume else None
+        done = list(checkpoint['done']) if checkpoint else []
+        inserted = {}
+
+        for model, table in self.tables():
+            label = table['model']
+            if label in done:
+                continue
+            skip = checkpoint['line'] if checkpoint and checkpoint['model'] == label else 0
+            inserted[label] = self.import_table(model, table, done, skip)
+            done.append(label)
+            self.write_checkpoint(done)
+
+        self.reset_sequences([model for model, _ in self.tables()])
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return inserted
+
+    def import_table(self, model, table, done, skip=0):
+        label = table['model']
+        fields = {field.attname: field for field in model._meta.concrete_fields}
+        line, count, batch = 0, 0, []
+
+        def flush():
+            nonlocal count
+            with transaction.atomic():
+                # A batch that committed just before a crash is seen again
+                # on resume; its rows are already there
+                model._base_manager.bulk_create(batch, batch_size=self.batch_size, ignore_conflicts=bool(skip))
+            count += len(batch)
+            batch.clear()
+            self.write_checkpoint(done, label, line)
+            if self.progress:
+                self.progress(label, line, table['rows'])
+
+        with preserve_timestamps(model), _open(os.path.join(self.directory, table['file']), 'r') as rows:
+            for line, raw in enumerate(rows, start=1):
+                if line <= skip:
+                    continue
+                values = json.loads(raw)
+                batch.append(model(**{name: fields[name].to_python(value) for name, value in values.items()}))
+                if len(batch) >= self.batch_size:
+                    flush()
+            if batch:
+                flush()
+        return count
+
+    def reset_sequences(self, models_):
+        statements = connection.ops.sequence_reset_sql(no_style(), models_)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
@@ -0,0 +1,126 @@
+"""
+SQLite connection tuning and a throughput benchmark for it.
+
+Every new SQLite connection runs the PRAGMA statements from
+settings.SQLITE_PRAGMAS (see core/signals.py). The defaults suit several
+gunicorn workers sharing one database file:
+
+    journal_mode=WAL       readers no longer block the writer, nor it them
+    synchronous=NORMAL     fsync at checkpoints instead of every commit; safe
+                           with WAL, a power cut can only lose the last commits
+    busy_timeout           wait for the write lock instead of failing with
+                           "database is locked"
+    mmap_size, cache_size  serve reads from memory
+    temp_store=MEMORY      sorts and temp indexes in memory
+
+compare_profiles() measures what this buys: reader and writer threads share
+a scratch database file under Django's defaults and then under the
+configured pragmas, and report operations per second for each.
+"""
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+_VALUE = re.compile(r'^-?\w+$')
+
+# What a plain django.db.backends.sqlite3 connection runs with: the rollback
+# journal, full fsync and sqlite3.connect's default 5 second timeout
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'busy_timeout': 5000,
+}
+
+
+def pragma_statements(pragmas):
+    statements = []
+    # busy_timeout first, so switching the journal mode waits for other connections
+    for name, value in sorted(pragmas.items(), key=lambda item: item[0] != 'busy_timeout'):
+        if not _VALUE.match(str(value)):
+            raise ValueError(f'Invalid value for PRAGMA {name}: {value!r}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def apply_pragmas(connection, pragmas):
+    """Run pragmas on a DB-API sqlite3 connection"""
+    for statement in pragma_statements(pragmas):
+        connection.execute(statement)
+
+
+def _prepare(path, rows):
+    with sqlite3.connect(path) as db:
+        db.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, owner INTEGER, title TEXT, '
+                   'score INTEGER, created REAL)')
+        db.execute('CREATE INDEX item_recent ON item (created, id)')
+        db.executemany('INSERT INTO item (owner, title, score, created) VALUES (?, ?, ?, ?)',
+                       [(i % 500, f'item {i}', 0, i) for i in range(rows)])
+
+
+def _worker(path, pragmas, deadline, write, counts, errors, seed):
+    rng = random.Random(seed)
+    db = sqlite3.connect(path, timeout=0, isolation_level=None, check_same_thread=False)
+    apply_pragmas(db, pragmas)
+    done = failed = 0
+    try:
+        while time.perf_counter() < deadline:
+            try:
+                if write:
+                    db.execute('BEGIN IMMEDIATE')
+                    db.execute('INSERT INTO item (owner, title, score, created) VALUES (?, ?, 0, ?)',
+                               (rng.randrange(500), 'new', time.time()))
+                    db.execute('UPDATE item SET score = score + 1 WHERE id = ?', (rng.randrange(1, 1000),))
+                    db.execute('COMMIT')
+                else:
+                    # One keyset page, as the list views read it
+                    db.execute('SELECT id, title FROM item WHERE created < ? ORDER BY created DESC, id DESC '
+                               'LIMIT 20', (rng.random() * 10000,)).fetchall()
+                done += 1
+            except sqlite3.OperationalError:
+                # "database is locked" after busy_timeout ran out
+                failed += 1
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+    finally:
+        db.close()
+    counts.append((write, done))
+    errors.append(failed)
+
+
+def measure_throughput(pragmas, readers=4, writers=2, duration=2.0, rows=10000):
+    """Run the workload on a fresh database. Returns reads/s, writes/s and lock errors."""
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'throughput.sqlite3')
+    try:
+        _prepare(path, rows)
+        counts, errors = [], []
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=_worker, args=(path, pragmas, deadline, i < writers, counts, errors, i))
+                   for i in range(readers + writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.rmdir(directory)
+
+    return {
+        'reads_per_second': round(sum(n for write, n in counts if not write) / duration, 1),
+        'writes_per_second': round(sum(n for write, n in counts if write) / duration, 1),
+        'lock_errors': sum(errors),
+    }
+
+
+def compare_profiles(pragmas, **options):
+    """Throughput with Django's defaults and with pragmas, {profile: result}"""
+    return {
+        'default': measure_throughput(DEFAULT_PRAGMAS, **options),
+        'tuned': measure_throughput(pragmas, **options),
+    }
@@ -0,0 +1,306 @@
+"""
+A cache shared by every process on the host, stored in one SQLite file.
+
+LocMemCache gives each gunicorn worker its own copy: hit rates divide by the
+worker count and a version bump (core/cache.py) only reaches one worker.
+SQLiteCache keeps the entries in a WAL-mode database file instead, so all
+workers read and write the same entries without an external service.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': '/var/cache/monolith/cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_BYTES': 256 * 1024 * 1024},
+    }}
+
+Integers are stored as SQLite integers and everything else pickled. incr()
+runs in an immediate transaction, so concurrent increments from several
+processes are never lost.
+
+Expired entries are never returned and are deleted by cull(), which a
+background thread runs every CULL_INTERVAL seconds. cull() also enforces
+MAX_ENTRIES and MAX_BYTES: when either is exceeded it evicts the oldest
+writes until a CULL_FREQUENCY-th of the limit is free again. Between culls
+the file may briefly exceed the limits.
+
+Each process counts its hits and misses and adds them to a table in the file
+when it culls; stats() returns the totals of all processes.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .sqlite import apply_pragmas
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+}
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, stored REAL NOT NULL, size INTEGER NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)',
+    'CREATE INDEX IF NOT EXISTS cache_entry_stored ON cache_entry (stored)',
+    'CREATE TABLE IF NOT EXISTS cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+]
+
+# Stay below SQLite's limit on bound parameters
+BATCH_SIZE = 500
+
+_LIVE = '(expires IS NULL OR expires > ?)'
+
+
+def _encode(value):
+    # bool is an int subclass but must come back as a bool
+    if type(value) is int:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = str(location)
+        self.max_bytes = int(options.get('MAX_BYTES', 0))
+        self.cull_interval = float(options.get('CULL_INTERVAL', 60))
+        self._local = threading.local()
+        self._connections = []
+        self._counts = {'hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+        self._culler = None
+
+    # Connections
+
+    def _connect(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=PRAGMAS['busy_timeout'] / 1000,
+                             isolation_level=None, check_same_thread=False)
+        apply_pragmas(db, PRAGMAS)
+        for statement in SCHEMA:
+            db.execute(statement)
+        return db
+
+    @property
+    def db(self):
+        # One connection per thread, reopened in a forked worker
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.db = self._connect()
+            self._local.pid = pid
+            with self._lock:
+                self._connections.append(self._local.db)
+            self._start_culler()
+        return self._local.db
+
+    def close(self, **kwargs):
+        # Django closes caches after every request; the connection is kept
+        pass
+
+    def disconnect(self):
+        """Close the connections of every thread, e.g. before removing the file"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for db in connections:
+            db.close()
+        self._local = threading.local()
+
+    # Reads
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self._counts['hits'] += hits
+            self._counts['misses'] += misses
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self.db.execute(f'SELECT value FROM cache_entry WHERE key = ? AND {_LIVE}',
+                              (key, time.time())).fetchone()
+        self._count(row is not None, row is None)
+        return default if row is None else _decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_key(key, version=version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        found, now, names = {}, time.time(), list(keys)
+        for start in range(0, len(names), BATCH_SIZE):
+            batch = names[start:start + BATCH_SIZE]
+            rows = self.db.execute(
+                f"SELECT key, value FROM cache_entry WHERE key IN ({', '.join('?' * len(batch))}) AND {_LIVE}",
+                (*batch, now))
+            for key, value in rows:
+                found[keys[key]] = _decode(value)
+        self._count(len(found), len(keys) - len(found))
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.db.execute(f'SELECT 1 FROM cache_entry WHERE key = ? AND {_LIVE}',
+                               (key, time.time())).fetchone() is not None
+
+    # Writes
+
+    def _write(self, rows, timeout, mode='REPLACE'):
+        """Store (key, value) rows; mode is REPLACE or IGNORE. Returns the rows written."""
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        encoded = [(key, *_encode(value)) for key, value in rows]
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if mode == 'IGNORE':
+                # Expired entries do not count as present
+                db.executemany('DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                               [(key, now) for key, _, _ in encoded])
+            written = db.executemany(
+                f'INSERT OR {mode} INTO cache_entry (key, value, expires, stored, size) VALUES (?, ?, ?, ?, ?)',
+                [(key, value, expires, now, size) for key, value, size in encoded]).rowcount
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return written
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write([(key, value)], timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = [(self.make_key(key, version=version), value) for key, value in data.items()]
+        for key, _ in rows:
+            self.validate_key(key)
+        self._write(rows, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._write([(key, value)], timeout, mode='IGNORE') == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        return self.db.execute(f'UPDATE cache_entry SET expires = ? WHERE key = ? AND {_LIVE}',
+                               (self.get_backend_timeout(timeout), key, now)).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self.db
+        # Immediate: no other process can write between the read and the update
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(f'SELECT value FROM cache_entry WHERE key = ? AND {_LIVE}',
+                             (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value, size = _encode(_decode(row[0]) + delta)
+            db.execute('UPDATE cache_entry SET value = ?, size = ? WHERE key = ?', (value, size, key))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return _decode(value)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.db.execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        self.db.executemany('DELETE FROM cache_entry WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache_entry')
+
+    # Maintenance
+
+    def _start_culler(self):
+        if self.cull_interval <= 0:
+            return
+        with self._lock:
+            if self._culler is None or not self._culler.is_alive():
+                self._culler = threading.Thread(target=self._cull_forever, name='sqlite-cache-cull',
+                                                daemon=True)
+                self._culler.start()
+
+    def _cull_forever(self):
+        while True:
+            time.sleep(self.cull_interval)
+            try:
+                self.cull()
+            except sqlite3.Error:
+                # Locked for longer than busy_timeout; try again next time
+                pass
+
+    def cull(self):
+        """Delete expired entries, then evict the oldest down to the limits. Returns rows deleted."""
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            deleted = db.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),)).rowcount
+            count, size = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entry').fetchone()
+            keep = 1 - 1 / self._cull_frequency if self._cull_frequency else 0
+            if count > self._max_entries:
+                deleted += db.execute(
+                    'DELETE FROM cache_entry WHERE key IN '
+                    '(SELECT key FROM cache_entry ORDER BY stored LIMIT ?)',
+                    (count - int(self._max_entries * keep),)).rowcount
+            if self.max_bytes and size > self.max_bytes:
+                # Newest first, keep rows while the running total fits
+                deleted += db.execute(
+                    'DELETE FROM cache_entry WHERE key IN (SELECT key FROM '
+                    '(SELECT key, SUM(size) OVER (ORDER BY stored DESC, key) AS total FROM cache_entry) '
+                    'WHERE total > ?)', (int(self.max_bytes * keep),)).rowcount
+            self._flush_counts(db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return deleted
+
+    def _flush_counts(self, db):
+        with self._lock:
+            counts, self._counts = self._counts, {'hits': 0, 'misses': 0}
+        db.executemany('INSERT INTO cache_stats (name, value) VALUES (?, ?) '
+                       'ON CONFLICT (name) DO UPDATE SET value = value + excluded.value',
+                       list(counts.items()))
+
+    def stats(self):
+        """Hits and misses of every process so far, and the current size"""
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            self._flush_counts(db)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        stats = {'hits': 0, 'misses': 0, **dict(db.execute('SELECT name, value FROM cache_stats'))}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        now = time.time()
+        stats['entries'], stats['bytes'] = db.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entry WHERE {_LIVE}', (now,)).fetchone()
+        return stats
@@ -0,0 +1,81 @@
+"""
+Content-addressed media storage.
+
+Every saved file is stored once under the SHA-256 of its bytes, sharded by
+the first two byte pairs of the digest:
+
+    blobs/3f/a2/3fa2...c9.jpg
+
+Saving content that is already stored writes nothing and only adds a
+reference to its Blob row; deleting drops a reference and removes the file
+with the last one. Both happen under the Blob row's write lock, so a save
+never counts on a file that a concurrent delete is removing. Files saved
+before this storage was enabled keep their old names and are deleted as
+usual.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+BLOB_PREFIX = 'blobs/'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    @staticmethod
+    def blob_name(digest, extension):
+        return f'{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+    @staticmethod
+    def is_blob(name):
+        return name.startswith(BLOB_PREFIX)
+
+    @staticmethod
+    def digest(content):
+        sha, size = hashlib.sha256(), 0
+        for chunk in content.chunks():
+            sha.update(chunk)
+            size += len(chunk)
+        return sha.hexdigest(), size
+
+    def get_available_name(self, name, max_length=None):
+        # Identical names mean identical content, so a name is never taken
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        digest, size = self.digest(content)
+        blob = self.blob_name(digest, os.path.splitext(name)[1])
+        with transaction.atomic():
+            # The reference is taken before looking for the file: a delete()
+            # that already dropped the last one has removed the file by the
+            # time this lock is granted, and a later one sees this reference
+            Blob.retain(blob, size)
+            if not self.exists(blob):
+                # Written under a unique name and renamed into place, so two
+                # processes storing the same content never see a partial file
+                temporary = super()._save(f'{blob}.{uuid.uuid4().hex}.tmp', content)
+                os.replace(self.path(temporary), self.path(blob))
+        return blob
+
+    def retain(self, name, size=None):
+        """Add a reference to a stored blob, e.g. when reusing a rendition"""
+        from .models import Blob
+
+        if self.is_blob(name):
+            Blob.retain(name, self.size(name) if size is None else size)
+
+    def delete(self, name):
+        from .models import Blob
+
+        if not self.is_blob(name):
+            super().delete(name)
+            return
+        with transaction.atomic():
+            # Removed while the row's deletion still holds the lock, see _save()
+            if Blob.release(name):
+                super().delete(name)
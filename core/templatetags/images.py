@@ -0,0 +1,37 @@
+from django import template
+
+register = template.Library()
+
+
+def _srcset(storage, variants):
+    return ', '.join(f"{storage.url(v['name'])} {v['width']}w" for v in variants)
+
+
+@register.inclusion_tag('core/includes/picture.html')
+def picture(image, variants=None, sizes='100vw', alt='', css_class='', loading='lazy'):
+    """
+    Render an image field as a <picture> with one <source> per modern format
+    and a JPEG srcset on the <img>, from the variants stored by the renditions
+    worker. Rows without variants fall back to a plain <img>.
+
+        {% picture artifact.image artifact.image_variants sizes="400px" alt=artifact.title %}
+    """
+    by_type = {}
+    for variant in sorted(variants or (), key=lambda v: v['width']):
+        by_type.setdefault(variant['type'], []).append(variant)
+    fallback = by_type.pop('image/jpeg', [])
+    largest = fallback[-1] if fallback else None
+
+    return {
+        'src': image.url,
+        'srcset': _srcset(image.storage, fallback),
+        # Most compact format first; browsers take the first type they support
+        'sources': [{'type': mime, 'srcset': _srcset(image.storage, by_type[mime])}
+                    for mime in ('image/avif', 'image/webp') if mime in by_type],
+        'sizes': sizes,
+        'alt': alt,
+        'css_class': css_class,
+        'loading': loading,
+        'width': largest['width'] if largest else None,
+        'height': largest['height'] if largest else None,
+    }
@@ -1,3 +1,806 @@
-from django.test import TestCase
+import io
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Q
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from artifacts.caching import get_categories
+from artifacts.models import Artifact, Category, Comment, Tag, UserPreference
+from core import benchmark, replicas
+from core.cache import get_or_compute
+from core.local_cache import LocalCache
+from core.middleware import QueryInstrumentationMiddleware, ReplicaMiddleware, RepeatedQueryError, query_shape
+from core.models import Blob
+from core.pagination import CursorPaginator, InvalidCursor, MergedCursorPaginator, decode_cursor, encode_cursor
+from core.snapshot import CHECKPOINT, snapshot_models
+from core.sqlite import measure_throughput, pragma_statements
+from core.sqlite_cache import SQLiteCache
+from core.storage import ContentAddressedStorage
+from artifacts.visibility import VisibilityProfile
+from trading.models import CreditTransaction, Listing, TradeOffer
+from user_messages.models import Message, Notification
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    """Keyset pagination walks every row exactly once, for every sort."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='collector', password='testpassword')
+        now = timezone.now()
+        for i in range(25):
+            artifact = Artifact.objects.create(user=user, title=f'Artifact {i % 7}', popularity_score=i % 4)
+            # Force ties on created_at so the id tiebreaker matters
+            Artifact.objects.filter(pk=artifact.pk).update(
+                created_at=now - timedelta(minutes=i // 3, microseconds=i % 2)
+            )
+
+    def walk(self, ordering, per_page=4):
+        paginator = CursorPaginator(Artifact.objects.all(), ordering, per_page)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(a.pk for a in page)
+            if not page.has_next():
+                return seen
+            cursor = page.next_cursor
+
+    def test_walks_all_sorts_in_order(self):
+        for sort in ('-created_at', 'created_at', '-popularity_score', 'title', '-title'):
+            with self.subTest(sort=sort):
+                tiebreaker = '-pk' if sort.startswith('-') else 'pk'
+                expected = list(Artifact.objects.order_by(sort, tiebreaker).values_list('pk', flat=True))
+                self.assertEqual(self.walk((sort,)), expected)
+
+    def test_page_runs_without_count(self):
+        paginator = CursorPaginator(Artifact.objects.all(), ('-created_at',), 5)
+        first = paginator.page()
+        with self.assertNumQueries(1):
+            second = paginator.page(first.next_cursor)
+        self.assertEqual(len(second), 5)
+        self.assertTrue(second.has_previous())
+
+    def test_invalid_cursor(self):
+        paginator = CursorPaginator(Artifact.objects.all(), ('-created_at',), 5)
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('e30')  # {}
+        self.assertEqual(len(paginator.get_page('not-a-cursor')), 5)
+
+    def test_tampered_cursor_values(self):
+        paginator = CursorPaginator(Artifact.objects.all(), ('-created_at',), 5)
+        for values in ([None, 1], [{'a': 1}, 1], [[1], 1], ['yesterday', 1], [5, 1], ['2024-01-01T00:00:00', 'x']):
+            with self.subTest(values=values):
+                with self.assertRaises(InvalidCursor):
+                    paginator.page(encode_cursor(values))
+                self.assertEqual(len(paginator.get_page(encode_cursor(values))), 5)
+
+    def test_views_fall_back_on_tampered_cursor(self):
+        self.client.force_login(User.objects.get(username='collector'))
+        cursor = encode_cursor([None, 1])
+        for url in ('/', '/messages/notifications/', '/trading/marketplace/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 200)
+
+    def test_artifact_list_xhr_returns_next_cursor(self):
+        response = self.client.get('/', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        data = response.json()
+        self.assertTrue(data['has_next'])
+        self.assertIn('next_cursor', data)
+        self.assertNotIn('next_page', data)
+        response = self.client.get('/', {'cursor': data['next_cursor']}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+
+
+class ContentAddressedStorageTest(TestCase):
+    """Identical content is stored once and reference counted."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.media_root)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_same_content_same_blob(self):
+        first = self.storage.save('artifacts/a.jpg', ContentFile(b'photo'))
+        second = self.storage.save('avatars/b.JPG', ContentFile(b'photo'))
+        other = self.storage.save('uploads/c.jpg', ContentFile(b'other photo'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^blobs/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.jpg$')
+        self.assertEqual(Blob.objects.get(name=first).references, 2)
+
+    def test_file_is_deleted_with_the_last_reference(self):
+        name = self.storage.save('a.jpg', ContentFile(b'photo'))
+        self.storage.save('b.jpg', ContentFile(b'photo'))
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+
+    def test_legacy_names_are_deleted_directly(self):
+        with open(self.storage.path('old.jpg'), 'wb') as legacy:
+            legacy.write(b'photo')
+        self.storage.delete('old.jpg')
+        self.assertFalse(self.storage.exists('old.jpg'))
+
+    def test_deleting_a_row_releases_its_files(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            user = User.objects.create_user(username='collector', password='testpassword')
+            name = default_storage.save('avatars/me.jpg', ContentFile(b'avatar'))
+            User.objects.filter(pk=user.pk).update(avatar=name)
+            user.refresh_from_db()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                user.delete()
+            self.assertFalse(Blob.objects.filter(name=name).exists())
+            self.assertFalse(default_storage.exists(name))
+
+
+class SnapshotTest(TestCase):
+    """A snapshot restores rows, M2M links and timestamps exactly."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.seller = User.objects.create_user(username='seller', password='testpassword')
+        self.buyer = User.objects.create_user(username='buyer', password='testpassword')
+        UserPreference.objects.create(user=self.buyer).following.add(self.seller)
+        self.artifact = Artifact.objects.create(user=self.seller, title='Leica M3')
+        self.artifact.tags.add(Tag.objects.create(name='rangefinder'))
+        Comment.objects.create(user=self.buyer, artifact=self.artifact, text='Lovely')
+        self.old = timezone.now() - timedelta(days=400, microseconds=7)
+        Artifact.objects.filter(pk=self.artifact.pk).update(created_at=self.old, updated_at=self.old)
+        listing = Listing.objects.create(seller=self.seller, artifact=self.artifact,
+                                         listing_type='sale', price=Decimal('120.50'))
+        offer = TradeOffer.objects.create(listing=listing, buyer=self.buyer, offer_type='sale',
+                                          offered_price=Decimal('100.00'))
+        offer.offered_artifacts.add(self.artifact)
+        CreditTransaction.objects.create(from_user=self.buyer, to_user=self.seller, amount=Decimal('3.25'),
+                                         transaction_type='transfer', description='Deposit')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def call(self, *args, **options):
+        call_command(*args, stdout=io.StringIO(), verbosity=0, **options)
+
+    def wipe(self):
+        for model in reversed(snapshot_models()):
+            model._base_manager.all().delete()
+
+    def test_round_trip(self):
+        self.call('export_snapshot', self.directory)
+        self.wipe()
+        self.assertFalse(Artifact.objects.exists())
+
+        self.call('import_snapshot', self.directory)
+        artifact = Artifact.objects.get(title='Leica M3')
+        self.assertEqual(artifact.created_at, self.old)
+        self.assertEqual(artifact.updated_at, self.old)
+        self.assertEqual([t.name for t in artifact.tags.all()], ['rangefinder'])
+        self.assertEqual(artifact.comments.count(), 1)
+        self.assertTrue(UserPreference.objects.get(user__username='buyer').is_following(artifact.user))
+        self.assertEqual(Listing.objects.get().price, Decimal('120.50'))
+        self.assertEqual(list(TradeOffer.objects.get().offered_artifacts.all()), [artifact])
+        self.assertEqual(CreditTransaction.objects.get().amount, Decimal('3.25'))
+        self.assertTrue(User.objects.get(username='buyer').check_password('testpassword'))
+        # Derived timelines were rebuilt from the restored follows
+        self.assertTrue(User.objects.get(username='buyer').timeline_entries.filter(artifact=artifact).exists())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, CHECKPOINT)))
+
+    def test_refuses_non_empty_database(self):
+        self.call('export_snapshot', self.directory)
+        with self.assertRaisesMessage(CommandError, 'non-empty'):
+            self.call('import_snapshot', self.directory)
+
+    def test_resume_from_checkpoint(self):
+        self.call('export_snapshot', self.directory, '--compress')
+        self.wipe()
+        with open(os.path.join(self.directory, 'manifest.json')) as manifest:
+            labels = [table['model'] for table in json.load(manifest)['tables']]
+
+        # Pretend the first table made it and the process died
+        self.call('import_snapshot', self.directory, skip_derived=True)
+        for model in reversed(snapshot_models()[1:]):
+            model._base_manager.all().delete()
+        with open(os.path.join(self.directory, CHECKPOINT), 'w') as checkpoint:
+            json.dump({'done': labels[:1], 'model': labels[1], 'line': 0}, checkpoint)
+
+        with self.assertRaisesMessage(CommandError, '--resume'):
+            self.call('import_snapshot', self.directory)
+        self.call('import_snapshot', self.directory, '--resume')
+        self.assertEqual(Artifact.objects.get().tags.count(), 1)
+        self.assertEqual(User.objects.count(), 2)
+
+
+
+class LoadDataTest(TestCase):
+    """generate_load_data is offline, reproducible and internally consistent."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def generate(self, **options):
+        options = {'users': 30, 'artifacts': 120, 'tags': 25, 'images': 2, 'seed': 7, **options}
+        call_command('generate_load_data', stdout=io.StringIO(), verbosity=0, **options)
+
+    def test_dataset(self):
+        self.generate()
+        self.assertEqual(User.objects.filter(username__startswith='load_').count(), 30)
+        self.assertEqual(Artifact.objects.count(), 120)
+        self.assertTrue(Tag.objects.exists())
+        self.assertTrue(Listing.objects.exists())
+        self.assertTrue(User.objects.get(username='load_0000000').check_password('testpass123'))
+
+        # Counters were recounted from the generated comments
+        artifact = Artifact.objects.filter(comment_count__gt=0).first()
+        self.assertEqual(artifact.comment_count, artifact.comments.count())
+
+        # Shared placeholders are counted once per artifact using them
+        with_images = Artifact.objects.exclude(image='')
+        name = with_images.first().original_image.name
+        uses = Artifact.objects.filter(original_image=name).count()
+        self.assertEqual(Blob.objects.get(name=name).references, uses)
+        self.assertTrue(all(a.image_variants for a in with_images))
+
+    def test_same_seed_same_dataset(self):
+        def dataset(prefix):
+            self.generate(prefix=prefix)
+            return [(title, username.split('_')[1]) for title, username in Artifact.objects
+                    .filter(user__username__startswith=prefix).order_by('pk').values_list('title', 'user__username')]
+
+        self.assertEqual(dataset('first'), dataset('second'))
+
+    def test_refuses_existing_prefix(self):
+        self.generate(artifacts=5, skip_derived=True)
+        with self.assertRaisesMessage(CommandError, '--prefix'):
+            self.generate(artifacts=5)
+
+
+class BenchmarkTest(TestCase):
+    """Every benchmark scenario renders, and budgets are enforced."""
+
+    def test_scenarios_render(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command('generate_load_data', users=20, artifacts=60, images=0, stdout=io.StringIO(), verbosity=0)
+            results = benchmark.run(iterations=2, warmup=0)
+        self.assertEqual(set(results), {scenario.name for scenario in benchmark.SCENARIOS})
+        for result in results.values():
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+
+    def test_compare(self):
+        baseline = {'user_feed': {'p50_ms': 10, 'p95_ms': 20, 'queries': 5, 'cold_queries': 6}}
+        within = {'user_feed': {'p50_ms': 12, 'p95_ms': 29, 'queries': 5, 'cold_queries': 6}}
+        self.assertEqual(benchmark.compare(within, baseline, tolerance=0.5, slack_ms=0), [])
+
+        over = {'user_feed': {'p50_ms': 12, 'p95_ms': 31, 'queries': 6, 'cold_queries': 6},
+                'unknown': {'p50_ms': 1, 'p95_ms': 1, 'queries': 1, 'cold_queries': 1}}
+        failures = benchmark.compare(over, baseline, tolerance=0.5, slack_ms=0)
+        self.assertEqual(len(failures), 2)
+        self.assertIn('6 queries', failures[0])
+        self.assertIn('p95', failures[1])
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(samples, 0.5), 50)
+        self.assertEqual(benchmark.percentile(samples, 0.95), 95)
+        self.assertEqual(benchmark.percentile([7], 0.95), 7)
+
+
+class QueryInstrumentationTest(TestCase):
+    """Repeated query shapes are reported with their call sites."""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'user{i}') for i in range(8)]
+
+    def n_plus_one(self, request):
+        for user in self.users:
+            list(Artifact.objects.filter(user=user))
+        return HttpResponse()
+
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  AND n = 3"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND n = ?',
+        )
+
+    @override_settings(QUERY_STRICT=True, QUERY_REPEAT_THRESHOLD=5)
+    def test_strict_mode_raises_with_call_site(self):
+        middleware = QueryInstrumentationMiddleware(self.n_plus_one)
+        with self.assertRaises(RepeatedQueryError) as raised:
+            middleware(RequestFactory().get('/'))
+        self.assertIn('8 times', str(raised.exception))
+        self.assertIn('core/tests.py', str(raised.exception))
+        self.assertIn('n_plus_one', str(raised.exception))
+
+    @override_settings(QUERY_STRICT=False, QUERY_REPEAT_THRESHOLD=5, QUERY_COUNT_HEADER=True)
+    def test_lenient_mode_logs_and_sets_headers(self):
+        middleware = QueryInstrumentationMiddleware(self.n_plus_one)
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response['X-Query-Count'], '8')
+        self.assertTrue(response['X-Query-Time'].endswith('ms'))
+        self.assertIn('repeated 8 times', logs.output[0])
+
+    @override_settings(QUERY_COUNT_HEADER=True)
+    def test_header_on_real_request(self):
+        response = self.client.get('/')
+        self.assertGreater(int(response['X-Query-Count']), 0)
+
+
+class QueryPlanTest(TestCase):
+    """Hot queries are answered from an index, without a full scan or a sort."""
+
+    # "SCAN table" with no index is a full table scan
+    FULL_SCAN = re.compile(r'\bSCAN (?!.*\bINDEX\b)')
+
+    def assertIndexed(self, queryset, allow_sort=False):
+        plan = queryset.explain()
+        self.assertIsNone(self.FULL_SCAN.search(plan), plan)
+        if not allow_sort:
+            self.assertNotIn('TEMP B-TREE', plan)
+
+    def page(self, queryset, ordering, cursor=None):
+        paginator = CursorPaginator(queryset, ordering, 20)
+        if cursor:
+            return paginator.queryset.filter(paginator._after(cursor))[:21]
+        return paginator.queryset[:21]
+
+    def test_artifact_lists(self):
+        artifacts = Artifact.objects.select_related('category', 'user')
+        artifacts = VisibilityProfile(user_ids=[1], tag_ids=[2], category_ids=[3]).filter(artifacts)
+        created = timezone.now().isoformat()
+        for ordering in ('-created_at', '-popularity_score'):
+            with self.subTest(ordering=ordering):
+                self.assertIndexed(self.page(artifacts, (ordering,)))
+                self.assertIndexed(self.page(artifacts.filter(category_id=1), (ordering,)))
+        self.assertIndexed(self.page(artifacts, ('-created_at',), [created, 10]))
+        self.assertIndexed(self.page(artifacts, ('-popularity_score',), [5, 10]))
+        self.assertIndexed(self.page(Artifact.objects.filter(user_id=1), ('-created_at',), [created, 10]))
+
+    def test_comments_of_an_artifact(self):
+        self.assertIndexed(Comment.objects.filter(artifact_id__in=[1]))
+
+    def test_marketplace(self):
+        self.assertIndexed(self.page(Listing.objects.filter(status='active').select_related('seller', 'artifact'),
+                                     ('-created_at',)))
+
+    def test_offers(self):
+        self.assertIndexed(self.page(TradeOffer.objects.filter(buyer_id=1), ('-created_at',)))
+        self.assertIndexed(TradeOffer.objects.filter(buyer_id=1, status='pending'))
+        self.assertIndexed(TradeOffer.objects.filter(listing_id=1, status='pending'))
+        # Offers received span all of a seller's listings, so they are sorted
+        # after being looked up by index; the sort is bounded by one seller
+        self.assertIndexed(self.page(TradeOffer.objects.filter(listing__seller_id=1), ('-created_at',)),
+                           allow_sort=True)
+
+    def test_notifications(self):
+        self.assertIndexed(self.page(Notification.objects.filter(user_id=1), ('-created_at',)))
+        plan = Notification.objects.filter(user_id=1, is_read=False).order_by().values('pk').explain()
+        self.assertIn('notification_user_unread', plan)
+
+    def test_messages_of_a_conversation(self):
+        self.assertIndexed(Message.objects.filter(conversation_id=1))
+
+    def test_credit_transactions_of_either_party(self):
+        for field in ('from_user_id', 'to_user_id'):
+            with self.subTest(field=field):
+                self.assertIndexed(self.page(CreditTransaction.objects.filter(**{field: 1}), ('-created_at',)))
+
+
+class MergedCursorPaginatorTest(TestCase):
+    """Both sides of an OR, read separately, page like the OR itself."""
+
+    def test_pages_match_the_or_query(self):
+        alice = User.objects.create(username='alice')
+        bob = User.objects.create(username='bob')
+        carol = User.objects.create(username='carol')
+        start = timezone.now() - timedelta(days=1)
+        pairs = [(alice, bob), (bob, alice), (carol, bob), (alice, alice), (carol, alice)] * 5
+        for i, (sender, receiver) in enumerate(pairs):
+            transaction = CreditTransaction.objects.create(from_user=sender, to_user=receiver, amount=1,
+                                                           transaction_type='transfer', description=str(i))
+            # Some share a timestamp, so the primary key tiebreaker matters
+            CreditTransaction.objects.filter(pk=transaction.pk).update(created_at=start + timedelta(minutes=i // 2))
+
+        expected = list(CreditTransaction.objects.filter(Q(from_user=alice) | Q(to_user=alice))
+                        .order_by('-created_at', '-pk'))
+        paginator = MergedCursorPaginator([CreditTransaction.objects.filter(from_user=alice),
+                                           CreditTransaction.objects.filter(to_user=alice)], ('-created_at',), 4)
+        seen, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            seen.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_mixed_directions_are_rejected(self):
+        with self.assertRaises(ValueError):
+            MergedCursorPaginator([Artifact.objects.all()], ('-created_at', 'title'), 5)
+
+
+class SQLitePragmaTest(TestCase):
+    """Connections are tuned on connect, and the tuning is measurable."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_configured(self):
+        # The in-memory test database ignores journal_mode and mmap_size
+        pragmas = settings.SQLITE_PRAGMAS
+        self.assertEqual(self.pragma('busy_timeout'), pragmas['busy_timeout'])
+        self.assertEqual(self.pragma('cache_size'), pragmas['cache_size'])
+        self.assertEqual(self.pragma('synchronous'), {'OFF': 0, 'NORMAL': 1, 'FULL': 2}[pragmas['synchronous']])
+        self.assertEqual(self.pragma('temp_store'), {'DEFAULT': 0, 'FILE': 1, 'MEMORY': 2}[pragmas['temp_store']])
+
+    def test_values_are_validated(self):
+        self.assertEqual(pragma_statements({'journal_mode': 'WAL', 'busy_timeout': 10}),
+                         ['PRAGMA busy_timeout = 10', 'PRAGMA journal_mode = WAL'])
+        with self.assertRaises(ValueError):
+            pragma_statements({'journal_mode': 'WAL; DROP TABLE users_customuser'})
+
+    def test_throughput(self):
+        result = measure_throughput({'journal_mode': 'WAL', 'busy_timeout': 1000},
+                                    readers=1, writers=1, duration=0.2, rows=100)
+        self.assertGreater(result['reads_per_second'], 0)
+        self.assertGreater(result['writes_per_second'], 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(SimpleTestCase):
+    # Not a TestCase: its transaction would keep every read on the primary
+    """Replica reads for marked safe requests, the primary after any write."""
+
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.routed = []
+
+    def view(self, request):
+        self.routed.append(self.router.db_for_read(Artifact))
+        return HttpResponse()
+
+    def write_view(self, request):
+        self.router.db_for_write(Artifact)
+        return self.view(request)
+
+    def dispatch(self, request, view, marked=True):
+        view_func = replicas.replica_reads(lambda request: view(request)) if marked else view
+        middleware = ReplicaMiddleware(
+            lambda request: middleware.process_view(request, view_func, (), {}) or view_func(request))
+        return middleware(request)
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Artifact), 'default')
+
+    def test_marked_get_reads_from_the_replica(self):
+        response = self.dispatch(RequestFactory().get('/'), self.view)
+        self.assertEqual(self.routed, ['replica'])
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+        # Routing ends with the request
+        self.assertEqual(self.router.db_for_read(Artifact), 'default')
+
+    def test_unmarked_view_uses_the_primary(self):
+        self.dispatch(RequestFactory().get('/'), self.view, marked=False)
+        self.assertEqual(self.routed, ['default'])
+
+    def test_sessions_stay_on_the_primary(self):
+        self.dispatch(RequestFactory().get('/'),
+                      lambda request: self.routed.append(self.router.db_for_read(Session)) or HttpResponse())
+        self.assertEqual(self.routed, ['default'])
+
+    def test_write_pins_to_the_primary(self):
+        response = self.dispatch(RequestFactory().get('/'), self.write_view)
+        self.assertEqual(self.routed, ['default'])
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = response.cookies[replicas.PIN_COOKIE].value
+        self.dispatch(request, self.view)
+        self.assertEqual(self.routed, ['default', 'default'])
+
+    def test_post_pins_and_expired_pin_is_ignored(self):
+        response = self.dispatch(RequestFactory().post('/'), self.view)
+        self.assertEqual(self.routed, ['default'])
+        self.assertEqual(response.cookies[replicas.PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[replicas.PIN_COOKIE] = '1'
+        self.dispatch(request, self.view)
+        self.assertEqual(self.routed, ['default', 'replica'])
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'artifacts'))
+        self.assertTrue(self.router.allow_migrate('default', 'artifacts'))
+
+    def test_sync_replica(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        source, target = os.path.join(directory, 'primary.sqlite3'), os.path.join(directory, 'replica.sqlite3')
+        with sqlite3.connect(source) as db:
+            db.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+            db.executemany('INSERT INTO item VALUES (?)', [(i,) for i in range(10)])
+        db.close()
+
+        replicas.sync_replica(source, target)
+        replica = sqlite3.connect(target)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute('SELECT COUNT(*) FROM item').fetchone()[0], 10)
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    """The shared cache behaves like Django's and is shared between instances."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        # Each instance stands in for another worker process
+        return SQLiteCache(self.location, {'OPTIONS': {'CULL_INTERVAL': 0, **options}})
+
+    def test_values_round_trip(self):
+        for value in (1, True, 2.5, 'text', b'bytes', {'a': [1, 2]}, None):
+            self.cache.set('key', value)
+            self.assertEqual(self.cache.get('key', 'missing'), value)
+            self.assertIs(type(self.cache.get('key', 'missing')), type(value))
+        self.assertEqual(self.cache.get('absent', 'missing'), 'missing')
+
+    def test_disconnect_closes_every_thread(self):
+        self.cache.set('key', 1)
+        thread = threading.Thread(target=self.cache.get, args=('key',))
+        thread.start()
+        thread.join()
+        connections = list(self.cache._connections)
+        self.assertEqual(len(connections), 2)
+
+        self.cache.disconnect()
+        for db in connections:
+            with self.assertRaises(sqlite3.ProgrammingError):
+                db.execute('SELECT 1')
+        # Used again, it reconnects
+        self.assertEqual(self.cache.get('key'), 1)
+
+    def test_shared_between_instances(self):
+        other = self.make_cache()
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expiry(self):
+        self.cache.set('gone', 1, timeout=-1)
+        self.cache.set('kept', 1, timeout=None)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertFalse(self.cache.has_key('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertFalse(self.cache.add('kept', 2))
+        self.assertEqual(self.cache.get('kept'), 1)
+        self.assertTrue(self.cache.touch('kept', -1))
+        self.assertIsNone(self.cache.get('kept'))
+
+    def test_many(self):
+        self.cache.set_many({f'key{i}': i for i in range(1200)})
+        found = self.cache.get_many([f'key{i}' for i in range(0, 1300, 2)])
+        self.assertEqual(found, {f'key{i}': i for i in range(0, 1200, 2)})
+        self.cache.delete_many(['key0', 'key2'])
+        self.assertNotIn('key0', self.cache.get_many(['key0', 'key4']))
+
+    def test_concurrent_incr(self):
+        self.cache.set('counter', 0)
+
+        def work():
+            cache = self.make_cache()
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(self.cache.decr('counter', 10), 190)
+        with self.assertRaises(ValueError):
+            self.cache.incr('absent')
+
+    def test_cull_evicts_oldest(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        cache.set('expired', 1, timeout=-1)
+        for i in range(20):
+            cache.set(f'key{i}', i)
+        self.assertEqual(cache.cull(), 16)
+        self.assertEqual(sorted(cache.get_many([f'key{i}' for i in range(20)]).values()), list(range(15, 20)))
+
+    def test_cull_bounds_bytes(self):
+        cache = self.make_cache(MAX_BYTES=10000, CULL_FREQUENCY=2)
+        for i in range(10):
+            cache.set(f'key{i}', b'x' * 1000)
+        cache.cull()
+        self.assertLessEqual(cache.stats()['bytes'], 5000)
+        self.assertIsNotNone(cache.get('key9'))
+        self.assertIsNone(cache.get('key0'))
+
+    def test_stats_add_up_across_instances(self):
+        other = self.make_cache()
+        self.cache.set('key', 1)
+        self.cache.get('key')
+        other.get('key')
+        other.get('absent')
+        other.cull()
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+
+class LocalCacheTest(TestCase):
+    """Local entries skip the shared cache and still follow invalidations."""
+
+    def setUp(self):
+        cache.clear()
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return ['value', self.loads]
+
+    def test_hits_stay_in_process(self):
+        worker = LocalCache(check_interval=60)
+        self.assertEqual(worker.get_or_set('things', 'things:all', self.load), ['value', 1])
+        with mock.patch.object(cache, 'get', side_effect=AssertionError('shared cache read')):
+            self.assertEqual(worker.get_or_set('things', 'things:all', self.load), ['value', 1])
+
+        # A second worker finds the value in the shared cache
+        other = LocalCache(check_interval=60)
+        self.assertEqual(other.get_or_set('things', 'things:all', self.load), ['value', 1])
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(worker.stats()['things']['hits'], 1)
+        self.assertEqual(other.stats()['things']['shared_hits'], 1)
+
+    def test_invalidation_reaches_other_workers(self):
+        worker, other = LocalCache(check_interval=60), LocalCache(check_interval=60)
+        worker.get_or_set('things', 'things:all', self.load)
+        other.get_or_set('things', 'things:all', self.load)
+
+        worker.invalidate('things', 'things:all')
+        self.assertEqual(worker.get_or_set('things', 'things:all', self.load), ['value', 2])
+        # Until its next version check the other worker may serve its copy
+        self.assertEqual(other.get_or_set('things', 'things:all', self.load), ['value', 1])
+        other._checked -= 60
+        self.assertEqual(other.get_or_set('things', 'things:all', self.load), ['value', 2])
+
+    def test_evicts_least_recently_used_by_size(self):
+        worker = LocalCache(max_bytes=3000, check_interval=60)
+        for key in ('a', 'b', 'c'):
+            worker.get_or_set('blobs', key, lambda: b'x' * 900)
+        worker.get_or_set('blobs', 'a', self.load)
+        worker.get_or_set('blobs', 'd', lambda: b'x' * 900)
+        self.assertEqual(list(worker._entries), ['c', 'a', 'd'])
+        stats = worker.stats()['blobs']
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (3, 1, 4))
+        self.assertLessEqual(stats['bytes'], 3000)
+        self.assertAlmostEqual(stats['hit_ratio'], 0.2)
+
+    def test_categories(self):
+        Category.objects.create(name='Cameras')
+        self.assertEqual([c.name for c in get_categories()], ['Cameras'])
+        with self.assertNumQueries(0):
+            get_categories()
+        Category.objects.create(name='Radios')
+        self.assertEqual([c.name for c in get_categories()], ['Cameras', 'Radios'])
+
+
+@override_settings(CACHE_LOCK_TIMEOUT=2, CACHE_STALE_TIMEOUT=60)
+class GetOrComputeTest(SimpleTestCase):
+    """One process recomputes an expired value while the others serve or await it."""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'value {self.calls}'
+
+    def test_computes_once(self):
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'value 1')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'value 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_served_while_locked(self):
+        cache.set('key', ('stale', time.time() - 1, 0.1), 60)
+        cache.add('key:lock', True)
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'stale')
+        cache.delete('key:lock')
+        self.assertEqual(get_or_compute('key', self.compute, 60), 'value 1')
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_early_expiry_grows_with_cost(self):
+        cache.set('key', ('cached', time.time() + 1, 10.0), 60)
+        with mock.patch('core.cache.random.random', return_value=0.0):
+            self.assertEqual(get_or_compute('key', self.compute, 60), 'cached')
+        with mock.patch('core.cache.random.random', return_value=0.99):
+            self.assertEqual(get_or_compute('key', self.compute, 60), 'value 1')
+
+    def test_single_flight(self):
+        results = []
+
+        def slow():
+            time.sleep(0.2)
+            return self.compute()
+
+        threads = [threading.Thread(target=lambda: results.append(get_or_compute('key', slow, 60)))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['value 1'] * 6)
+        self.assertEqual(self.calls, 1)
+
+    def test_waiters_take_over_from_a_failed_holder(self):
+        started = threading.Event()
+        results = []
+
+        def failing():
+            started.set()
+            time.sleep(0.2)
+            raise RuntimeError('backend down')
+
+        def wait():
+            started.wait()
+            results.append(get_or_compute('key', self.compute, 60))
+
+        waiters = [threading.Thread(target=wait) for _ in range(3)]
+        for thread in waiters:
+            thread.start()
+        begin = time.monotonic()
+        with self.assertRaises(RuntimeError):
+            get_or_compute('key', failing, 60)
+        for thread in waiters:
+            thread.join()
+        self.assertLess(time.monotonic() - begin, 1)
+        self.assertEqual(results, ['value 1'] * 3)
+        self.assertEqual(self.calls, 1)
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'monolith.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from user_messages.stream import EventStreamRouter  # noqa: E402  (needs the apps loaded)
+
+# The live event stream is served outside Django's request cycle
+application = EventStreamRouter(django_application)
@@ -52,6 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so the session and auth queries are counted too
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,6 +77,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'user_messages.context_processors.unread',
             ],
         },
     },
@@ -89,9 +93,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Seconds a worker keeps its connection (and the pragmas below) open
+        # between requests; 0 closes it after every request
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
     }
 }
 
+# Run on every new SQLite connection, see core/sqlite.py
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),  # milliseconds
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),  # bytes
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', '-64000')),  # negative: KiB, so 64MB
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'MEMORY'),
+}
+
+# Read replicas (core/replicas.py): SQLITE_REPLICAS is a comma-separated list
+# of database files kept in sync by `manage.py sync_replicas`. GETs of
+# @replica_reads views read from one of them; a browser that wrote reads from
+# the primary for REPLICA_PIN_SECONDS afterwards.
+DATABASE_REPLICAS = []
+for number, path in enumerate(filter(None, os.getenv('SQLITE_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '15'))
+REPLICA_SYNC_INTERVAL = float(os.getenv('REPLICA_SYNC_INTERVAL', '5'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -141,10 +175,35 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Uploads and renditions are stored once per unique content, see core/storage.py
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Image renditions are generated by `manage.py process_renditions`, which
+# polls for pending uploads this often (seconds) when the queue is empty
+RENDITION_POLL_INTERVAL = 2
+# srcset widths rendered below the display size, in JPEG, WebP and AVIF when
+# Pillow can encode them
+IMAGE_VARIANT_WIDTHS = (400, 800)
 
 # Pagination
 ARTIFACTS_PER_PAGE = 10
 INFINITE_SCROLL_BATCH_SIZE = 12
+DEFAULT_PAGE_SIZE = 20
+
+# Personal feed: authors with more followers than this are merged in at read
+# time instead of being fanned out; following someone backfills this many
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_SIZE = 50
+
+# Full-text search: best matches considered when sorting by relevance
+ARTIFACT_SEARCH_MAX_RESULTS = 500
+
+# SQL instrumentation (core/middleware.py): a query shape run more often than
+# this in one request is logged with its call sites, and raises when
+# QUERY_STRICT is on (as in monolith/test_settings.py). Counts go out as X-Query-Count/X-Query-Time headers in DEBUG.
+QUERY_REPEAT_THRESHOLD = 5
+QUERY_STRICT = False
+QUERY_COUNT_HEADER = DEBUG
 
 # Custom color palette for CKEditor 5
 customColorPalette = [
@@ -166,7 +225,7 @@ CKEDITOR_5_CONFIGS = {
     },
 }
 
-CKEDITOR_5_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
+CKEDITOR_5_FILE_STORAGE = "core.storage.ContentAddressedStorage"
 CKEDITOR_5_UPLOAD_PATH = "uploads/"
 
 # Logging configuration
@@ -186,17 +245,63 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'core.queries': {
+            'handlers': ['file'],
+            'level': 'DEBUG' if DEBUG else 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
 # Cache settings
+# Shared by all workers on the host, see core/sqlite_cache.py
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', str(BASE_DIR / 'cache.sqlite3'))
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '100000')),
+            'MAX_BYTES': int(os.getenv('CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+            'CULL_INTERVAL': int(os.getenv('CACHE_CULL_INTERVAL', '60')),  # seconds
+        },
     }
 }
 
+# get_or_compute (core/cache.py): expired values are served for up to
+# CACHE_STALE_TIMEOUT seconds while one request recomputes them; requests for
+# a missing value wait up to CACHE_LOCK_TIMEOUT seconds for the one computing it
+CACHE_STALE_TIMEOUT = 60
+CACHE_LOCK_TIMEOUT = 10
+
+# Async views (core/async_views.py) run independent queries in parallel
+# worker threads
+ASYNC_PARALLEL_QUERIES = True
+
+# Live notifications (user_messages/events.py). LocalBackend only reaches
+# streams in the same process; with several ASGI workers use
+# 'user_messages.events.DatabaseBackend', which also polls for new rows.
+EVENT_BACKEND = os.getenv('EVENT_BACKEND', 'user_messages.events.LocalBackend')
+EVENT_POLL_INTERVAL = 1  # seconds
+EVENT_STREAM_PATH = '/messages/events/'
+EVENT_STREAM_KEEPALIVE = 15  # seconds between comments on an idle stream
+EVENT_STREAM_RETRY_MS = 3000
+
+# Process-local LRU in front of the shared cache (core/local_cache.py). Workers
+# notice entries invalidated elsewhere within LOCAL_CACHE_CHECK_INTERVAL
+# seconds.
+LOCAL_CACHE_MAX_BYTES = int(os.getenv('LOCAL_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+LOCAL_CACHE_CHECK_INTERVAL = float(os.getenv('LOCAL_CACHE_CHECK_INTERVAL', '1'))
+
+# Cached artifact_list pages; signals bump the version on every change
+ARTIFACT_LIST_CACHE_TIMEOUT = 60 * 15
+
+# Buffered likes are written to popularity_score at most this often (seconds)
+LIKE_BUFFER_FLUSH_INTERVAL = 5
+
+# Each worker writes its buffered artifact views at most this often (seconds)
+VIEW_BUFFER_FLUSH_INTERVAL = 5
+
 # Rate limiting
 RATELIMIT_ENABLE = True
 RATELIMIT_USE_CACHE = 'default'
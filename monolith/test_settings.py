@@ -0,0 +1,32 @@
+"""
+Settings for test runs, used by both runners: `manage.py test` picks them
+unless DJANGO_SETTINGS_MODULE says otherwise, and pytest reads them from
+pytest.ini.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, LOGGING
+
+# Repeated query shapes fail the test instead of only being logged
+QUERY_STRICT = True
+
+# A fresh cache file per run, so tests never see or clear the development cache
+_cache_dir = tempfile.mkdtemp(prefix='monolith-test-cache-')
+atexit.register(shutil.rmtree, _cache_dir, True)
+CACHES['default']['LOCATION'] = os.path.join(_cache_dir, 'cache.sqlite3')
+
+# Async views run their queries on the request's thread, inside the test's
+# transaction, and the local cache checks for invalidations on every lookup
+ASYNC_PARALLEL_QUERIES = False
+LOCAL_CACHE_CHECK_INTERVAL = 0
+
+# Views are written at the end of their own request, so none carry over into
+# the next test's query counts
+VIEW_BUFFER_FLUSH_INTERVAL = 0
+
+# Keep test-run output (expected 403s, strict query warnings) out of debug.log
+LOGGING['handlers']['file'] = {'class': 'logging.NullHandler'}
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trading', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['from_user', '-created_at', '-id'], name='transaction_from_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='credittransaction',
+            index=models.Index(fields=['to_user', '-created_at', '-id'], name='transaction_to_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='listing_status_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeoffer',
+            index=models.Index(fields=['buyer', 'status', '-created_at'], name='offer_buyer_status'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeoffer',
+            index=models.Index(fields=['buyer', '-created_at', '-id'], name='offer_buyer_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='tradeoffer',
+            index=models.Index(fields=['listing', 'status', '-created_at'], name='offer_listing_status'),
+        ),
+    ]
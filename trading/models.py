@@ -46,6 +46,11 @@ class CreditTransaction(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        # History lists either party's transactions: one index per side of the OR
+        indexes = [
+            models.Index(fields=['from_user', '-created_at', '-id'], name='transaction_from_recent'),
+            models.Index(fields=['to_user', '-created_at', '-id'], name='transaction_to_recent'),
+        ]
 
 class Listing(models.Model):
     """An artifact listed for trade or sale"""
@@ -77,6 +82,9 @@ class Listing(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at', '-id'], name='listing_status_recent'),
+        ]
 
 class TradeOffer(models.Model):
     """An offer to trade or buy an artifact"""
@@ -103,6 +111,11 @@ class TradeOffer(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['buyer', 'status', '-created_at'], name='offer_buyer_status'),
+            models.Index(fields=['buyer', '-created_at', '-id'], name='offer_buyer_recent'),
+            models.Index(fields=['listing', 'status', '-created_at'], name='offer_listing_status'),
+        ]
 
 class ShippingInfo(models.Model):
     """Shipping information for completed trades"""
@@ -2,6 +2,8 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
+from core.pagination import paginate, paginate_merged
+from core.replicas import replica_reads
 from .models import (
     BarterCredit, CreditTransaction, Listing, 
     TradeOffer, ShippingInfo, TradeCompletion
@@ -9,15 +11,18 @@ from .models import (
 from artifacts.models import Artifact
 
 @login_required
+@replica_reads
 def marketplace(request):
     """View the marketplace with all active listings"""
     listings = Listing.objects.filter(status='active').select_related('seller', 'artifact')
+    listings = paginate(request, listings, ('-created_at',))
     return render(request, 'trading/marketplace.html', {'listings': listings})
 
 @login_required
 def listing_list(request):
     """View all listings by the current user"""
     listings = Listing.objects.filter(seller=request.user)
+    listings = paginate(request, listings, ('-created_at',))
     return render(request, 'trading/listing_list.html', {'listings': listings})
 
 @login_required
@@ -56,8 +61,11 @@ def make_offer(request, listing_id):
 @login_required
 def offer_list(request):
     """View all offers (both sent and received)"""
-    sent_offers = TradeOffer.objects.filter(buyer=request.user)
-    received_offers = TradeOffer.objects.filter(listing__seller=request.user)
+    offers = TradeOffer.objects.select_related('buyer', 'listing__artifact', 'listing__seller')
+    sent_offers = offers.filter(buyer=request.user)
+    received_offers = offers.filter(listing__seller=request.user)
+    sent_offers = paginate(request, sent_offers, ('-created_at',), cursor_param='sent_cursor')
+    received_offers = paginate(request, received_offers, ('-created_at',), cursor_param='received_cursor')
     return render(request, 'trading/offer_list.html', {
         'sent_offers': sent_offers,
         'received_offers': received_offers
@@ -67,12 +75,14 @@ def offer_list(request):
 def received_offers(request):
     """View offers received on your listings"""
     offers = TradeOffer.objects.filter(listing__seller=request.user)
+    offers = paginate(request, offers, ('-created_at',))
     return render(request, 'trading/received_offers.html', {'offers': offers})
 
 @login_required
 def sent_offers(request):
     """View offers you've sent"""
     offers = TradeOffer.objects.filter(buyer=request.user)
+    offers = paginate(request, offers, ('-created_at',))
     return render(request, 'trading/sent_offers.html', {'offers': offers})
 
 @login_required
@@ -223,9 +233,11 @@ def barter_credits(request):
 @login_required
 def transaction_history(request):
     """View transaction history"""
-    transactions = CreditTransaction.objects.filter(
-        Q(from_user=request.user) | Q(to_user=request.user)
-    )
+    # Sent and received are read from their own indexes and merged
+    transactions = paginate_merged(request, [
+        CreditTransaction.objects.filter(from_user=request.user),
+        CreditTransaction.objects.filter(to_user=request.user),
+    ], ('-created_at',))
     return render(request, 'trading/transaction_history.html', {'transactions': transactions})
 
 @login_required
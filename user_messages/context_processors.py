@@ -0,0 +1,16 @@
+from django.utils.functional import SimpleLazyObject
+
+from .counters import unread_counts
+
+
+def unread(request):
+    """
+    The signed-in user's unread notification and message totals as `unread`,
+    read from the counters (one cached row) only when a template uses them.
+    """
+    def counts():
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return {'notifications': 0, 'messages': 0}
+        return unread_counts(user.pk)
+    return {'unread': SimpleLazyObject(counts)}
@@ -0,0 +1,152 @@
+"""
+Denormalized unread counters for notifications and messages.
+
+Each user has an UnreadCounter row with their unread notification and message
+totals, and a ConversationUnreadCounter row per conversation with unread
+messages, so badges read one row however large the inbox grows. Counters are
+changed with single UPDATE ... SET col = col + n statements (rows are created
+on first use) and the cached totals are dropped once the change commits.
+recount_unread() repairs any drift from the source tables.
+"""
+from collections import defaultdict
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import ConversationUnreadCounter, Message, Notification, UnreadCounter
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def _cache_key(user_id):
+    return f'unread:{user_id}'
+
+
+def _adjust(model, lookup, **deltas):
+    queryset = model.objects.filter(**lookup)
+    for name, delta in deltas.items():
+        if delta < 0:
+            # Never push a drifted counter below zero; recount_unread() fixes it
+            queryset = queryset.filter(**{f'{name}__gte': -delta})
+    if queryset.update(**{name: F(name) + delta for name, delta in deltas.items()}):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently
+        model.objects.filter(**lookup).update(**{name: F(name) + delta for name, delta in deltas.items()})
+
+
+def _invalidate(user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    transaction.on_commit(partial(cache.delete_many, keys))
+
+
+def notifications_changed(user_id, delta):
+    """Add delta to a user's unread notifications"""
+    _adjust(UnreadCounter, {'user_id': user_id}, notifications=delta)
+    _invalidate([user_id])
+
+
+def message_recipients(message):
+    """Ids of the participants a message counts as unread for: everyone but its sender"""
+    return list(message.conversation.participants.exclude(pk=message.sender_id).values_list('pk', flat=True))
+
+
+def messages_changed(conversation_id, user_ids, delta):
+    """Add delta to the unread messages of each user in a conversation"""
+    for user_id in user_ids:
+        _adjust(ConversationUnreadCounter, {'conversation_id': conversation_id, 'user_id': user_id},
+                messages=delta)
+        _adjust(UnreadCounter, {'user_id': user_id}, messages=delta)
+    _invalidate(user_ids)
+
+
+def unread_counts(user_id):
+    """{'notifications': n, 'messages': n} for a user, from the cache when possible"""
+    key = _cache_key(user_id)
+    counts = cache.get(key)
+    if counts is None:
+        row = UnreadCounter.objects.filter(user_id=user_id).values('notifications', 'messages').first()
+        counts = row or {'notifications': 0, 'messages': 0}
+        cache.set(key, counts, CACHE_TIMEOUT)
+    return counts
+
+
+def _actual_counts(user_ids):
+    notifications = dict(
+        Notification.objects.filter(user_id__in=user_ids, is_read=False).order_by()
+        .values('user_id').annotate(total=Count('pk')).values_list('user_id', 'total')
+    )
+    conversations = defaultdict(dict)
+    rows = (Message.objects.filter(conversation__participants__in=user_ids, is_read=False).order_by()
+            .values('conversation_id', 'conversation__participants', 'sender_id').annotate(total=Count('pk'))
+            .values_list('conversation_id', 'conversation__participants', 'sender_id', 'total'))
+    for conversation_id, user_id, sender_id, total in rows:
+        if user_id != sender_id:
+            conversations[user_id][conversation_id] = conversations[user_id].get(conversation_id, 0) + total
+    return notifications, conversations
+
+
+def recount_unread(batch_size=1000):
+    """
+    Recompute unread counters from the source tables in batches of users.
+
+    Yields (batch_end_pk, fixed) per batch so callers can report progress.
+    """
+    users = get_user_model().objects.order_by('pk')
+    last_pk = 0
+    while True:
+        user_ids = list(users.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            return
+        notifications, conversations = _actual_counts(user_ids)
+        fixed = set()
+        with transaction.atomic():
+            totals = {counter.user_id: counter for counter in UnreadCounter.objects.filter(user_id__in=user_ids)}
+            stored = defaultdict(dict)
+            for counter in ConversationUnreadCounter.objects.filter(user_id__in=user_ids):
+                stored[counter.user_id][counter.conversation_id] = counter
+
+            drifted, missing = [], []
+            for user_id in user_ids:
+                actual = conversations.get(user_id, {})
+                for conversation_id in set(actual) | set(stored[user_id]):
+                    count = actual.get(conversation_id, 0)
+                    counter = stored[user_id].get(conversation_id)
+                    if counter is None:
+                        missing.append(ConversationUnreadCounter(
+                            conversation_id=conversation_id, user_id=user_id, messages=count))
+                    elif counter.messages != count:
+                        counter.messages = count
+                        drifted.append(counter)
+                    else:
+                        continue
+                    fixed.add(user_id)
+            ConversationUnreadCounter.objects.bulk_update(drifted, ['messages'])
+            ConversationUnreadCounter.objects.bulk_create(missing)
+
+            drifted, missing = [], []
+            for user_id in user_ids:
+                counts = {'notifications': notifications.get(user_id, 0),
+                          'messages': sum(conversations.get(user_id, {}).values())}
+                counter = totals.get(user_id)
+                if counter is None:
+                    if any(counts.values()):
+                        missing.append(UnreadCounter(user_id=user_id, **counts))
+                        fixed.add(user_id)
+                elif (counter.notifications, counter.messages) != (counts['notifications'], counts['messages']):
+                    counter.notifications, counter.messages = counts['notifications'], counts['messages']
+                    drifted.append(counter)
+                    fixed.add(user_id)
+            UnreadCounter.objects.bulk_update(drifted, ['notifications', 'messages'])
+            UnreadCounter.objects.bulk_create(missing)
+            _invalidate(fixed)
+        last_pk = user_ids[-1]
+        yield last_pk, len(fixed)
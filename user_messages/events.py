@@ -0,0 +1,273 @@
+"""
+Live notification and message events.
+
+Creating a Notification or a Message publishes an Event to its recipients
+(see signals.py). Open event streams (stream.py) subscribe to the Hub of
+their process, which hands events to them through bounded asyncio queues.
+
+Event ids are cursors: "<notification id>:<message id>", the newest
+notification and message the client has seen. A reconnecting client sends
+the last one back as Last-Event-ID and replay() reads everything newer from
+the database, so nothing is lost between connections or when a slow
+client's queue overflows.
+
+Delivery across processes is up to the backend named by EVENT_BACKEND:
+
+    LocalBackend      publishes to this process's hub only; enough for a
+                      single ASGI worker
+    DatabaseBackend   also polls for rows created by other processes every
+                      EVENT_POLL_INTERVAL seconds, while anyone is subscribed
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from .models import Conversation, Message, Notification
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+
+
+class Event:
+    __slots__ = ('kind', 'pk', 'data')
+
+    def __init__(self, kind, pk, data):
+        self.kind = kind
+        self.pk = pk
+        self.data = data
+
+    def advance(self, cursor):
+        """The cursor after this event, or None when the cursor has already passed it"""
+        notification_id, message_id = cursor
+        if self.kind == 'notification' and self.pk > notification_id:
+            return self.pk, message_id
+        if self.kind == 'message' and self.pk > message_id:
+            return notification_id, self.pk
+        return None
+
+
+def notification_event(notification):
+    return Event('notification', notification.pk, {
+        'id': notification.pk,
+        'type': notification.notification_type,
+        'content': notification.content,
+        'url': notification.related_url,
+        'created_at': notification.created_at.isoformat(),
+    })
+
+
+def message_event(message):
+    return Event('message', message.pk, {
+        'id': message.pk,
+        'conversation': message.conversation_id,
+        'sender': message.sender.username,
+        'content': message.content,
+        'created_at': message.created_at.isoformat(),
+    })
+
+
+def encode_cursor(cursor):
+    return '%d:%d' % cursor
+
+
+def decode_cursor(value):
+    """(notification id, message id) from an event id; ValueError when malformed"""
+    notification_id, message_id = value.split(':')
+    return int(notification_id), int(message_id)
+
+
+def user_messages(user_id):
+    """Messages other participants sent to the user"""
+    return (Message.objects.filter(conversation__participants=user_id)
+            .exclude(sender_id=user_id).select_related('sender'))
+
+
+def current_cursor(user_id):
+    """The cursor of the newest events for a user, to start a fresh stream from"""
+    return (
+        Notification.objects.filter(user_id=user_id).aggregate(last=Max('pk'))['last'] or 0,
+        user_messages(user_id).aggregate(last=Max('pk'))['last'] or 0,
+    )
+
+
+def replay(user_id, cursor, limit=100):
+    """Events newer than cursor, oldest first, at most limit of each kind"""
+    notification_id, message_id = cursor
+    notifications = Notification.objects.filter(user_id=user_id, pk__gt=notification_id).order_by('pk')[:limit]
+    messages = user_messages(user_id).filter(pk__gt=message_id).order_by('pk')[:limit]
+    events = [notification_event(n) for n in notifications] + [message_event(m) for m in messages]
+    return sorted(events, key=lambda event: event.data['created_at'])
+
+
+class Subscription:
+    """One stream's queue; closed when it overflows, so the client replays"""
+
+    def __init__(self, hub, user_id):
+        self.hub = hub
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def deliver(self, event):
+        # Runs on the subscription's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout, cancel=None):
+        """The next event, or None after timeout seconds or once cancel is done"""
+        getter = asyncio.ensure_future(self.queue.get())
+        waiting = {getter} if cancel is None else {getter, cancel}
+        await asyncio.wait(waiting, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            return getter.result()
+        getter.cancel()
+        return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    """In-process pub/sub from any thread to subscriptions on event loops"""
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Subscribe from inside the stream's event loop"""
+        subscription = Subscription(self, user_id)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def user_ids(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The loop has shut down
+                self.unsubscribe(subscription)
+
+
+class LocalBackend:
+    def __init__(self, hub):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def publish(self, user_id, event):
+        self.hub.publish(user_id, event)
+
+
+class DatabaseBackend(LocalBackend):
+    """Also delivers rows created by other processes, found by polling"""
+
+    def __init__(self, hub, interval=None):
+        super().__init__(hub)
+        self.interval = interval if interval is not None else settings.EVENT_POLL_INTERVAL
+        self.cursor = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._poll_forever, name='event-poll', daemon=True)
+                self._thread.start()
+
+    def _poll_forever(self):
+        while True:
+            close_old_connections()
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception('Polling for events failed')
+            time.sleep(self.interval)
+
+    def poll(self):
+        """Publish rows created since the last poll to this process's subscribers"""
+        if self.cursor is None:
+            # Streams replay older rows themselves
+            self.cursor = (Notification.objects.aggregate(last=Max('pk'))['last'] or 0,
+                           Message.objects.aggregate(last=Max('pk'))['last'] or 0)
+            return
+        user_ids = set(self.hub.user_ids())
+        notification_id, message_id = self.cursor
+        notifications = list(Notification.objects.filter(pk__gt=notification_id).order_by('pk'))
+        messages = list(Message.objects.filter(pk__gt=message_id).select_related('sender').order_by('pk'))
+        if notifications:
+            notification_id = notifications[-1].pk
+        if messages:
+            message_id = messages[-1].pk
+        self.cursor = notification_id, message_id
+        if not user_ids:
+            return
+
+        for notification in notifications:
+            if notification.user_id in user_ids:
+                self.hub.publish(notification.user_id, notification_event(notification))
+        # Streams drop events they have already sent, so doubles from publish() are harmless
+        participants = Conversation.objects.filter(
+            pk__in={message.conversation_id for message in messages}, participants__in=user_ids)
+        recipients = {}
+        for conversation_id, user_id in participants.values_list('pk', 'participants'):
+            recipients.setdefault(conversation_id, []).append(user_id)
+        for message in messages:
+            for user_id in recipients.get(message.conversation_id, ()):
+                if user_id != message.sender_id:
+                    self.hub.publish(user_id, message_event(message))
+
+
+hub = Hub()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = import_string(settings.EVENT_BACKEND)(hub)
+        return _backend
+
+
+def publish(user_id, event):
+    get_backend().publish(user_id, event)
+
+
+def subscribe(user_id):
+    backend = get_backend()
+    backend.start()
+    return hub.subscribe(user_id)
+
+
+def format_event(event, cursor):
+    """One SSE message"""
+    return (f'id: {encode_cursor(cursor)}\nevent: {event.kind}\n'
+            f'data: {json.dumps(event.data, separators=(",", ":"))}\n\n')
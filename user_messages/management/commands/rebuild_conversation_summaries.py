@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from user_messages.models import Conversation
+from user_messages.summaries import refresh_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized inbox summaries of every conversation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Conversations refreshed per batch')
+
+    def handle(self, *args, **options):
+        conversation_ids = list(Conversation.objects.order_by('pk').values_list('pk', flat=True))
+        refresh_summaries(conversation_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(conversation_ids)} conversation summaries.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from user_messages.counters import recount_unread
+
+
+class Command(BaseCommand):
+    help = 'Repair drift in the denormalized unread notification and message counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users recounted per batch')
+
+    def handle(self, *args, **options):
+        total = 0
+        for last_pk, fixed in recount_unread(batch_size=options['batch_size']):
+            total += fixed
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Recounted up to user {last_pk} ({fixed} fixed)')
+        self.stdout.write(self.style.SUCCESS(f'Fixed {total} users.'))
@@ -0,0 +1,76 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:51
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def count_unread(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Message = apps.get_model('user_messages', 'Message')
+    Notification = apps.get_model('user_messages', 'Notification')
+    UnreadCounter = apps.get_model('user_messages', 'UnreadCounter')
+    ConversationUnreadCounter = apps.get_model('user_messages', 'ConversationUnreadCounter')
+    users = User.objects.order_by('pk')
+    last_pk = 0
+    while True:
+        user_ids = list(users.filter(pk__gt=last_pk).values_list('pk', flat=True)[:1000])
+        if not user_ids:
+            return
+        notifications = dict(
+            Notification.objects.filter(user_id__in=user_ids, is_read=False).order_by()
+            .values('user_id').annotate(total=Count('pk')).values_list('user_id', 'total')
+        )
+        conversations = {}
+        rows = (Message.objects.filter(conversation__participants__in=user_ids, is_read=False).order_by()
+                .values('conversation_id', 'conversation__participants', 'sender_id').annotate(total=Count('pk'))
+                .values_list('conversation_id', 'conversation__participants', 'sender_id', 'total'))
+        for conversation_id, user_id, sender_id, total in rows:
+            if user_id != sender_id:
+                unread = conversations.setdefault(user_id, {})
+                unread[conversation_id] = unread.get(conversation_id, 0) + total
+        ConversationUnreadCounter.objects.bulk_create([
+            ConversationUnreadCounter(conversation_id=conversation_id, user_id=user_id, messages=count)
+            for user_id, unread in conversations.items() for conversation_id, count in unread.items()
+        ], batch_size=1000)
+        UnreadCounter.objects.bulk_create([
+            UnreadCounter(user_id=user_id, notifications=notifications.get(user_id, 0),
+                          messages=sum(conversations.get(user_id, {}).values()))
+            for user_id in user_ids if user_id in notifications or user_id in conversations
+        ], batch_size=1000)
+        last_pk = user_ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0003_avatar_renditions'),
+        ('user_messages', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnreadCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='unread_counter', serialize=False, to='users.customuser')),
+                ('notifications', models.PositiveIntegerField(default=0)),
+                ('messages', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConversationUnreadCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('messages', models.PositiveIntegerField(default=0)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unread_counters', to='user_messages.conversation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_unread_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='conversationunreadcounter',
+            constraint=models.UniqueConstraint(fields=('conversation', 'user'), name='unique_unread_counter'),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:54
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.utils.text import Truncator
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def summarize_conversations(apps, schema_editor):
+    Conversation = apps.get_model('user_messages', 'Conversation')
+    Message = apps.get_model('user_messages', 'Message')
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-pk').values('pk')[:1]
+    names = {}
+    for conversation_id, username in Conversation.objects.order_by().values_list('pk', 'participants__username'):
+        if username:
+            names.setdefault(conversation_id, []).append(username)
+    conversations = list(Conversation.objects.annotate(latest_id=Subquery(latest)))
+    messages = Message.objects.in_bulk([c.latest_id for c in conversations if c.latest_id])
+    for conversation in conversations:
+        message = messages.get(conversation.latest_id)
+        conversation.last_message = message
+        conversation.last_message_snippet = Truncator(' '.join(message.content.split())).chars(100) if message else ''
+        conversation.last_activity_at = message.created_at if message else conversation.created_at
+        conversation.participant_names = ','.join(sorted(names.get(conversation.pk, ())))
+    Conversation.objects.bulk_update(conversations, [
+        'last_message', 'last_message_snippet', 'last_activity_at', 'participant_names',
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_messages', '0003_unread_counters'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='conversation',
+            options={'ordering': ['-last_activity_at']},
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_activity_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='user_messages.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_snippet',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='participant_names',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_activity_at', '-id'], name='conversation_recent'),
+        ),
+        migrations.RunPython(summarize_conversations, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,36 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 class Conversation(models.Model):
     """A conversation between two or more users"""
     participants = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='conversations')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+    # Inbox summary, denormalized so the conversation list needs no per-row
+    # queries; kept current by signals.py through summaries.py
+    last_message = models.ForeignKey('Message', null=True, blank=True, related_name='+',
+                                     on_delete=models.SET_NULL, editable=False)
+    last_message_snippet = models.CharField(max_length=100, blank=True, editable=False)
+    last_activity_at = models.DateTimeField(default=timezone.now, editable=False)
+    participant_names = models.TextField(blank=True, editable=False)
+
     def __str__(self):
-        return f"Conversation {self.id} ({', '.join([user.username for user in self.participants.all()])})"
-    
+        return f"Conversation {self.id} ({', '.join(self.participant_usernames())})"
+
+    def participant_usernames(self, exclude=None):
+        """Usernames from the cached summary, without exclude's"""
+        names = [name for name in self.participant_names.split(',') if name]
+        return [name for name in names if exclude is None or name != exclude.username]
+
     def get_latest_message(self):
         return self.messages.order_by('-created_at').first()
-    
+
     class Meta:
-        ordering = ['-updated_at']
+        ordering = ['-last_activity_at']
+        indexes = [
+            models.Index(fields=['-last_activity_at', '-id'], name='conversation_recent'),
+        ]
 
 class Message(models.Model):
     """Individual message within a conversation"""
@@ -29,6 +45,9 @@ class Message(models.Model):
     
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['conversation', 'created_at'], name='message_conversation_sent'),
+        ]
 
 class Notification(models.Model):
     """Notification system for various events"""
@@ -51,3 +70,32 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_recent'),
+            models.Index(fields=['user', 'is_read', '-created_at'], name='notification_user_unread'),
+        ]
+
+class UnreadCounter(models.Model):
+    """A user's unread totals for the navbar badges, kept current by counters.py"""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, primary_key=True, related_name='unread_counter',
+                                on_delete=models.CASCADE)
+    notifications = models.PositiveIntegerField(default=0)
+    messages = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Unread for {self.user_id}: {self.notifications} notifications, {self.messages} messages"
+
+class ConversationUnreadCounter(models.Model):
+    """Unread messages in one conversation for one participant"""
+    conversation = models.ForeignKey(Conversation, related_name='unread_counters', on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='conversation_unread_counters',
+                             on_delete=models.CASCADE)
+    messages = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Unread in conversation {self.conversation_id} for {self.user_id}: {self.messages}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='unique_unread_counter'),
+        ]
@@ -0,0 +1,64 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import counters, events, summaries
+from .models import Conversation, Message, Notification
+
+
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        if not instance.is_read:
+            counters.notifications_changed(instance.user_id, 1)
+        transaction.on_commit(partial(events.publish, instance.user_id, events.notification_event(instance)))
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        counters.notifications_changed(instance.user_id, -1)
+
+
+@receiver(post_save, sender=Message)
+def message_created(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    summaries.message_sent(instance)
+    event = events.message_event(instance)
+    recipients = counters.message_recipients(instance)
+    if not instance.is_read:
+        counters.messages_changed(instance.conversation_id, recipients, 1)
+    for user_id in recipients:
+        transaction.on_commit(partial(events.publish, user_id, event))
+
+
+@receiver(pre_delete, sender=Message)
+def message_deleted(sender, instance, **kwargs):
+    # Before the delete: deleting a conversation also removes its participants
+    if not instance.is_read:
+        counters.messages_changed(instance.conversation_id, counters.message_recipients(instance), -1)
+
+
+@receiver(post_delete, sender=Message)
+def message_removed(sender, instance, **kwargs):
+    # Deleting the last message has already cleared the conversation's pointer
+    if Conversation.objects.filter(pk=instance.conversation_id, last_message__isnull=True).exists():
+        summaries.refresh_summaries([instance.conversation_id])
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # user.conversations.clear() does not report which conversations it touched
+        instance._summary_conversation_ids = list(instance.conversations.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        summaries.refresh_summaries([instance.pk])
+    elif action == 'post_clear':
+        summaries.refresh_summaries(getattr(instance, '_summary_conversation_ids', ()))
+    else:
+        summaries.refresh_summaries(pk_set)
@@ -0,0 +1,114 @@
+"""
+The Server-Sent Events endpoint, as a plain ASGI application.
+
+Django 3.2 cannot stream from an async view, so monolith/asgi.py sends
+requests for EVENT_STREAM_PATH here instead. One connection per user waits
+on its hub subscription without holding a thread or a database connection;
+queries happen only to authenticate, to find where to start and to replay.
+
+A client that reconnects sends the id of the last event it saw in the
+Last-Event-ID header and gets everything it missed from the database first.
+Under WSGI the same URL is served by views.event_stream, which replays and
+closes, so EventSource falls back to reconnecting every few seconds.
+"""
+import asyncio
+import io
+from importlib import import_module
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+
+from . import events
+
+
+def _authenticate(scope):
+    request = ASGIRequest(scope, io.BytesIO())
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    return request, get_user(request)
+
+
+def start_cursor(request, user_id):
+    """Where a stream starts: after the client's Last-Event-ID, else after the newest rows"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    if last_event_id:
+        try:
+            return events.decode_cursor(last_event_id)
+        except ValueError:
+            pass
+    return events.current_cursor(user_id)
+
+
+async def _send_text(send, text, more_body=True):
+    await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': more_body})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _send_events(send, events_, cursor):
+    """Send the events the cursor has not passed yet; returns the new cursor"""
+    for event in events_:
+        # Events may arrive twice, from replay and the hub or from two backends
+        advanced = event.advance(cursor)
+        if advanced is not None:
+            cursor = advanced
+            await _send_text(send, events.format_event(event, cursor))
+    return cursor
+
+
+async def event_stream(scope, receive, send):
+    request, user = await sync_to_async(_authenticate)(scope)
+    if not user.is_authenticated:
+        await send({'type': 'http.response.start', 'status': 403, 'headers': [(b'content-type', b'text/plain')]})
+        await _send_text(send, 'Forbidden', more_body=False)
+        return
+
+    # Subscribe before replaying, so nothing created in between is missed
+    subscription = events.subscribe(user.pk)
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        cursor = await sync_to_async(start_cursor)(request, user.pk)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+        await _send_text(send, f'retry: {settings.EVENT_STREAM_RETRY_MS}\n\n')
+
+        # Replay in batches until caught up: a live event sent earlier would
+        # move the cursor past rows not replayed yet
+        while not disconnected.done():
+            backlog = await sync_to_async(events.replay)(user.pk, cursor)
+            if not backlog:
+                break
+            cursor = await _send_events(send, backlog, cursor)
+
+        while not disconnected.done() and not subscription.overflowed:
+            event = await subscription.get(settings.EVENT_STREAM_KEEPALIVE, disconnected)
+            if event is not None:
+                cursor = await _send_events(send, [event], cursor)
+            elif not disconnected.done():
+                await _send_text(send, ': keepalive\n\n')
+        if not disconnected.done():
+            # Overflowed: end the response; the client reconnects and replays
+            await _send_text(send, '', more_body=False)
+    finally:
+        subscription.close()
+        disconnected.cancel()
+
+
+class EventStreamRouter:
+    """Serve EVENT_STREAM_PATH from event_stream and everything else from Django"""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == settings.EVENT_STREAM_PATH:
+            return await event_stream(scope, receive, send)
+        return await self.application(scope, receive, send)
@@ -0,0 +1,55 @@
+"""
+Denormalized conversation summaries for the inbox.
+
+Each Conversation keeps a pointer to its last message, a snippet of it, the
+time of its last activity and the usernames of its participants, so the
+conversation list is one query ordered by the conversation_recent index.
+Sending a message moves the summary forward with a single UPDATE; deleting the
+last message or changing the participants recomputes it.
+"""
+from django.db.models import OuterRef, Subquery
+from django.utils.text import Truncator
+
+from .models import Conversation, Message
+
+SNIPPET_LENGTH = Conversation._meta.get_field('last_message_snippet').max_length
+
+
+def snippet(content):
+    return Truncator(' '.join(content.split())).chars(SNIPPET_LENGTH)
+
+
+def message_sent(message):
+    """Make message the conversation's last one, unless a newer one got there first"""
+    Conversation.objects.filter(pk=message.conversation_id, last_activity_at__lte=message.created_at).update(
+        last_message=message,
+        last_message_snippet=snippet(message.content),
+        last_activity_at=message.created_at,
+    )
+
+
+def refresh_summaries(conversation_ids, batch_size=1000):
+    """Recompute the summaries of the given conversations from their messages and participants"""
+    conversation_ids = list(conversation_ids)
+    latest = Message.objects.filter(conversation=OuterRef('pk')).order_by('-created_at', '-pk').values('pk')[:1]
+    for start in range(0, len(conversation_ids), batch_size):
+        batch = conversation_ids[start:start + batch_size]
+        conversations = list(Conversation.objects.filter(pk__in=batch).annotate(latest_id=Subquery(latest))
+                             .only('pk', 'created_at'))
+        messages = Message.objects.only('content', 'created_at').in_bulk(
+            [conversation.latest_id for conversation in conversations if conversation.latest_id])
+        names = {}
+        for conversation_id, username in (Conversation.objects.filter(pk__in=batch).order_by()
+                                          .values_list('pk', 'participants__username')):
+            if username:
+                names.setdefault(conversation_id, []).append(username)
+
+        for conversation in conversations:
+            message = messages.get(conversation.latest_id)
+            conversation.last_message = message
+            conversation.last_message_snippet = snippet(message.content) if message else ''
+            conversation.last_activity_at = message.created_at if message else conversation.created_at
+            conversation.participant_names = ','.join(sorted(names.get(conversation.pk, ())))
+        Conversation.objects.bulk_update(conversations, [
+            'last_message', 'last_message_snippet', 'last_activity_at', 'participant_names',
+        ])
@@ -1,3 +1,335 @@
-from django.test import TestCase
+import asyncio
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import events
+from .counters import unread_counts
+from .models import Conversation, ConversationUnreadCounter, Message, Notification, UnreadCounter
+from .stream import event_stream
+
+User = get_user_model()
+
+
+class EventTest(TestCase):
+    """Notifications and messages become events for their recipients."""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpassword')
+        self.bob = User.objects.create_user(username='bob', password='testpassword')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+
+    def notify(self, user, content='Hello'):
+        return Notification.objects.create(user=user, notification_type='message', content=content)
+
+    def test_published_on_commit(self):
+        with mock.patch.object(events, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                notification = self.notify(self.alice)
+                message = Message.objects.create(conversation=self.conversation, sender=self.bob, content='Hi')
+        self.assertEqual([(user_id, event.kind, event.pk) for (user_id, event), _ in publish.call_args_list],
+                         [(self.alice.pk, 'notification', notification.pk), (self.alice.pk, 'message', message.pk)])
+
+    def test_replay_after_cursor(self):
+        first = self.notify(self.alice, 'first')
+        second = self.notify(self.alice, 'second')
+        self.notify(self.bob, 'not for alice')
+        Message.objects.create(conversation=self.conversation, sender=self.alice, content='own message')
+        reply = Message.objects.create(conversation=self.conversation, sender=self.bob, content='reply')
+
+        replayed = events.replay(self.alice.pk, (first.pk, 0))
+        self.assertEqual([(event.kind, event.pk) for event in replayed],
+                         [('notification', second.pk), ('message', reply.pk)])
+        self.assertEqual(events.current_cursor(self.alice.pk), (second.pk, reply.pk))
+        self.assertEqual(events.decode_cursor(events.encode_cursor((3, 4))), (3, 4))
+
+    def test_sync_endpoint_replays_from_last_event_id(self):
+        first = self.notify(self.alice, 'first')
+        self.notify(self.alice, 'second')
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('messages:event_stream'), HTTP_LAST_EVENT_ID=f'{first.pk}:0')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertIn('"content":"second"', body)
+        self.assertNotIn('"content":"first"', body)
+        self.assertTrue(body.startswith(f'retry: {settings.EVENT_STREAM_RETRY_MS}'))
+
+    def test_sync_endpoint_requires_login(self):
+        self.assertEqual(self.client.get(reverse('messages:event_stream')).status_code, 403)
+
+    def test_stream_path_matches_url(self):
+        self.assertEqual(reverse('messages:event_stream'), settings.EVENT_STREAM_PATH)
+
+    def test_database_backend_polls_other_processes_rows(self):
+        hub = mock.Mock(user_ids=lambda: [self.alice.pk])
+        backend = events.DatabaseBackend(hub, interval=0)
+        backend.poll()
+        notification = self.notify(self.alice)
+        self.notify(self.bob)
+        message = Message.objects.create(conversation=self.conversation, sender=self.bob, content='Hi')
+        backend.poll()
+        self.assertEqual([(user_id, event.kind, event.pk) for (user_id, event), _ in hub.publish.call_args_list],
+                         [(self.alice.pk, 'notification', notification.pk), (self.alice.pk, 'message', message.pk)])
+
+
+class UnreadCounterTest(TestCase):
+    """Unread counters follow creation, reads and deletes, and badges read them in O(1)."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpassword')
+        self.bob = User.objects.create_user(username='bob', password='testpassword')
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.alice, self.bob)
+        self.client.force_login(self.alice)
+
+    def notify(self, user=None):
+        return Notification.objects.create(user=user or self.alice, notification_type='message', content='Hello')
+
+    def counts(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pass
+        return unread_counts(self.alice.pk)
+
+    def test_notifications(self):
+        first = self.notify()
+        self.notify()
+        Notification.objects.create(user=self.alice, notification_type='message', content='Seen', is_read=True)
+        self.assertEqual(self.counts()['notifications'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('messages:mark_notification_read', args=[first.pk]))
+            self.client.get(reverse('messages:mark_notification_read', args=[first.pk]))
+        self.assertEqual(self.counts()['notifications'], 1)
+
+        self.notify()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('messages:mark_all_notifications_read'))
+        self.assertEqual(self.counts()['notifications'], 0)
+
+    def test_messages(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.bob, content='Hi')
+        Message.objects.create(conversation=self.conversation, sender=self.bob, content='Still there?')
+        Message.objects.create(conversation=self.conversation, sender=self.alice, content='Own message')
+        self.assertEqual(self.counts()['messages'], 2)
+        self.assertEqual(unread_counts(self.bob.pk)['messages'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('messages:mark_message_read', args=[self.conversation.pk, message.pk]))
+        self.assertEqual(self.counts()['messages'], 1)
+        self.assertEqual(ConversationUnreadCounter.objects.get(conversation=self.conversation, user=self.alice).messages, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.conversation.delete()
+        self.assertEqual(self.counts()['messages'], 0)
+
+    def test_badges_read_one_cached_row(self):
+        for _ in range(5):
+            self.notify()
+        Message.objects.create(conversation=self.conversation, sender=self.bob, content='Hi')
+        self.counts()
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(unread_counts(self.alice.pk), {'notifications': 5, 'messages': 1})
+        with self.assertNumQueries(0):
+            unread_counts(self.alice.pk)
+
+        response = self.client.get(reverse('messages:conversation_list'))
+        self.assertContains(response, '<span class="badge">5</span>', html=True)
+        self.assertContains(response, '<span class="badge">1</span>', count=2, html=True)
+
+    def test_recount_repairs_drift(self):
+        self.notify()
+        Message.objects.create(conversation=self.conversation, sender=self.bob, content='Hi')
+        UnreadCounter.objects.filter(user=self.alice).update(notifications=9, messages=0)
+        ConversationUnreadCounter.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('recount_unread', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.counts(), {'notifications': 1, 'messages': 1})
+        self.assertEqual(ConversationUnreadCounter.objects.get(conversation=self.conversation, user=self.alice).messages, 1)
+
+
+class ConversationSummaryTest(TestCase):
+    """Conversations carry their inbox summary, so the list costs the same queries at any size."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', password='testpassword')
+        self.bob = User.objects.create_user(username='bob', password='testpassword')
+        self.client.force_login(self.alice)
+
+    def converse(self, *messages):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.alice, self.bob)
+        for content in messages:
+            Message.objects.create(conversation=conversation, sender=self.bob, content=content)
+        conversation.refresh_from_db()
+        return conversation
+
+    def test_message_sent_updates_summary(self):
+        conversation = self.converse('First', 'Second   message\n' + 'x' * 200)
+        latest = Message.objects.latest('pk')
+        self.assertEqual(conversation.last_message, latest)
+        self.assertEqual(conversation.last_activity_at, latest.created_at)
+        self.assertTrue(conversation.last_message_snippet.startswith('Second message x'))
+        self.assertEqual(len(conversation.last_message_snippet), 100)
+        self.assertEqual(conversation.participant_names, 'alice,bob')
+        self.assertEqual(str(conversation), f'Conversation {conversation.pk} (alice, bob)')
+
+    def test_deleting_last_message_falls_back(self):
+        conversation = self.converse('First', 'Second')
+        conversation.last_message.delete()
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_message_snippet, 'First')
+        Message.objects.all().delete()
+        conversation.refresh_from_db()
+        self.assertIsNone(conversation.last_message)
+        self.assertEqual(conversation.last_activity_at, conversation.created_at)
+
+    def test_participant_changes_update_names(self):
+        conversation = self.converse()
+        carol = User.objects.create_user(username='carol', password='testpassword')
+        carol.conversations.add(conversation)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.participant_usernames(exclude=self.alice), ['bob', 'carol'])
+        conversation.participants.remove(self.bob)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.participant_names, 'alice,carol')
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('messages:conversation_list'))
+        return response, len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        self.converse('Hello')
+        self.list_queries()
+        _, small = self.list_queries()
+        for i in range(8):
+            self.converse(f'Message {i}')
+        response, large = self.list_queries()
+        self.assertEqual(large, small)
+        self.assertContains(response, 'Message 7')
+        self.assertNotContains(response, 'alice</a>')
+        self.assertEqual([c.last_message_snippet for c in response.context['conversations']][:2],
+                         ['Message 7', 'Message 6'])
+
+
+class HubTest(TestCase):
+    """The hub hands events to subscriptions on their event loop."""
+
+    async def test_publish_from_another_thread(self):
+        hub = events.Hub()
+        subscription = hub.subscribe(1)
+        event = events.Event('notification', 1, {})
+        await sync_to_async(hub.publish, thread_sensitive=False)(1, event)
+        self.assertIs(await subscription.get(1), event)
+        subscription.close()
+        self.assertEqual(hub.user_ids(), [])
+
+    async def test_overflow(self):
+        hub = events.Hub()
+        subscription = hub.subscribe(1)
+        for pk in range(events.QUEUE_SIZE + 1):
+            subscription.deliver(events.Event('notification', pk, {}))
+        self.assertTrue(subscription.overflowed)
+
+
+@override_settings(EVENT_BACKEND='user_messages.events.LocalBackend', EVENT_STREAM_KEEPALIVE=5)
+class EventStreamTest(TransactionTestCase):
+    """The ASGI stream replays what was missed, then delivers live events."""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='testpassword')
+        self.missed = Notification.objects.create(user=self.alice, notification_type='message', content='missed')
+        self.client.force_login(self.alice)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    async def test_replay_then_live(self):
+        disconnect = asyncio.Event()
+        sent = []
+        received = asyncio.Queue()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            if message['type'] == 'http.response.body':
+                await received.put(message['body'].decode())
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': settings.EVENT_STREAM_PATH, 'query_string': b'',
+            'headers': [(b'cookie', self.cookie.encode()), (b'last-event-id', b'0:0')],
+        }
+        stream = asyncio.ensure_future(event_stream(scope, receive, send))
+
+        self.assertTrue((await asyncio.wait_for(received.get(), 5)).startswith('retry:'))
+        self.assertIn('"content":"missed"', await asyncio.wait_for(received.get(), 5))
+
+        live = await sync_to_async(Notification.objects.create)(
+            user=self.alice, notification_type='message', content='live')
+        body = await asyncio.wait_for(received.get(), 5)
+        self.assertIn('"content":"live"', body)
+        self.assertIn(f'id: {live.pk}:0', body)
+
+        disconnect.set()
+        await asyncio.wait_for(stream, 5)
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertEqual(events.hub.user_ids(), [])
+
+    async def test_replays_backlog_larger_than_a_batch(self):
+        for n in range(4):
+            await sync_to_async(Notification.objects.create)(
+                user=self.alice, notification_type='message', content=f'missed {n}')
+        disconnect = asyncio.Event()
+        received = asyncio.Queue()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                await received.put(message['body'].decode())
+
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': settings.EVENT_STREAM_PATH, 'query_string': b'',
+            'headers': [(b'cookie', self.cookie.encode()), (b'last-event-id', b'0:0')],
+        }
+        replay = events.replay
+        with mock.patch.object(events, 'replay', lambda user_id, cursor: replay(user_id, cursor, limit=2)):
+            stream = asyncio.ensure_future(event_stream(scope, receive, send))
+            self.assertTrue((await asyncio.wait_for(received.get(), 5)).startswith('retry:'))
+            bodies = [await asyncio.wait_for(received.get(), 5) for _ in range(5)]
+            await sync_to_async(Notification.objects.create)(
+                user=self.alice, notification_type='message', content='live')
+            bodies.append(await asyncio.wait_for(received.get(), 5))
+            disconnect.set()
+            await asyncio.wait_for(stream, 5)
+
+        contents = ['missed', 'missed 0', 'missed 1', 'missed 2', 'missed 3', 'live']
+        for body, content in zip(bodies, contents):
+            self.assertIn(f'"content":"{content}"', body)
+
+    async def test_anonymous_is_forbidden(self):
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': settings.EVENT_STREAM_PATH, 'query_string': b'',
+                 'headers': []}
+        await event_stream(scope, None, send)
+        self.assertEqual(sent[0]['status'], 403)
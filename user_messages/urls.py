@@ -17,4 +17,7 @@ urlpatterns = [
     path('notifications/', views.notification_list, name='notification_list'),
     path('notifications/<int:notification_id>/mark-read/', views.mark_notification_read, name='mark_notification_read'),
     path('notifications/mark-all-read/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
+    
+    # Live notifications and messages (Server-Sent Events)
+    path('events/', views.event_stream, name='event_stream'),
 ] 
\ No newline at end of file
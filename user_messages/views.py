@@ -2,14 +2,25 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.conf import settings
-from .models import Conversation, Message, Notification
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.http import HttpResponse, HttpResponseForbidden
+from core.pagination import paginate
+from . import counters, events
+from .models import Conversation, ConversationUnreadCounter, Message, Notification
+from .stream import start_cursor
 
 # Create your views here.
 
 @login_required
 def conversation_list(request):
     """Display list of all user conversations"""
-    conversations = Conversation.objects.filter(participants=request.user)
+    unread = ConversationUnreadCounter.objects.filter(conversation=OuterRef('pk'), user=request.user)
+    conversations = (Conversation.objects.filter(participants=request.user)
+                     .annotate(unread=Subquery(unread.values('messages'))))
+    conversations = paginate(request, conversations, ('-last_activity_at',))
+    for conversation in conversations:
+        conversation.other_participants = conversation.participant_usernames(exclude=request.user)
     return render(request, 'user_messages/conversation_list.html', {'conversations': conversations})
 
 @login_required
@@ -49,27 +60,52 @@ def mark_message_read(request, conversation_id, message_id):
         conversation_id=conversation_id, 
         conversation__participants=request.user
     )
-    message.is_read = True
-    message.save()
+    with transaction.atomic():
+        # Only the request that flips the flag moves the counters
+        if Message.objects.filter(pk=message.pk, is_read=False).update(is_read=True):
+            counters.messages_changed(conversation_id, counters.message_recipients(message), -1)
     return redirect('messages:conversation_detail', conversation_id=conversation_id)
 
 @login_required
 def notification_list(request):
     """View all notifications"""
     notifications = Notification.objects.filter(user=request.user)
+    notifications = paginate(request, notifications, ('-created_at',))
     return render(request, 'user_messages/notification_list.html', {'notifications': notifications})
 
 @login_required
 def mark_notification_read(request, notification_id):
     """Mark a notification as read"""
     notification = get_object_or_404(Notification, id=notification_id, user=request.user)
-    notification.is_read = True
-    notification.save()
+    with transaction.atomic():
+        if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+            counters.notifications_changed(request.user.pk, -1)
     return redirect('messages:notification_list')
 
 @login_required
 def mark_all_notifications_read(request):
     """Mark all notifications as read"""
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    with transaction.atomic():
+        marked = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        if marked:
+            counters.notifications_changed(request.user.pk, -marked)
     messages.success(request, "All notifications marked as read.")
     return redirect('messages:notification_list')
+
+def event_stream(request):
+    """
+    Live events without an ASGI server: send what the client missed and close.
+    Under ASGI, user_messages.stream serves this URL as a long-lived stream.
+    """
+    if not request.user.is_authenticated:
+        return HttpResponseForbidden()
+    cursor = start_cursor(request, request.user.pk)
+    body = [f'retry: {settings.EVENT_STREAM_RETRY_MS}\n\n']
+    for event in events.replay(request.user.pk, cursor):
+        advanced = event.advance(cursor)
+        if advanced is not None:
+            cursor = advanced
+            body.append(events.format_event(event, cursor))
+    response = HttpResponse(''.join(body), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_friendship'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='avatar_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='original_avatar',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='originals/avatars/'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from imagekit.models import ProcessedImageField
 from imagekit.processors import ResizeToFit
 from django.conf import settings
 
+from core.renditions import Renditions, status_field
+
 class CustomUser(AbstractUser):
     bio = models.TextField(max_length=500, blank=True)
     avatar = ProcessedImageField(upload_to='avatars/',
@@ -12,7 +14,12 @@ class CustomUser(AbstractUser):
                                options={'quality': 85},
                                blank=True,
                                null=True)
+    original_avatar = models.ImageField(upload_to='originals/avatars/', blank=True, null=True, editable=False)
+    avatar_status = status_field()
     website = models.URLField(max_length=200, blank=True)
+
+    avatar_renditions = Renditions(upload='avatar', original='original_avatar',
+                                   status='avatar_status', targets=('avatar',))
     
     class Meta:
         verbose_name = 'User'
@@ -21,6 +28,10 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        self.avatar_renditions.defer(self)
+        super().save(*args, **kwargs)
+
 class Friendship(models.Model):
     """Model to handle friend relationships between users"""
     STATUS_CHOICES = (